@@ -2,8 +2,11 @@
 数据分析API
 """
 from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, List, Callable, Optional, Tuple, Awaitable
 import uuid
+import time
+import asyncio
 from datetime import datetime
 import json
 import os
@@ -11,109 +14,378 @@ import os
 from models.schemas import AnalysisRequest, AnalysisResult, ChartConfig
 from services.analyzer import DataAnalyzer
 from services.ai_service import AIService
+from services.executor import run_in_thread, ExecutorBusyError
+from services.downsampling import DEFAULT_MAX_POINTS
+from services.content_index import result_memo, memo_key, RESULT_MEMO_ENABLED
+from services.job_manager import StageReporter
 
 router = APIRouter()
 
-@router.post("/analyze", response_model=AnalysisResult)
-async def analyze_data(request: AnalysisRequest):
+def chart_builders(
+    analyzer: DataAnalyzer,
+    analysis_plan: Dict[str, Any],
+    request: AnalysisRequest
+) -> List[Tuple[str, Callable[[], List[ChartConfig]]]]:
+    """根据分析计划列出需要生成的图表组，各组互不依赖，可以并行生成"""
+    builders = []
+    
+    # 1. 数据分布图
+    if analysis_plan.get("include_distribution", True):
+        builders.append(("distribution", lambda: analyzer.create_distribution_charts(
+            bins=request.histogram_bins or 30,
+            bin_rule=request.histogram_bin_rule or "fixed"
+        )))
+    
+    # 2. 相关性分析
+    if analysis_plan.get("include_correlation", True) and analyzer.has_numeric_columns():
+        def correlation() -> List[ChartConfig]:
+            corr_chart = analyzer.create_correlation_heatmap()
+            return [corr_chart] if corr_chart else []
+        builders.append(("correlation", correlation))
+    
+    # 3. 趋势分析
+    if analysis_plan.get("include_trends", False):
+        builders.append(("trends", lambda: analyzer.create_trend_charts(
+            max_points=request.max_chart_points or DEFAULT_MAX_POINTS
+        )))
+    
+    # 4. 分类分析
+    if analysis_plan.get("include_categories", True):
+        builders.append(("categories", analyzer.create_categorical_charts))
+    
+    return builders
+
+def build_charts(
+    analyzer: DataAnalyzer,
+    analysis_plan: Dict[str, Any],
+    request: AnalysisRequest
+) -> List[ChartConfig]:
+    """根据分析计划生成图表（同步执行，在线程池中调用）"""
+    charts = []
+    for _, builder in chart_builders(analyzer, analysis_plan, request):
+        charts.extend(builder())
+    return charts
+
+async def build_charts_concurrently(
+    analyzer: DataAnalyzer,
+    analysis_plan: Dict[str, Any],
+    request: AnalysisRequest,
+    timings: Dict[str, float],
+    on_chart: Optional[Callable[[ChartConfig], None]] = None
+) -> List[ChartConfig]:
     """
-    执行数据分析
+    在线程池中并行生成各图表组，按分析计划中的顺序合并，各组耗时记入timings
     
-    根据用户的自然语言需求，自动分析数据并生成可视化结果
+    提供on_chart时，每组生成完成后立即对其中的每个图表调用（按完成先后）。
+    """
+    async def timed(name: str, builder: Callable[[], List[ChartConfig]]) -> List[ChartConfig]:
+        start = time.perf_counter()
+        try:
+            group = await run_in_thread(builder)
+        finally:
+            timings[f"charts.{name}"] = round(time.perf_counter() - start, 4)
+        if on_chart is not None:
+            for chart in group:
+                on_chart(chart)
+        return group
+    
+    groups = await asyncio.gather(*(
+        timed(name, builder)
+        for name, builder in chart_builders(analyzer, analysis_plan, request)
+    ))
+    return [chart for group in groups for chart in group]
+
+def load_memoized_analysis(memo: str, dataset_id: str) -> Optional[AnalysisResult]:
+    """读取记忆化的分析结果（结果文件已删除时返回None）"""
+    analysis_id = result_memo.get(memo)
+    if analysis_id is None:
+        return None
+    
+    result_path = f"uploads/results/{analysis_id}_analysis.json"
+    if not os.path.exists(result_path):
+        return None
+    
+    with open(result_path, "r", encoding="utf-8") as f:
+        result = AnalysisResult(**json.load(f))
+    
+    # 内容相同的数据集可能以不同ID上传，返回时使用本次请求的数据集ID
+    return result.model_copy(update={"dataset_id": dataset_id})
+
+# 分析流程的阶段（用于异步任务进度）
+ANALYSIS_STAGES = ["load_data", "analysis_plan", "statistics", "correlations", "charts", "insights", "save"]
+
+def _noop_report(stage: str, status: str = "running"):
+    pass
+
+class StageGraph:
+    """
+    分析流程的阶段依赖图
+
+    每个阶段是一个异步任务，依赖的阶段完成后才开始执行，并以依赖阶段的
+    结果作为参数；互不依赖的阶段并发执行。阶段开始时以running调用report，
+    成功结束时以completed、出错时以failed调用，并把耗时（秒）记入timings。
     """
+
+    def __init__(self, report: StageReporter):
+        self.report = report
+        self.timings: Dict[str, float] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def stage(self, name: str, func: Callable[..., Awaitable[Any]], *deps: asyncio.Task) -> asyncio.Task:
+        """添加阶段，返回其任务（可作为后续阶段的依赖，或直接await取得结果）"""
+        async def run():
+            args = [await dep for dep in deps]
+            self.report(name, "running")
+            start = time.perf_counter()
+            try:
+                result = await func(*args)
+            except Exception:
+                self.report(name, "failed")
+                raise
+            finally:
+                self.timings[name] = round(time.perf_counter() - start, 4)
+            self.report(name, "completed")
+            return result
+
+        task = asyncio.create_task(run())
+        self._tasks.append(task)
+        return task
+
+    def cancel_pending(self):
+        """取消尚未完成的阶段（提前返回或出错时调用）"""
+        for task in self._tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                # 取出异常，避免未被await的失败阶段产生警告
+                task.exception()
+
+async def run_analysis(
+    request: AnalysisRequest,
+    report: StageReporter = _noop_report,
+    emit: Optional[Callable[[str, Any], None]] = None
+) -> AnalysisResult:
+    """
+    执行完整的分析流程并保存结果
+    
+    Args:
+        request: 分析请求
+        report: 阶段回调，每个阶段开始和结束时以(阶段名, 状态)调用
+        emit: 中间结果回调（流式接口使用），以(事件名, 数据)调用：统计完成时
+            发送"statistics"，每个图表生成后发送"chart"，洞察文本以
+            "insights_delta"逐段发送（此时以流式方式调用LLM）
+    """
+    # 验证数据集存在
+    metadata_path = f"uploads/datasets/{request.dataset_id}_metadata.json"
+    if not os.path.exists(metadata_path):
+        raise HTTPException(
+            status_code=404,
+            detail="数据集不存在"
+        )
+    
+    with open(metadata_path, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    
+    # 初始化分析器
+    analyzer = DataAnalyzer(metadata["file_path"], metadata["format"])
+    ai_service = AIService()
+    
+    # 数据加载和基础统计不依赖分析计划，与AI生成分析计划并发执行；
+    # 图表在数据加载和分析计划都完成后并行生成，洞察只依赖统计结果
+    graph = StageGraph(report)
+    started = time.perf_counter()
     try:
-        # 验证数据集存在
-        metadata_path = f"uploads/datasets/{request.dataset_id}_metadata.json"
-        if not os.path.exists(metadata_path):
-            raise HTTPException(
-                status_code=404,
-                detail="数据集不存在"
-            )
-        
-        with open(metadata_path, "r", encoding="utf-8") as f:
-            metadata = json.load(f)
-        
-        # 初始化分析器
-        analyzer = DataAnalyzer(metadata["file_path"], metadata["format"])
-        ai_service = AIService()
-        
-        # 加载数据
-        df = analyzer.load_data()
-        
-        # 使用AI理解用户需求
-        analysis_plan = await ai_service.generate_analysis_plan(
+        loaded = graph.stage("load_data", lambda: run_in_thread(analyzer.load_data))
+        plan = graph.stage("analysis_plan", lambda: ai_service.generate_analysis_plan(
             user_query=request.user_query,
             data_description=request.data_description or "",
             column_names=metadata["column_names"],
             data_types=metadata["data_types"]
-        )
-        
-        # 执行基础统计分析
-        statistics = analyzer.get_basic_statistics()
+        ))
+        async def compute_statistics(_) -> Dict[str, Any]:
+            statistics_result = await run_in_thread(analyzer.get_basic_statistics)
+            if emit is not None:
+                emit("statistics", statistics_result)
+            return statistics_result
         
-        # 根据分析计划生成图表
-        charts = []
-        
-        # 1. 数据分布图
-        if analysis_plan.get("include_distribution", True):
-            dist_charts = analyzer.create_distribution_charts()
-            charts.extend(dist_charts)
-        
-        # 2. 相关性分析
-        if analysis_plan.get("include_correlation", True) and analyzer.has_numeric_columns():
-            corr_chart = analyzer.create_correlation_heatmap()
-            if corr_chart:
-                charts.append(corr_chart)
+        described = graph.stage("statistics", compute_statistics, loaded)
+        correlated = graph.stage(
+            "correlations",
+            lambda _: run_in_thread(analyzer.get_strong_correlations),
+            loaded
+        )
         
-        # 3. 趋势分析
-        if analysis_plan.get("include_trends", False):
-            trend_charts = analyzer.create_trend_charts()
-            charts.extend(trend_charts)
+        analysis_plan = await plan
         
-        # 4. 分类分析
-        if analysis_plan.get("include_categories", True):
-            cat_charts = analyzer.create_categorical_charts()
-            charts.extend(cat_charts)
+        # 相同内容、相同分析计划和参数已分析过时直接返回已保存的结果
+        memo = None
+        if RESULT_MEMO_ENABLED and metadata.get("content_hash"):
+            memo = memo_key(
+                "analysis",
+                metadata["content_hash"],
+                {
+                    "plan": analysis_plan,
+                    "request": request.model_dump(mode='json', exclude={"dataset_id"})
+                }
+            )
+            memoized = load_memoized_analysis(memo, request.dataset_id)
+            if memoized is not None:
+                graph.timings["total"] = round(time.perf_counter() - started, 4)
+                return memoized.model_copy(update={"stage_timings": graph.timings})
         
-        # 使用AI生成分析摘要和洞察
-        summary, insights = await ai_service.generate_insights(
-            statistics=statistics,
-            data_description=request.data_description or "",
-            user_query=request.user_query,
-            column_info=metadata
+        # 根据分析计划生成图表
+        charted = graph.stage(
+            "charts",
+            lambda _, plan_result: build_charts_concurrently(
+                analyzer,
+                plan_result,
+                request,
+                graph.timings,
+                on_chart=(lambda chart: emit("chart", chart.model_dump(mode='json'))) if emit else None
+            ),
+            loaded,
+            plan
         )
         
-        # 生成分析ID
-        analysis_id = str(uuid.uuid4())
-        
-        # 保存分析结果
-        result = AnalysisResult(
-            analysis_id=analysis_id,
-            dataset_id=request.dataset_id,
-            summary=summary,
-            insights=insights,
-            charts=charts,
-            statistics=statistics,
-            created_at=datetime.now()
+        # 使用AI生成分析摘要和洞察
+        summarized = graph.stage(
+            "insights",
+            lambda statistics_result, correlations: ai_service.generate_insights(
+                statistics=statistics_result,
+                data_description=request.data_description or "",
+                user_query=request.user_query,
+                column_info=metadata,
+                correlations=correlations,
+                on_delta=(lambda text: emit("insights_delta", {"text": text})) if emit else None
+            ),
+            described,
+            correlated
         )
         
-        # 保存到文件
-        result_path = f"uploads/results/{analysis_id}_analysis.json"
-        os.makedirs("uploads/results", exist_ok=True)
-        
-        with open(result_path, "w", encoding="utf-8") as f:
-            json.dump(result.model_dump(mode='json'), f, ensure_ascii=False, indent=2, default=str)
-        
-        return result
+        charts, (summary, insights) = await asyncio.gather(charted, summarized)
+        statistics = described.result()
+    finally:
+        graph.cancel_pending()
+    
+    # 生成分析ID
+    analysis_id = str(uuid.uuid4())
+    graph.timings["total"] = round(time.perf_counter() - started, 4)
+    
+    # 保存分析结果
+    report("save", "running")
+    result = AnalysisResult(
+        analysis_id=analysis_id,
+        dataset_id=request.dataset_id,
+        summary=summary,
+        insights=insights,
+        charts=charts,
+        statistics=statistics,
+        created_at=datetime.now(),
+        stage_timings=graph.timings,
+        prompt_tokens=ai_service.prompt_tokens or None
+    )
+    
+    # 保存到文件
+    result_path = f"uploads/results/{analysis_id}_analysis.json"
+    os.makedirs("uploads/results", exist_ok=True)
+    
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(result.model_dump(mode='json'), f, ensure_ascii=False, indent=2, default=str)
+    
+    # AI计划或洞察调用失败时使用的是默认结果，不记忆，下次重新生成
+    if memo is not None and not ai_service.fallbacks:
+        result_memo.set(memo, analysis_id)
+    report("save", "completed")
+    
+    return result
+
+@router.post("/analyze", response_model=AnalysisResult)
+async def analyze_data(request: AnalysisRequest):
+    """
+    执行数据分析
+    
+    根据用户的自然语言需求，自动分析数据并生成可视化结果
+    """
+    try:
+        return await run_analysis(request)
         
     except HTTPException:
         raise
+    except ExecutorBusyError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"数据分析失败: {str(e)}"
         )
 
+def sse_event(event: str, data: Any) -> str:
+    """格式化一条server-sent事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@router.post("/analyze/stream")
+async def analyze_data_stream(request: AnalysisRequest):
+    """
+    流式执行数据分析（server-sent events）
+    
+    与 /analyze 执行相同的流程，但中间结果一产生就推送，不必等待整个流程
+    结束。事件依次包括：
+    - stage: 阶段开始或结束，{"stage", "status"}（running / completed / failed）
+    - statistics: 基础统计结果
+    - chart: 单个图表（ChartConfig）
+    - insights_delta: LLM流式生成的洞察文本片段，{"text"}
+    - result: 最终的AnalysisResult（以此为准，洞察调用失败时为回退摘要）
+    - error: 分析失败，{"status_code", "detail"}
+    记忆化命中时只发送result。客户端断开后分析任务随之取消。
+    """
+    if not os.path.exists(f"uploads/datasets/{request.dataset_id}_metadata.json"):
+        raise HTTPException(
+            status_code=404,
+            detail="数据集不存在"
+        )
+    
+    queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+    
+    def emit(event: str, data: Any):
+        queue.put_nowait(sse_event(event, data))
+    
+    async def run():
+        try:
+            result = await run_analysis(
+                request,
+                report=lambda stage, status="running": emit("stage", {"stage": stage, "status": status}),
+                emit=emit
+            )
+            emit("result", result.model_dump(mode='json'))
+        except HTTPException as e:
+            emit("error", {"status_code": e.status_code, "detail": e.detail})
+        except ExecutorBusyError as e:
+            emit("error", {"status_code": 503, "detail": str(e)})
+        except Exception as e:
+            emit("error", {"status_code": 500, "detail": f"数据分析失败: {str(e)}"})
+        finally:
+            queue.put_nowait(None)
+    
+    async def events():
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield item
+        finally:
+            task.cancel()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/result/{analysis_id}", response_model=AnalysisResult)
 async def get_analysis_result(analysis_id: str):
     """获取分析结果"""
@@ -0,0 +1,201 @@
+"""
+模型注册表API - 拟合一次，多次预测和增量更新
+"""
+from fastapi import APIRouter, HTTPException
+from datetime import datetime
+import numpy as np
+import uuid
+import time
+import json
+import os
+
+from models.schemas import (
+    ModelFitRequest, ModelForecastRequest, ModelAppendRequest,
+    FittedModelInfo, ModelForecastResult
+)
+from services.predictor import TimeSeriesPredictor, fit_time_budget
+from services.executor import run_in_thread, run_killable, ExecutorBusyError, TaskTimeoutError
+from services.content_index import memo_key
+from services.model_registry import model_registry, fit_and_store, REGISTRY_MODELS
+
+router = APIRouter()
+
+def _get_model_info(model_id: str) -> dict:
+    info = model_registry.get_info(model_id)
+    if info is None or not os.path.exists(model_registry.model_path(model_id)):
+        raise HTTPException(
+            status_code=404,
+            detail="模型不存在"
+        )
+    return info
+
+@router.post("/", response_model=FittedModelInfo)
+async def fit_model(request: ModelFitRequest):
+    """
+    拟合并注册模型
+
+    在目标列的全部观测上拟合模型并持久化。相同数据内容、列和模型配置
+    已注册时直接返回已有模型（refit=true时重新拟合）。拟合在可终止进程中
+    执行，时间预算与 /predict 相同，超出时终止进程并返回504。
+    """
+    try:
+        if request.model_type not in REGISTRY_MODELS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"不支持的模型类型，可选: {list(REGISTRY_MODELS)}"
+            )
+
+        metadata_path = f"uploads/datasets/{request.dataset_id}_metadata.json"
+        if not os.path.exists(metadata_path):
+            raise HTTPException(
+                status_code=404,
+                detail="数据集不存在"
+            )
+
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+
+        # 按内容哈希登记，内容相同的数据集共享模型
+        key = memo_key(
+            "model",
+            metadata.get("content_hash") or request.dataset_id,
+            request.model_dump(exclude={"dataset_id", "refit"})
+        )
+        if not request.refit:
+            existing = model_registry.find(key)
+            if existing is not None:
+                return FittedModelInfo(**existing)
+
+        predictor = TimeSeriesPredictor(metadata["file_path"], metadata["format"])
+        df = await run_in_thread(predictor.load_data)
+
+        if request.target_column not in df.columns:
+            raise HTTPException(
+                status_code=400,
+                detail=f"目标列 '{request.target_column}' 不存在"
+            )
+
+        values = df[request.target_column].dropna().to_numpy(dtype=np.float64)
+        if len(values) < 10:
+            raise HTTPException(
+                status_code=400,
+                detail="数据量太少，至少需要10个数据点"
+            )
+
+        model_id = str(uuid.uuid4())
+        os.makedirs(model_registry.models_dir, exist_ok=True)
+        try:
+            summary = await run_killable(
+                fit_and_store,
+                model_registry.models_dir,
+                model_id,
+                values,
+                request.model_type,
+                tuple(request.arima_order) if request.arima_order else None,
+                None,
+                request.seasonal_period,
+                timeout=fit_time_budget(request.model_type)
+            )
+        except TaskTimeoutError as e:
+            raise HTTPException(
+                status_code=504,
+                detail=f"模型拟合超时: {str(e)}"
+            )
+
+        now = datetime.now().isoformat()
+        info = {
+            "model_id": model_id,
+            "dataset_id": request.dataset_id,
+            "target_column": request.target_column,
+            "appended": 0,
+            "created_at": now,
+            **summary
+        }
+        await run_in_thread(model_registry.register, key, info)
+
+        return FittedModelInfo(**info)
+
+    except HTTPException:
+        raise
+    except ExecutorBusyError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"模型拟合失败: {str(e)}"
+        )
+
+@router.get("/{model_id}", response_model=FittedModelInfo)
+async def get_model(model_id: str):
+    """获取已注册模型的信息"""
+    return FittedModelInfo(**_get_model_info(model_id))
+
+@router.post("/{model_id}/forecast", response_model=ModelForecastResult)
+async def forecast_model(model_id: str, request: ModelForecastRequest):
+    """
+    用已注册的模型预测
+
+    直接从保存的模型状态向前预测，不重新拟合。
+    """
+    _get_model_info(model_id)
+    if request.forecast_periods < 1:
+        raise HTTPException(
+            status_code=400,
+            detail="预测周期数必须大于0"
+        )
+
+    try:
+        start = time.monotonic()
+        result = await run_in_thread(model_registry.forecast, model_id, request.forecast_periods)
+        return ModelForecastResult(
+            model_id=model_id,
+            elapsed=round(time.monotonic() - start, 4),
+            **result
+        )
+    except ExecutorBusyError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"预测失败: {str(e)}"
+        )
+
+@router.post("/{model_id}/append", response_model=FittedModelInfo)
+async def append_observations(model_id: str, request: ModelAppendRequest):
+    """
+    向已注册模型追加新观测
+
+    用已估计的参数对新观测执行滤波/平滑递推，更新模型末尾状态，
+    不重新估计参数。
+    """
+    _get_model_info(model_id)
+    if not request.values:
+        raise HTTPException(
+            status_code=400,
+            detail="没有需要追加的观测"
+        )
+
+    try:
+        info = await run_in_thread(model_registry.append, model_id, request.values)
+        return FittedModelInfo(**info)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    except ExecutorBusyError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"更新模型失败: {str(e)}"
+        )
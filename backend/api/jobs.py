@@ -0,0 +1,79 @@
+"""
+异步任务API
+"""
+from fastapi import APIRouter, HTTPException
+from typing import Dict, Any
+
+from models.schemas import AnalysisRequest, PredictionRequest, JobStatus
+from services.job_manager import job_manager, StageReporter
+from api.analysis import run_analysis, ANALYSIS_STAGES
+from api.prediction import run_prediction, PREDICTION_STAGES
+
+router = APIRouter()
+
+async def _run_analysis_job(payload: Dict[str, Any], report: StageReporter) -> str:
+    """分析任务：返回分析结果ID"""
+    result = await run_analysis(AnalysisRequest(**payload), report)
+    return result.analysis_id
+
+async def _run_prediction_job(payload: Dict[str, Any], report: StageReporter) -> str:
+    """预测任务：返回预测结果ID"""
+    result = await run_prediction(PredictionRequest(**payload), report)
+    return result.prediction_id
+
+job_manager.register_runner("analysis", _run_analysis_job, ANALYSIS_STAGES)
+job_manager.register_runner("prediction", _run_prediction_job, PREDICTION_STAGES)
+
+@router.post("/analysis", response_model=JobStatus)
+async def submit_analysis_job(request: AnalysisRequest):
+    """
+    提交分析任务
+    
+    立即返回任务ID，通过 GET /api/jobs/{job_id} 查询进度和结果
+    """
+    try:
+        job = job_manager.submit("analysis", request.model_dump(mode='json'))
+        return JobStatus(**job)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"提交分析任务失败: {str(e)}"
+        )
+
+@router.post("/prediction", response_model=JobStatus)
+async def submit_prediction_job(request: PredictionRequest):
+    """
+    提交预测任务
+    
+    立即返回任务ID，通过 GET /api/jobs/{job_id} 查询进度和结果
+    """
+    try:
+        job = job_manager.submit("prediction", request.model_dump(mode='json'))
+        return JobStatus(**job)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"提交预测任务失败: {str(e)}"
+        )
+
+@router.get("/{job_id}", response_model=JobStatus)
+async def get_job_status(job_id: str):
+    """获取任务状态"""
+    try:
+        job = job_manager.get(job_id)
+        
+        if job is None:
+            raise HTTPException(
+                status_code=404,
+                detail="任务不存在"
+            )
+        
+        return JobStatus(**job)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"获取任务状态失败: {str(e)}"
+        )
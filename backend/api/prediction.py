@@ -1,27 +1,383 @@
 """
 预测功能API
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, Optional, Awaitable
+import pandas as pd
 import uuid
+import time
+import asyncio
 from datetime import datetime
 import json
 import os
 
-from models.schemas import PredictionRequest, PredictionResult, ChartConfig
-from services.predictor import TimeSeriesPredictor
+from models.schemas import PredictionRequest, PredictionResult, BatchPredictionRequest, ChartConfig
+from services.predictor import (
+    TimeSeriesPredictor, run_forecast, run_series_forecast, fit_time_budget, train_test_split,
+    FALLBACK_MODEL
+)
 from services.ai_service import AIService
+from services.executor import (
+    run_in_thread, run_killable, ExecutorBusyError, TaskTimeoutError, ProcessCrashedError,
+    PROCESS_WORKERS
+)
+from services.arima_search import select_arima_order_parallel, DEFAULT_ORDER
+from services.backtesting import backtest_models
+from services.downsampling import DEFAULT_MAX_POINTS
+from services.content_index import result_memo, memo_key, RESULT_MEMO_ENABLED
+from services.job_manager import StageReporter
 
 router = APIRouter()
 
+# 单次批量预测的最大序列数
+MAX_BATCH_SERIES = int(os.getenv("MAX_BATCH_SERIES", 500))
+# 检查客户端是否断开连接的间隔（秒）
+DISCONNECT_POLL_INTERVAL = 0.5
+
+def load_memoized_prediction(memo: str, dataset_id: str) -> Optional[PredictionResult]:
+    """读取记忆化的预测结果（结果文件已删除时返回None）"""
+    prediction_id = result_memo.get(memo)
+    if prediction_id is None:
+        return None
+    
+    result_path = f"uploads/results/{prediction_id}_prediction.json"
+    if not os.path.exists(result_path):
+        return None
+    
+    with open(result_path, "r", encoding="utf-8") as f:
+        result = PredictionResult(**json.load(f))
+    
+    # 内容相同的数据集可能以不同ID上传，返回时使用本次请求的数据集ID
+    return result.model_copy(update={"dataset_id": dataset_id})
+
+# 预测流程的阶段（用于异步任务进度）
+PREDICTION_STAGES = ["load_data", "prediction_config", "validation", "fit", "chart", "save"]
+
+def _noop_report(stage: str, status: str = "running"):
+    pass
+
+def calendar_index(df: pd.DataFrame, date_column: str) -> pd.DatetimeIndex:
+    """把时间列解析为严格递增的时间索引，无法解析时返回400"""
+    if date_column not in df.columns:
+        raise HTTPException(
+            status_code=400,
+            detail=f"时间列 '{date_column}' 不存在"
+        )
+    timestamps = pd.DatetimeIndex(pd.to_datetime(df[date_column], errors="coerce"))
+    if timestamps.hasnans or not timestamps.is_monotonic_increasing or not timestamps.is_unique:
+        raise HTTPException(
+            status_code=400,
+            detail=f"时间列 '{date_column}' 必须是可解析、严格递增且不重复的时间"
+        )
+    return timestamps
+
+async def run_prediction(
+    request: PredictionRequest,
+    report: StageReporter = _noop_report
+) -> PredictionResult:
+    """
+    执行完整的预测流程并保存结果
+    
+    Args:
+        request: 预测请求
+        report: 阶段回调，每个阶段开始和结束时以(阶段名, 状态)调用
+    """
+    # 验证数据集存在
+    metadata_path = f"uploads/datasets/{request.dataset_id}_metadata.json"
+    if not os.path.exists(metadata_path):
+        raise HTTPException(
+            status_code=404,
+            detail="数据集不存在"
+        )
+    
+    with open(metadata_path, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    
+    # 初始化预测器
+    predictor = TimeSeriesPredictor(metadata["file_path"], metadata["format"])
+    ai_service = AIService()
+    
+    # 加载数据
+    report("load_data")
+    df = await run_in_thread(predictor.load_data)
+    
+    # 验证目标列存在
+    if request.target_column not in df.columns:
+        raise HTTPException(
+            status_code=400,
+            detail=f"目标列 '{request.target_column}' 不存在"
+        )
+    report("load_data", "completed")
+    
+    # 使用AI理解预测需求
+    report("prediction_config")
+    prediction_config = await ai_service.generate_prediction_config(
+        prediction_query=request.prediction_query,
+        target_column=request.target_column,
+        column_names=metadata["column_names"],
+        data_types=metadata["data_types"]
+    )
+    report("prediction_config", "completed")
+    
+    # 随机森林的外生特征：请求指定的列优先，其次是AI建议的列
+    feature_columns = request.feature_columns or prediction_config.get("feature_columns") or []
+    
+    # 相同内容、相同参数和特征列已预测过时直接返回已保存的结果
+    # （预测需求描述只通过AI建议的特征列影响结果）
+    memo = None
+    if RESULT_MEMO_ENABLED and metadata.get("content_hash"):
+        memo = memo_key(
+            "prediction",
+            metadata["content_hash"],
+            {
+                "feature_columns": feature_columns,
+                "request": request.model_dump(mode='json', exclude={"dataset_id", "prediction_query"})
+            }
+        )
+        memoized = load_memoized_prediction(memo, request.dataset_id)
+        if memoized is not None:
+            return memoized
+    
+    # 验证数据假设（不满足时转换数据并重新验证）
+    report("validation")
+    cache_key = (metadata["content_hash"], request.target_column) if metadata.get("content_hash") else None
+    series, validation_result = await run_in_thread(
+        predictor.validate_and_transform, df[request.target_column], cache_key
+    )
+    df[request.target_column] = series
+    
+    # 选择最佳模型：优先使用滚动起点回测结果，回测不可用时使用启发式规则
+    backtest = None
+    if not request.model_type and request.backtest_folds:
+        backtest = await backtest_models(
+            df[request.target_column],
+            n_folds=request.backtest_folds,
+            horizon=request.forecast_periods,
+            window=request.backtest_window or "expanding",
+            fit_budget=fit_time_budget
+        )
+        validation_result["backtest"] = backtest
+    
+    if request.model_type:
+        model_type = request.model_type
+    elif backtest and backtest["best_model"]:
+        model_type = backtest["best_model"]
+    else:
+        model_type = predictor.select_best_model(
+            df[request.target_column],
+            validation_result
+        )
+    
+    report("validation", "completed")
+    
+    # ARIMA阶数搜索：候选模型在可终止进程中并行拟合，受时间预算约束
+    report("fit")
+    arima_order = None
+    seasonal_order = None
+    if model_type == "arima" and request.auto_arima:
+        # 只在训练集上搜索，测试集留给评估指标（与 predict 的划分一致）
+        train, _ = train_test_split(df[request.target_column])
+        selection = await select_arima_order_parallel(
+            train,
+            seasonal_period=request.seasonal_period,
+            fit_timeout=fit_time_budget("arima")
+        )
+        arima_order, seasonal_order = selection["order"], selection["seasonal_order"]
+        validation_result["model_selection"] = {
+            **selection,
+            "order": list(selection["order"]),
+            "seasonal_order": list(selection["seasonal_order"])
+        }
+    elif model_type == "arima":
+        arima_order = DEFAULT_ORDER
+    
+    # 随机森林的外生特征只保留数值列；指定时间列时以时间为索引，用于构建日历特征
+    target = df[request.target_column]
+    exog = None
+    if model_type == "random_forest":
+        feature_columns = [
+            col for col in feature_columns
+            if col in df.columns and col != request.target_column
+            and pd.api.types.is_numeric_dtype(df[col])
+        ]
+        if feature_columns:
+            exog = df[feature_columns]
+            validation_result["feature_columns"] = feature_columns
+        if request.date_column:
+            timestamps = calendar_index(df, request.date_column)
+            target = target.set_axis(timestamps)
+            exog = exog.set_axis(timestamps) if exog is not None else None
+            validation_result["date_column"] = request.date_column
+    
+    # 执行预测：模型拟合在独立进程中进行，超出时间预算时终止进程并使用后备模型
+    budget = fit_time_budget(model_type)
+    fit_details = {"model_type": model_type, "budget": budget, "timed_out": False}
+    try:
+        predictions, confidence_intervals, metrics = await run_killable(
+            run_forecast,
+            target,
+            model_type,
+            request.forecast_periods,
+            arima_order,
+            seasonal_order,
+            request.seasonal_period,
+            exog,
+            request.forecast_strategy or "recursive",
+            timeout=budget
+        )
+    except (TaskTimeoutError, ProcessCrashedError) as e:
+        # 超时或拟合进程异常退出（如内存不足被终止）时都改用后备模型
+        predictions, confidence_intervals, metrics = await run_in_thread(
+            predictor.fallback_predict,
+            df[request.target_column],
+            request.forecast_periods
+        )
+        fit_details.update({
+            "timed_out": isinstance(e, TaskTimeoutError),
+            "fallback": FALLBACK_MODEL,
+            "error": str(e)
+        })
+        model_type = FALLBACK_MODEL
+    
+    metrics["timed_out"] = float(fit_details["timed_out"])
+    validation_result["fit"] = fit_details
+    
+    # 记录所选模型的回测指标
+    if backtest and model_type in backtest["models"]:
+        for metric, value in backtest["models"][model_type]["aggregate"].items():
+            if value is not None:
+                metrics[f"backtest_{metric}"] = float(value)
+    report("fit", "completed")
+    
+    # 创建预测图表
+    report("chart")
+    chart = await run_in_thread(
+        predictor.create_prediction_chart,
+        actual_data=df[request.target_column],
+        predictions=predictions,
+        confidence_intervals=confidence_intervals,
+        title=f"{request.target_column} Prediction",
+        max_points=request.max_chart_points or DEFAULT_MAX_POINTS
+    )
+    
+    report("chart", "completed")
+    
+    # 生成预测ID
+    prediction_id = str(uuid.uuid4())
+    
+    # 保存预测结果
+    report("save")
+    result = PredictionResult(
+        prediction_id=prediction_id,
+        dataset_id=request.dataset_id,
+        model_name=model_type,
+        predictions=predictions.tolist() if hasattr(predictions, 'tolist') else predictions,
+        confidence_intervals=confidence_intervals,
+        metrics=metrics,
+        validation_passed=validation_result["is_valid"],
+        validation_details=validation_result,
+        chart=chart,
+        created_at=datetime.now()
+    )
+    
+    # 保存到文件
+    result_path = f"uploads/results/{prediction_id}_prediction.json"
+    os.makedirs("uploads/results", exist_ok=True)
+    
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(result.model_dump(mode='json'), f, ensure_ascii=False, indent=2, default=str)
+    
+    # 超时降级的结果不记忆化，下次请求重新尝试拟合
+    # 超时、模型拟合异常或AI配置调用失败时得到的是后备结果，不记忆
+    fell_back = "fallback" in fit_details or metrics.get("fallback") or ai_service.fallbacks
+    if memo is not None and not fell_back:
+        result_memo.set(memo, prediction_id)
+    report("save", "completed")
+    
+    return result
+
+async def run_until_disconnected(http_request: Request, coro: Awaitable[Any]) -> Any:
+    """
+    执行协程，客户端断开连接时取消（进而终止正在拟合模型的进程）
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                task.cancel()
+                raise HTTPException(
+                    status_code=499,
+                    detail="客户端已断开连接，预测已取消"
+                )
+    finally:
+        if not task.done():
+            task.cancel()
+
 @router.post("/predict", response_model=PredictionResult)
-async def predict_data(request: PredictionRequest):
+async def predict_data(request: PredictionRequest, http_request: Request):
     """
     执行预测分析
     
-    支持时间序列预测和机器学习模型预测
+    支持时间序列预测和机器学习模型预测。客户端断开连接时取消预测。
+    """
+    try:
+        return await run_until_disconnected(http_request, run_prediction(request))
+        
+    except HTTPException:
+        raise
+    except ExecutorBusyError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"预测分析失败: {str(e)}"
+        )
+
+def split_batch_series(df: pd.DataFrame, request: BatchPredictionRequest) -> Dict[str, pd.Series]:
+    """按目标列或分组键将数据一次性拆分为多个序列"""
+    if request.group_by:
+        for column in [request.group_by, request.value_column]:
+            if not column or column not in df.columns:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"列 '{column}' 不存在"
+                )
+        return {
+            str(key): group.reset_index(drop=True)
+            for key, group in df.groupby(request.group_by, sort=False)[request.value_column]
+        }
+    
+    if not request.target_columns:
+        raise HTTPException(
+            status_code=400,
+            detail="请提供 target_columns 或 group_by + value_column"
+        )
+    
+    missing = [col for col in request.target_columns if col not in df.columns]
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail=f"目标列 {missing} 不存在"
+        )
+    return {col: df[col] for col in request.target_columns}
+
+@router.post("/batch")
+async def predict_batch(request: BatchPredictionRequest):
+    """
+    批量预测
+    
+    对多个目标列或按分组键拆分的多个序列逐一预测。数据只加载和拆分一次，
+    各序列在独立进程中并行执行（超出时间预算时终止），结果以NDJSON逐行返回
+    （每完成一个序列返回一行），最后一行为汇总信息。客户端断开时停止剩余序列。
     """
     try:
-        # 验证数据集存在
         metadata_path = f"uploads/datasets/{request.dataset_id}_metadata.json"
         if not os.path.exists(metadata_path):
             raise HTTPException(
@@ -32,108 +388,82 @@ async def predict_data(request: PredictionRequest):
         with open(metadata_path, "r", encoding="utf-8") as f:
             metadata = json.load(f)
         
-        # 初始化预测器
         predictor = TimeSeriesPredictor(metadata["file_path"], metadata["format"])
-        ai_service = AIService()
-        
-        # 加载数据
-        df = predictor.load_data()
+        df = await run_in_thread(predictor.load_data)
+        series_map = await run_in_thread(split_batch_series, df, request)
         
-        # 验证目标列存在
-        if request.target_column not in df.columns:
+        if len(series_map) > MAX_BATCH_SERIES:
             raise HTTPException(
                 status_code=400,
-                detail=f"目标列 '{request.target_column}' 不存在"
+                detail=f"序列数量 {len(series_map)} 超过上限 {MAX_BATCH_SERIES}"
             )
         
-        # 使用AI理解预测需求
-        prediction_config = await ai_service.generate_prediction_config(
-            prediction_query=request.prediction_query,
-            target_column=request.target_column,
-            column_names=metadata["column_names"],
-            data_types=metadata["data_types"]
-        )
-        
-        # 验证数据假设
-        validation_result = predictor.validate_assumptions(
-            df[request.target_column],
-            check_stationarity=True,
-            check_seasonality=True,
-            check_trend=True
-        )
-        
-        if not validation_result["is_valid"]:
-            # 如果不满足假设，尝试转换数据
-            df[request.target_column] = predictor.transform_data(
-                df[request.target_column],
-                validation_result
-            )
-            
-            # 重新验证
-            validation_result = predictor.validate_assumptions(
-                df[request.target_column],
-                check_stationarity=True,
-                check_seasonality=True,
-                check_trend=True
-            )
-        
-        # 选择最佳模型
-        if not request.model_type:
-            model_type = predictor.select_best_model(
-                df[request.target_column],
-                validation_result
-            )
-        else:
-            model_type = request.model_type
-        
-        # 执行预测
-        predictions, confidence_intervals, metrics = predictor.predict(
-            df[request.target_column],
-            model_type=model_type,
-            forecast_periods=request.forecast_periods
-        )
-        
-        # 创建预测图表
-        chart = predictor.create_prediction_chart(
-            actual_data=df[request.target_column],
-            predictions=predictions,
-            confidence_intervals=confidence_intervals,
-            title=f"{request.target_column} Prediction"
-        )
-        
-        # 生成预测ID
-        prediction_id = str(uuid.uuid4())
-        
-        # 保存预测结果
-        result = PredictionResult(
-            prediction_id=prediction_id,
-            dataset_id=request.dataset_id,
-            model_name=model_type,
-            predictions=predictions.tolist() if hasattr(predictions, 'tolist') else predictions,
-            confidence_intervals=confidence_intervals,
-            metrics=metrics,
-            validation_passed=validation_result["is_valid"],
-            validation_details=validation_result,
-            chart=chart,
-            created_at=datetime.now()
-        )
-        
-        # 保存到文件
-        result_path = f"uploads/results/{prediction_id}_prediction.json"
-        os.makedirs("uploads/results", exist_ok=True)
-        
-        with open(result_path, "w", encoding="utf-8") as f:
-            json.dump(result.model_dump(mode='json'), f, ensure_ascii=False, indent=2, default=str)
-        
-        return result
-        
     except HTTPException:
         raise
+    except ExecutorBusyError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail=f"预测分析失败: {str(e)}"
+            detail=f"批量预测失败: {str(e)}"
         )
+    
+    # 限制本请求同时占用的工作进程数，避免挤占其他请求
+    semaphore = asyncio.Semaphore(PROCESS_WORKERS)
+    # 每个序列的拟合时间预算，超出时终止该序列的进程
+    budget = fit_time_budget(request.model_type or "batch")
+    
+    async def forecast_one(name: str, series: pd.Series) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                result = await run_killable(
+                    run_series_forecast,
+                    series,
+                    request.model_type,
+                    request.forecast_periods,
+                    bool(request.auto_arima),
+                    timeout=budget
+                )
+                return {"series": name, "status": "succeeded", **result}
+            except TaskTimeoutError as e:
+                return {"series": name, "status": "timed_out", "error": str(e)}
+            except Exception as e:
+                return {"series": name, "status": "failed", "error": str(e)}
+    
+    async def stream_results():
+        start = time.monotonic()
+        tasks = [asyncio.ensure_future(forecast_one(name, series)) for name, series in series_map.items()]
+        model_counts: Dict[str, int] = {}
+        failed = 0
+        timed_out = 0
+        
+        try:
+            for task in asyncio.as_completed(tasks):
+                item = await task
+                if item["status"] == "succeeded":
+                    model_counts[item["model_name"]] = model_counts.get(item["model_name"], 0) + 1
+                else:
+                    failed += 1
+                    timed_out += item["status"] == "timed_out"
+                yield json.dumps(item, ensure_ascii=False, default=str) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        summary = {
+            "total": len(tasks),
+            "succeeded": len(tasks) - failed,
+            "failed": failed,
+            "timed_out": timed_out,
+            "models": model_counts,
+            "elapsed": round(time.monotonic() - start, 3)
+        }
+        yield json.dumps({"summary": summary}, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
 
 @router.get("/result/{prediction_id}", response_model=PredictionResult)
 async def get_prediction_result(prediction_id: str):
@@ -177,7 +507,7 @@ async def validate_time_series(dataset_id: str, column: str):
             metadata = json.load(f)
         
         predictor = TimeSeriesPredictor(metadata["file_path"], metadata["format"])
-        df = predictor.load_data()
+        df = await run_in_thread(predictor.load_data)
         
         if column not in df.columns:
             raise HTTPException(
@@ -185,17 +515,22 @@ async def validate_time_series(dataset_id: str, column: str):
                 detail=f"列 '{column}' 不存在"
             )
         
-        validation_result = predictor.validate_assumptions(
+        cache_key = (metadata["content_hash"], column) if metadata.get("content_hash") else None
+        validation_result = await run_in_thread(
+            predictor.validate_cached,
             df[column],
-            check_stationarity=True,
-            check_seasonality=True,
-            check_trend=True
+            cache_key
         )
         
         return validation_result
         
     except HTTPException:
         raise
+    except ExecutorBusyError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
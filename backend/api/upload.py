@@ -2,17 +2,37 @@
 数据上传API
 """
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from typing import Optional
+from typing import Optional, Dict, Any
 import os
 import uuid
 from datetime import datetime
-import pandas as pd
 import json
 
 from models.schemas import DatasetInfo, DataFormat, ErrorResponse
+from services.ingest import stream_upload_to_disk, inspect_dataset
+from services.dataset_loader import build_columnar_cache, count_rows, load_dataset
+from services.executor import run_in_thread
+from services.content_index import dataset_index, dataset_content_key
 
 router = APIRouter()
 
+def find_existing_dataset(content_key: str) -> Optional[Dict[str, Any]]:
+    """根据内容索引查找已上传的相同数据集，文件已不存在时返回None"""
+    dataset_id = dataset_index.get(content_key)
+    if dataset_id is None:
+        return None
+    
+    metadata_path = f"uploads/datasets/{dataset_id}_metadata.json"
+    if not os.path.exists(metadata_path):
+        return None
+    
+    with open(metadata_path, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    
+    if not os.path.exists(metadata["file_path"]):
+        return None
+    return metadata
+
 @router.post("/dataset", response_model=DatasetInfo)
 async def upload_dataset(
     file: UploadFile = File(...),
@@ -40,39 +60,50 @@ async def upload_dataset(
         os.makedirs(upload_dir, exist_ok=True)
         
         file_path = os.path.join(upload_dir, f"{dataset_id}.{file_ext}")
-        content = await file.read()
-        
-        with open(file_path, "wb") as f:
-            f.write(content)
+        part_path = file_path + ".part"
         
-        # 解析数据获取信息
+        # 分块写入临时文件，同时计算哈希
         try:
-            if file_ext == 'csv':
-                df = pd.read_csv(file_path)
-            elif file_ext == 'json':
-                df = pd.read_json(file_path)
-            elif file_ext == 'txt':
-                # 尝试多种分隔符
-                try:
-                    df = pd.read_csv(file_path, sep='\t')
-                except:
-                    try:
-                        df = pd.read_csv(file_path, sep=',')
-                    except:
-                        df = pd.read_csv(file_path, sep=' ')
+            ingest_stats = await stream_upload_to_disk(file, part_path)
+        except BaseException:
+            # 写入中途失败（磁盘已满、客户端断开等）时清理临时文件
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        content_key = dataset_content_key(ingest_stats["content_hash"], file_ext)
+        
+        # 相同内容已上传过时复用已保存的文件和列式缓存
+        existing = find_existing_dataset(content_key)
+        if existing is not None:
+            os.remove(part_path)
+            file_path = existing["file_path"]
+            cache_path = existing.get("columnar_path")
+            dataset_shape = {
+                key: existing.get(key)
+                for key in ["rows", "columns", "column_names", "data_types", "separator"]
+            }
+        else:
+            os.replace(part_path, file_path)
             
-            # 获取数据集信息
-            rows, columns = df.shape
-            column_names = df.columns.tolist()
-            data_types = {col: str(dtype) for col, dtype in df.dtypes.items()}
+            # 解析样本获取数据集信息
+            try:
+                dataset_shape = await run_in_thread(inspect_dataset, file_path, file_ext, ingest_stats)
+            except Exception as e:
+                # 清理上传的文件
+                os.remove(file_path)
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"无法解析数据文件: {str(e)}"
+                )
             
-        except Exception as e:
-            # 清理上传的文件
-            os.remove(file_path)
-            raise HTTPException(
-                status_code=400,
-                detail=f"无法解析数据文件: {str(e)}"
+            # 转换为列式缓存，后续加载无需重新解析文本
+            cache_path = await run_in_thread(
+                build_columnar_cache, file_path, file_ext, dataset_shape["separator"]
             )
+            if dataset_shape["rows"] is None:
+                dataset_shape["rows"] = await run_in_thread(
+                    count_rows, file_path, file_ext, dataset_shape["separator"], cache_path
+                )
         
         # 保存元数据
         metadata = {
@@ -80,18 +111,25 @@ async def upload_dataset(
             "filename": file.filename,
             "format": file_ext,
             "upload_time": datetime.now().isoformat(),
-            "rows": rows,
-            "columns": columns,
-            "column_names": column_names,
-            "data_types": data_types,
+            "rows": dataset_shape["rows"],
+            "columns": dataset_shape["columns"],
+            "column_names": dataset_shape["column_names"],
+            "data_types": dataset_shape["data_types"],
+            "separator": dataset_shape["separator"],
+            "content_hash": ingest_stats["content_hash"],
+            "size_bytes": ingest_stats["size_bytes"],
             "description": description,
-            "file_path": file_path
+            "file_path": file_path,
+            "columnar_path": cache_path
         }
         
         metadata_path = os.path.join(upload_dir, f"{dataset_id}_metadata.json")
         with open(metadata_path, "w", encoding="utf-8") as f:
             json.dump(metadata, f, ensure_ascii=False, indent=2)
         
+        if existing is None:
+            dataset_index.set(content_key, dataset_id)
+        
         return DatasetInfo(**metadata)
         
     except HTTPException:
@@ -142,16 +180,13 @@ async def get_dataset_preview(dataset_id: str, rows: int = 10):
         with open(metadata_path, "r", encoding="utf-8") as f:
             metadata = json.load(f)
         
-        file_path = metadata["file_path"]
-        file_ext = metadata["format"]
-        
-        if file_ext == 'csv':
-            df = pd.read_csv(file_path, nrows=rows)
-        elif file_ext == 'json':
-            df = pd.read_json(file_path)
-            df = df.head(rows)
-        elif file_ext == 'txt':
-            df = pd.read_csv(file_path, sep='\t', nrows=rows)
+        df = await run_in_thread(
+            load_dataset,
+            metadata["file_path"],
+            metadata["format"],
+            separator=metadata.get("separator"),
+            nrows=rows
+        )
         
         return {
             "dataset_id": dataset_id,
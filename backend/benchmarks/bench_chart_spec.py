@@ -0,0 +1,105 @@
+"""
+图表构建基准测试 - Plotly Figure往返序列化 vs 直接生成图表规格
+
+运行方式（在backend目录下）：
+    python benchmarks/bench_chart_spec.py
+"""
+import os
+import sys
+import json
+import time
+
+import numpy as np
+import plotly.graph_objects as go
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import chart_spec
+
+REPEATS = 50
+
+
+def plotly_histogram(centers, counts, widths):
+    fig = go.Figure(data=go.Bar(x=centers.tolist(), y=counts.tolist(), width=widths.tolist()))
+    fig.update_layout(title="Distribution", xaxis_title="value", yaxis_title="count", bargap=0)
+    return json.loads(fig.to_json())
+
+
+def spec_histogram(centers, counts, widths):
+    return chart_spec.figure(
+        [chart_spec.bar_trace(x=centers, y=counts, width=widths)],
+        title="Distribution", xaxis_title="value", yaxis_title="count", bargap=0
+    )
+
+
+def plotly_line(x, y):
+    fig = go.Figure(data=go.Scatter(x=x.tolist(), y=y.tolist(), mode='lines'))
+    fig.update_layout(title="Trend", xaxis_title="index", yaxis_title="value")
+    return json.loads(fig.to_json())
+
+
+def spec_line(x, y):
+    return chart_spec.figure(
+        [chart_spec.line_trace(x=x, y=y)],
+        title="Trend", xaxis_title="index", yaxis_title="value"
+    )
+
+
+def plotly_heatmap(z, labels):
+    fig = go.Figure(data=go.Heatmap(z=z, x=labels, y=labels, colorscale='RdBu', zmid=0))
+    fig.update_layout(title="Correlation Heatmap")
+    return json.loads(fig.to_json())
+
+
+def spec_heatmap(z, labels):
+    return chart_spec.figure(
+        [chart_spec.heatmap_trace(z=z, x=labels, y=labels, colorscale='RdBu', zmid=0)],
+        title="Correlation Heatmap"
+    )
+
+
+def measure(builder, *args):
+    """返回(平均构建毫秒数, 构建+序列化毫秒数, 序列化字节数)"""
+    # 预热（Plotly首次构建会加载校验器）
+    builder(*args)
+
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        builder(*args)
+    build_ms = (time.perf_counter() - start) / REPEATS * 1000
+
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        payload = json.dumps(builder(*args))
+    total_ms = (time.perf_counter() - start) / REPEATS * 1000
+
+    return build_ms, total_ms, len(payload)
+
+
+def main():
+    rng = np.random.default_rng(0)
+
+    counts, edges = np.histogram(rng.normal(size=100000), bins=30)
+    hist_args = ((edges[:-1] + edges[1:]) / 2, counts, np.diff(edges))
+
+    line_x = np.arange(2000, dtype=np.float64)
+    line_args = (line_x, np.cumsum(rng.normal(size=2000)))
+
+    labels = [f"col_{i}" for i in range(20)]
+    heatmap_args = (np.corrcoef(rng.normal(size=(20, 500))), labels)
+
+    cases = [
+        ("histogram", plotly_histogram, spec_histogram, hist_args),
+        ("line(2000)", plotly_line, spec_line, line_args),
+        ("heatmap(20x20)", plotly_heatmap, spec_heatmap, heatmap_args),
+    ]
+
+    print(f"{'chart':<16}{'path':<8}{'build ms':>10}{'+dumps ms':>11}{'bytes':>9}")
+    for name, plotly_builder, spec_builder, args in cases:
+        for path, builder in (("plotly", plotly_builder), ("spec", spec_builder)):
+            build_ms, total_ms, size = measure(builder, *args)
+            print(f"{name:<16}{path:<8}{build_ms:>10.3f}{total_ms:>11.3f}{size:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+预测模型基准测试 - statsmodels vs NumPy快速模型
+
+在合成序列（趋势+季节+噪声）上比较各模型的拟合预测耗时和留出集RMSE。
+
+运行方式（在backend目录下）：
+    python benchmarks/bench_fast_forecast.py
+"""
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.predictor import TimeSeriesPredictor, fast_forecast
+
+REPEATS = 5
+HORIZON = 12
+SIZES = [60, 200, 1000]
+
+# (显示名称, 模型类型, 对应的statsmodels模型类型)
+CASES = [
+    ("ses", "fast_ses", None),
+    ("holt", "fast_holt", "exponential_smoothing"),
+    ("holt-winters", "fast_holtwinters", "holtwinters"),
+    ("ar / arima", "fast_ar", "arima"),
+]
+
+
+def synthetic_series(n: int, seed: int = 0) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    t = np.arange(n)
+    return pd.Series(10 + 0.05 * t + 3 * np.sin(2 * np.pi * t / 12) + rng.normal(0, 0.8, n))
+
+
+def statsmodels_forecast(train: pd.Series, model_type: str):
+    predictor = TimeSeriesPredictor(file_path=None, file_format=None)
+    if model_type == "arima":
+        return predictor._predict_arima(train, None, HORIZON, order=(1, 1, 1))[0]
+    if model_type == "holtwinters":
+        return predictor._predict_holtwinters(train, None, HORIZON)[0]
+    return predictor._predict_exponential_smoothing(train, None, HORIZON)[0]
+
+
+def measure(forecaster, train: pd.Series, test: np.ndarray):
+    """返回(平均耗时毫秒数, RMSE)"""
+    forecast = forecaster(train)
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        forecaster(train)
+    elapsed_ms = (time.perf_counter() - start) / REPEATS * 1000
+    rmse = float(np.sqrt(np.mean((np.asarray(forecast) - test) ** 2)))
+    return elapsed_ms, rmse
+
+
+def main():
+    warnings.simplefilter("ignore")
+
+    print(f"{'n':>6}  {'model':<14}{'path':<13}{'ms':>10}{'rmse':>9}")
+    for n in SIZES:
+        series = synthetic_series(n + HORIZON)
+        train, test = series[:n], series[n:].to_numpy()
+
+        for name, fast_type, sm_type in CASES:
+            paths = [("numpy", lambda s: fast_forecast(s, fast_type, HORIZON)[0])]
+            if sm_type is not None:
+                paths.append(("statsmodels", lambda s: statsmodels_forecast(s, sm_type)))
+
+            for path, forecaster in paths:
+                elapsed_ms, rmse = measure(forecaster, train, test)
+                print(f"{n:>6}  {name:<14}{path:<13}{elapsed_ms:>10.2f}{rmse:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+本地LLM桩服务 - 模拟OpenAI对话补全接口，用于离线测试AIService
+
+按提示词内容返回固定的JSON回复（分析计划 / 摘要和洞察 / 预测配置），
+要求逐行输出的洞察提示词返回逐行文本；请求带 stream=true 时按字符分块
+以SSE流式返回。可配置响应延迟和随机失败率以验证并发限制、超时和重试行为。
+
+运行方式（在backend目录下）：
+    python benchmarks/llm_stub_server.py
+
+然后以如下环境变量启动后端：
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8901/v1
+
+环境变量：
+    STUB_PORT          监听端口（默认8901）
+    STUB_LATENCY       每次响应前等待的秒数（默认0.2）
+    STUB_FAILURE_RATE  返回503的概率（默认0）
+    STUB_CHUNK_DELAY   流式响应中相邻两块之间的秒数（默认0.02）
+"""
+import os
+import json
+import time
+import random
+import asyncio
+from typing import Any, Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+STUB_PORT = int(os.getenv("STUB_PORT", 8901))
+STUB_LATENCY = float(os.getenv("STUB_LATENCY", 0.2))
+STUB_FAILURE_RATE = float(os.getenv("STUB_FAILURE_RATE", 0))
+STUB_CHUNK_DELAY = float(os.getenv("STUB_CHUNK_DELAY", 0.02))
+# 流式响应每块的字符数
+STUB_CHUNK_CHARS = 4
+
+STUB_INSIGHT_LINES = "这是桩服务生成的摘要。\n- 桩洞察1\n- 桩洞察2\n- 桩洞察3"
+
+app = FastAPI(title="LLM Stub")
+
+# 请求计数，便于观察重试和并发
+stats = {"requests": 0, "failures": 0, "in_flight": 0, "max_in_flight": 0}
+
+
+def _reply_for(prompt: str) -> str:
+    """按提示词中的关键字选择回复文本"""
+    if "逐行输出" in prompt:
+        return STUB_INSIGHT_LINES
+    return json.dumps(_json_reply_for(prompt), ensure_ascii=False)
+
+
+def _json_reply_for(prompt: str) -> Dict[str, Any]:
+    if "分析计划" in prompt:
+        return {
+            "include_distribution": True,
+            "include_correlation": True,
+            "include_trends": True,
+            "include_categories": True,
+            "focus_columns": [],
+            "analysis_type": "descriptive"
+        }
+    if "预测配置" in prompt:
+        return {
+            "model_type": "holtwinters",
+            "forecast_periods": 12,
+            "include_confidence_interval": True,
+            "feature_columns": []
+        }
+    return {
+        "summary": "这是桩服务生成的摘要。",
+        "insights": ["桩洞察1", "桩洞察2", "桩洞察3"]
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    stats["in_flight"] += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+    try:
+        await asyncio.sleep(STUB_LATENCY)
+        if random.random() < STUB_FAILURE_RATE:
+            stats["failures"] += 1
+            return JSONResponse(
+                status_code=503,
+                content={"error": {"message": "stub overloaded", "type": "server_error"}}
+            )
+
+        prompt = body["messages"][-1]["content"]
+        content = _reply_for(prompt)
+        if body.get("stream"):
+            return StreamingResponse(_stream_chunks(content, body.get("model", "stub")), media_type="text/event-stream")
+        return {
+            "id": f"chatcmpl-stub-{stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": len(prompt), "completion_tokens": len(content), "total_tokens": len(prompt) + len(content)}
+        }
+    finally:
+        stats["in_flight"] -= 1
+
+
+async def _stream_chunks(content: str, model: str):
+    """按OpenAI流式格式逐块发送回复"""
+    created = int(time.time())
+    for start in range(0, len(content), STUB_CHUNK_CHARS):
+        chunk = {
+            "id": f"chatcmpl-stub-{stats['requests']}",
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "delta": {"content": content[start:start + STUB_CHUNK_CHARS]},
+                "finish_reason": None
+            }]
+        }
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        await asyncio.sleep(STUB_CHUNK_DELAY)
+    yield "data: [DONE]\n\n"
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="127.0.0.1", port=STUB_PORT)
@@ -5,10 +5,16 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import uvicorn
+import asyncio
 import os
 from dotenv import load_dotenv
 
-from api import upload, analysis, prediction, user
+from api import upload, analysis, prediction, user, jobs, fitted_models
+from services.dataset_cache import dataset_cache
+from services.validation_cache import validation_cache
+from services.executor import shutdown_executors, executor_stats, warm_up_processes
+from services.job_manager import job_manager
+from services.ai_service import close_client, response_cache
 
 # 加载环境变量
 load_dotenv()  # 先加载.env
@@ -35,12 +41,30 @@ app.add_middleware(
 os.makedirs("uploads", exist_ok=True)
 os.makedirs("uploads/datasets", exist_ok=True)
 os.makedirs("uploads/results", exist_ok=True)
+os.makedirs("uploads/jobs", exist_ok=True)
+os.makedirs("uploads/models", exist_ok=True)
 
 # 注册路由
 app.include_router(upload.router, prefix="/api/upload", tags=["Upload"])
 app.include_router(analysis.router, prefix="/api/analysis", tags=["Analysis"])
 app.include_router(prediction.router, prefix="/api/prediction", tags=["Prediction"])
 app.include_router(user.router, prefix="/api/user", tags=["User"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["Jobs"])
+app.include_router(fitted_models.router, prefix="/api/models", tags=["Models"])
+
+@app.on_event("startup")
+async def on_startup():
+    """恢复服务重启前未完成的任务，后台预热模型拟合进程和LLM缓存索引"""
+    job_manager.recover()
+    loop = asyncio.get_running_loop()
+    loop.run_in_executor(None, warm_up_processes)
+    loop.run_in_executor(None, response_cache.load_index)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """关闭执行池和LLM客户端连接池"""
+    shutdown_executors()
+    await close_client()
 
 @app.get("/")
 async def root():
@@ -54,7 +78,13 @@ async def root():
 @app.get("/health")
 async def health_check():
     """健康检查"""
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "dataset_cache": dataset_cache.stats(),
+        "validation_cache": validation_cache.stats(),
+        "llm_cache": response_cache.stats(),
+        "executors": executor_stats()
+    }
 
 if __name__ == "__main__":
     host = os.getenv("HOST", "0.0.0.0")
@@ -17,6 +17,9 @@ class AnalysisRequest(BaseModel):
     dataset_id: str = Field(..., description="数据集ID")
     user_query: str = Field(..., description="用户自然语言需求")
     data_description: Optional[str] = Field(None, description="数据描述")
+    histogram_bins: Optional[int] = Field(30, description="直方图分箱数")
+    histogram_bin_rule: Optional[str] = Field("fixed", description="分箱规则：fixed / fd（Freedman–Diaconis）")
+    max_chart_points: Optional[int] = Field(2000, description="折线图最多显示的点数（超出时降采样）")
 
 class PredictionRequest(BaseModel):
     """预测请求模型"""
@@ -25,6 +28,65 @@ class PredictionRequest(BaseModel):
     prediction_query: str = Field(..., description="预测需求描述")
     model_type: Optional[str] = Field(None, description="模型类型")
     forecast_periods: Optional[int] = Field(10, description="预测周期数")
+    max_chart_points: Optional[int] = Field(2000, description="图表中实际数据最多显示的点数（超出时降采样）")
+    auto_arima: Optional[bool] = Field(True, description="ARIMA模型是否自动搜索阶数")
+    seasonal_period: Optional[int] = Field(None, description="季节周期（为空时ARIMA不搜索季节项，Holt-Winters使用检测到的周期）")
+    backtest_folds: Optional[int] = Field(5, description="自动选择模型时的滚动回测折数（0表示使用启发式规则）")
+    backtest_window: Optional[str] = Field("expanding", description="回测窗口：expanding / sliding")
+    feature_columns: Optional[List[str]] = Field(None, description="随机森林模型使用的外生特征列（为空时使用AI建议的特征列）")
+    forecast_strategy: Optional[str] = Field("recursive", description="随机森林多步预测策略：recursive / direct")
+    date_column: Optional[str] = Field(None, description="时间列（随机森林据此构建星期、月份、月内日期等日历特征）")
+
+class BatchPredictionRequest(BaseModel):
+    """批量预测请求模型"""
+    dataset_id: str = Field(..., description="数据集ID")
+    target_columns: Optional[List[str]] = Field(None, description="目标预测列（多列宽表）")
+    group_by: Optional[str] = Field(None, description="分组键列（长表，每组一个序列）")
+    value_column: Optional[str] = Field(None, description="分组模式下的数值列")
+    model_type: Optional[str] = Field(None, description="模型类型（为空时每个序列自动选择）")
+    forecast_periods: Optional[int] = Field(10, description="预测周期数")
+    auto_arima: Optional[bool] = Field(False, description="ARIMA模型是否逐序列搜索阶数")
+
+class ModelFitRequest(BaseModel):
+    """模型拟合与注册请求"""
+    dataset_id: str = Field(..., description="数据集ID")
+    target_column: str = Field(..., description="目标列")
+    model_type: str = Field("arima", description="模型类型：arima / holtwinters / exponential_smoothing")
+    arima_order: Optional[List[int]] = Field(None, description="ARIMA阶数(p,d,q)，为空时自动搜索")
+    seasonal_period: Optional[int] = Field(None, description="季节周期")
+    refit: Optional[bool] = Field(False, description="已存在相同配置的模型时是否重新拟合")
+
+class ModelForecastRequest(BaseModel):
+    """已注册模型的预测请求"""
+    forecast_periods: int = Field(10, description="预测周期数")
+
+class ModelAppendRequest(BaseModel):
+    """向已注册模型追加观测"""
+    values: List[float] = Field(..., description="按时间顺序追加的新观测")
+
+class FittedModelInfo(BaseModel):
+    """已注册模型的元数据"""
+    model_id: str
+    dataset_id: str
+    target_column: str
+    model_type: str
+    nobs: int = Field(..., description="模型当前包含的观测数")
+    appended: int = Field(0, description="注册后追加的观测数")
+    order: Optional[List[int]] = None
+    seasonal_order: Optional[List[int]] = None
+    seasonal_periods: Optional[int] = None
+    aic: Optional[float] = None
+    bic: Optional[float] = None
+    created_at: datetime
+    updated_at: datetime
+
+class ModelForecastResult(BaseModel):
+    """已注册模型的预测结果"""
+    model_id: str
+    predictions: List[float]
+    confidence_intervals: Optional[List[Dict[str, float]]] = None
+    nobs: int
+    elapsed: float = Field(..., description="预测耗时（秒）")
 
 class DatasetInfo(BaseModel):
     """数据集信息"""
@@ -36,6 +98,8 @@ class DatasetInfo(BaseModel):
     columns: int
     column_names: List[str]
     data_types: Dict[str, str]
+    content_hash: Optional[str] = None
+    size_bytes: Optional[int] = None
     description: Optional[str] = None
 
 class ChartConfig(BaseModel):
@@ -54,6 +118,8 @@ class AnalysisResult(BaseModel):
     charts: List[ChartConfig] = Field(..., description="生成的图表")
     statistics: Dict[str, Any] = Field(..., description="统计数据")
     created_at: datetime
+    stage_timings: Optional[Dict[str, float]] = Field(None, description="各阶段耗时（秒）")
+    prompt_tokens: Optional[Dict[str, int]] = Field(None, description="各次LLM调用提示词的估算token数")
 
 class PredictionResult(BaseModel):
     """预测结果"""
@@ -68,6 +134,25 @@ class PredictionResult(BaseModel):
     chart: ChartConfig
     created_at: datetime
 
+class JobStage(BaseModel):
+    """任务阶段"""
+    name: str
+    status: str  # "pending" / "running" / "completed" / "failed"
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class JobStatus(BaseModel):
+    """异步任务状态"""
+    job_id: str
+    job_type: str  # "analysis" or "prediction"
+    state: str  # "pending" / "running" / "succeeded" / "failed"
+    progress: float = Field(..., description="已完成阶段比例（0-1）")
+    stages: List[JobStage] = Field(..., description="各阶段进度")
+    result_id: Optional[str] = Field(None, description="分析或预测结果ID")
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
 class WorkRecord(BaseModel):
     """工作记录卡片"""
     record_id: str
@@ -2,21 +2,440 @@
 AI服务 - 使用OpenAI API处理自然语言
 """
 import os
-from typing import Dict, Any, List, Tuple
+import re
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple, Callable
 import json
-from openai import OpenAI
+
+import httpx
+from openai import (
+    AsyncOpenAI,
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+
+from services.prompt_digest import build_digest, estimate_tokens, PROMPT_TOKEN_BUDGET
+
+# 使用的模型
+LLM_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+# 同时进行中的LLM请求数上限
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+# 单次请求的超时（秒）
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30))
+# 可重试错误的最大重试次数
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+# 重试退避的基数和上限（秒）
+LLM_RETRY_BASE = float(os.getenv("LLM_RETRY_BASE", 0.5))
+LLM_RETRY_MAX = float(os.getenv("LLM_RETRY_MAX", 8))
+# 连接池中保持的空闲连接数
+LLM_KEEPALIVE = int(os.getenv("LLM_KEEPALIVE", LLM_MAX_CONCURRENCY))
+
+# LLM响应缓存目录、有效期（秒）、条目数和磁盘占用上限
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "uploads/llm_cache")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 2000))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "True").lower() == "true"
+
+# 可以重试的错误：连接失败、超时、限流和服务端5xx
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError)
+
+_client: Optional[AsyncOpenAI] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def get_client() -> Optional[AsyncOpenAI]:
+    """
+    进程内共享的异步OpenAI客户端（未配置OPENAI_API_KEY时返回None）
+
+    所有AIService实例复用同一个httpx连接池，避免每个请求重新建立TLS连接。
+    重试由 AIService._chat 统一处理，客户端自身不再重试。OPENAI_BASE_URL
+    可指向本地桩服务（见 benchmarks/llm_stub_server.py）以离线测试。
+    """
+    global _client
+    if _client is None:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            return None
+        _client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+            max_retries=0,
+            timeout=LLM_TIMEOUT,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONCURRENCY,
+                    max_keepalive_connections=LLM_KEEPALIVE
+                ),
+                timeout=LLM_TIMEOUT
+            )
+        )
+    return _client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """限制并发LLM请求数的信号量（在事件循环中首次使用时创建）"""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def close_client():
+    """关闭共享客户端及其连接池"""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def _retry_delay(attempt: int) -> float:
+    """第attempt次重试前的等待时间：指数退避加全抖动"""
+    return random.uniform(0, min(LLM_RETRY_MAX, LLM_RETRY_BASE * (2 ** attempt)))
+
+
+def normalize_prompt(prompt: str) -> str:
+    """规范化提示词：去除首尾空白并合并连续空白（提示词模板的缩进不影响缓存键）"""
+    return re.sub(r"\s+", " ", prompt.strip())
+
+
+def response_cache_key(model: str, temperature: float, system_prompt: str, prompt: str) -> str:
+    """根据模型、温度和规范化提示词生成缓存键"""
+    payload = json.dumps(
+        [model, round(float(temperature), 4), normalize_prompt(system_prompt), normalize_prompt(prompt)],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    LLM响应的磁盘缓存
+
+    每个条目保存为 {cache_dir}/{key}.json。进程内维护条目元数据
+    （写入时间、字节数）的LRU索引，首次使用时扫描目录重建，按文件修改时间
+    恢复先后顺序。读取时过期的条目直接删除；条目数或总字节数超出上限时
+    淘汰最久未使用的条目。只缓存已成功解析的JSON回复。
+
+    get/put 会读写磁盘，在事件循环中使用 aget/aput（在默认线程池中执行）。
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = LLM_CACHE_DIR,
+        ttl: float = LLM_CACHE_TTL,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        max_bytes: int = LLM_CACHE_MAX_BYTES
+    ):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._index: "Optional[OrderedDict[str, Tuple[float, int]]]" = None
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _ensure_index(self) -> "OrderedDict[str, Tuple[float, int]]":
+        """首次使用时从缓存目录重建索引（调用方持有锁）"""
+        if self._index is None:
+            entries = []
+            if os.path.isdir(self.cache_dir):
+                for name in os.listdir(self.cache_dir):
+                    if not name.endswith(".json"):
+                        continue
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                    entries.append((stat.st_mtime, name[:-5], stat.st_size))
+            self._index = OrderedDict(
+                (key, (created_at, size)) for created_at, key, size in sorted(entries)
+            )
+            self.current_bytes = sum(size for _, size in self._index.values())
+        return self._index
+
+    def _remove(self, key: str):
+        """删除条目（调用方持有锁）"""
+        _, size = self._index.pop(key)
+        self.current_bytes -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def load_index(self):
+        """扫描缓存目录建立索引（服务启动时在线程中预先执行）"""
+        with self._lock:
+            self._ensure_index()
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存的回复，未命中或已过期返回None"""
+        with self._lock:
+            index = self._ensure_index()
+            entry = index.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.time() - entry[0] > self.ttl:
+                self._remove(key)
+                self.expired += 1
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    value = json.load(f)["response"]
+            except (OSError, ValueError, KeyError):
+                self._remove(key)
+                self.misses += 1
+                return None
+            index.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any):
+        """写入回复（原子替换），超出上限时淘汰最久未使用的条目"""
+        data = json.dumps({"created_at": time.time(), "response": value}, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            index = self._ensure_index()
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(key)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+            if key in index:
+                self.current_bytes -= index.pop(key)[1]
+            index[key] = (time.time(), size)
+            self.current_bytes += size
+
+            while index and (len(index) > self.max_entries or self.current_bytes > self.max_bytes):
+                self._remove(next(iter(index)))
+                self.evictions += 1
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """get的异步版本，磁盘I/O不阻塞事件循环"""
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, key)
+
+    async def aput(self, key: str, value: Any):
+        """put的异步版本，磁盘I/O不阻塞事件循环"""
+        await asyncio.get_running_loop().run_in_executor(None, self.put, key, value)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            index = self._ensure_index()
+            for key in list(index):
+                self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息（不读磁盘，索引尚未建立时条目数为None）"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": LLM_CACHE_ENABLED,
+                "entries": len(self._index) if self._index is not None else None,
+                "current_bytes": self.current_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "expired": self.expired,
+                "evictions": self.evictions
+            }
+
+
+# 进程内共享的LLM响应缓存
+response_cache = ResponseCache()
+
+
+# 洞察回复格式：一次性返回时要求JSON，流式返回时要求逐行文本（便于边收边显示）
+INSIGHTS_JSON_FORMAT = """返回JSON格式：
+        {
+            "summary": "一段简洁的摘要（2-3句话）",
+            "insights": ["洞察1", "洞察2", "洞察3"]
+        }
+        
+        只返回JSON，不要其他文字。"""
+INSIGHTS_LINE_FORMAT = """按以下格式逐行输出，不要使用JSON或其他文字：
+        第一行是一段简洁的摘要（2-3句话）
+        之后每行以"- "开头写一条洞察"""
+
+_BULLET = re.compile(r"^\s*(?:[-*•·]|\d+[.、)）])\s*")
+
+
+def parse_insights_text(text: str) -> Tuple[str, List[str]]:
+    """解析逐行格式的洞察回复，返回(摘要, 洞察列表)；格式不符时抛出ValueError"""
+    summary_lines, insights = [], []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if _BULLET.match(line):
+            insights.append(_BULLET.sub("", line, count=1))
+        elif not insights:
+            summary_lines.append(line)
+    if not summary_lines or not insights:
+        raise ValueError("洞察回复格式不正确")
+    return " ".join(summary_lines), insights
+
 
 class AIService:
     """AI服务类"""
     
     def __init__(self):
-        api_key = os.getenv("OPENAI_API_KEY")
-        if api_key:
-            self.client = OpenAI(api_key=api_key)
-            self.enabled = True
-        else:
-            self.client = None
-            self.enabled = False
+        self.client = get_client()
+        self.enabled = self.client is not None
+        # 各方法最近一次调用的提示词token估算值
+        self.prompt_tokens: Dict[str, int] = {}
+        # 调用失败、改用默认结果的方法（按purpose记录），这类结果不应被记忆
+        self.fallbacks: List[str] = []
+    
+    async def _chat(self, system_prompt: str, prompt: str, temperature: float) -> str:
+        """
+        调用对话补全接口，返回回复文本
+
+        并发数受全局信号量限制（等待信号量的时间不计入超时）；连接失败、
+        超时、限流和5xx错误按指数退避加随机抖动重试，其余错误直接抛出。
+        """
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+        attempt = 0
+        while True:
+            try:
+                async with _get_semaphore():
+                    response = await self.client.chat.completions.create(
+                        model=LLM_MODEL,
+                        messages=messages,
+                        temperature=temperature,
+                        timeout=LLM_TIMEOUT
+                    )
+                return response.choices[0].message.content
+            except RETRYABLE_ERRORS:
+                if attempt >= LLM_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(_retry_delay(attempt))
+                attempt += 1
+
+    async def _chat_stream(
+        self,
+        system_prompt: str,
+        prompt: str,
+        temperature: float,
+        on_delta: Callable[[str], None]
+    ) -> str:
+        """
+        以流式方式调用对话补全接口，每收到一段文本调用on_delta，返回完整文本
+
+        只有在收到第一段文本之前发生的可重试错误才会重试，之后重试会让
+        调用方收到重复的文本。信号量在整个流读取期间保持占用。
+        """
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+        attempt = 0
+        while True:
+            received: List[str] = []
+            try:
+                async with _get_semaphore():
+                    stream = await self.client.chat.completions.create(
+                        model=LLM_MODEL,
+                        messages=messages,
+                        temperature=temperature,
+                        timeout=LLM_TIMEOUT,
+                        stream=True
+                    )
+                    async for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            received.append(delta)
+                            on_delta(delta)
+                return "".join(received)
+            except RETRYABLE_ERRORS:
+                if received or attempt >= LLM_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(_retry_delay(attempt))
+                attempt += 1
+
+    async def _chat_text_stream(
+        self,
+        system_prompt: str,
+        prompt: str,
+        temperature: float,
+        on_delta: Callable[[str], None],
+        parse: Callable[[str], Any],
+        purpose: Optional[str] = None
+    ) -> Any:
+        """
+        流式调用并用parse解析完整回复
+
+        与 _chat_json 共用响应缓存：命中时把缓存的文本作为一段整体交给
+        on_delta；只有parse成功的回复才写入缓存。
+        """
+        if purpose:
+            self.prompt_tokens[purpose] = estimate_tokens(
+                normalize_prompt(system_prompt) + normalize_prompt(prompt)
+            )
+        key = response_cache_key(LLM_MODEL, temperature, system_prompt, prompt)
+        if LLM_CACHE_ENABLED:
+            cached = await response_cache.aget(key)
+            if isinstance(cached, str):
+                on_delta(cached)
+                return parse(cached)
+
+        text = await self._chat_stream(system_prompt, prompt, temperature, on_delta)
+        result = parse(text)
+        if LLM_CACHE_ENABLED:
+            await response_cache.aput(key, text)
+        return result
+
+    async def _chat_json(
+        self,
+        system_prompt: str,
+        prompt: str,
+        temperature: float,
+        purpose: Optional[str] = None
+    ) -> Any:
+        """
+        调用对话补全接口并解析JSON回复
+
+        模型、温度和规范化提示词相同的请求直接返回缓存的回复；只有成功
+        解析的回复才写入缓存，解析失败时抛出异常由调用方回退到默认值。
+        提示词的token估算值按purpose记入 self.prompt_tokens。
+        """
+        if purpose:
+            self.prompt_tokens[purpose] = estimate_tokens(
+                normalize_prompt(system_prompt) + normalize_prompt(prompt)
+            )
+        key = response_cache_key(LLM_MODEL, temperature, system_prompt, prompt)
+        if LLM_CACHE_ENABLED:
+            cached = await response_cache.aget(key)
+            if cached is not None:
+                return cached
+
+        result = json.loads(await self._chat(system_prompt, prompt, temperature))
+        if LLM_CACHE_ENABLED:
+            await response_cache.aput(key, result)
+        return result
     
     async def generate_analysis_plan(
         self,
@@ -59,20 +478,16 @@ class AIService:
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "你是一个专业的数据分析助手。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3
+            plan = await self._chat_json(
+                "你是一个专业的数据分析助手。",
+                prompt,
+                temperature=0.3,
+                purpose="analysis_plan"
             )
-            
-            content = response.choices[0].message.content
-            plan = json.loads(content)
             return plan
         except Exception as e:
             # 如果AI调用失败，返回默认计划
+            self.fallbacks.append("analysis_plan")
             return {
                 "include_distribution": True,
                 "include_correlation": True,
@@ -85,10 +500,17 @@ class AIService:
         statistics: Dict[str, Any],
         data_description: str,
         user_query: str,
-        column_info: Dict[str, Any]
+        column_info: Dict[str, Any],
+        correlations: Optional[List[Dict[str, Any]]] = None,
+        token_budget: int = PROMPT_TOKEN_BUDGET,
+        on_delta: Optional[Callable[[str], None]] = None
     ) -> Tuple[str, List[str]]:
         """
         生成分析摘要和关键洞察
+        
+        统计信息不再完整写入提示词，而是按列的关注度压缩为token_budget以内
+        的表格摘要（见 services/prompt_digest.py）；列信息只保留文件名。
+        提供on_delta时以流式方式调用，回复文本边生成边交给on_delta。
         """
         if not self.enabled:
             # 如果没有API key，返回基础摘要
@@ -100,42 +522,43 @@ class AIService:
             ]
             return summary, insights
         
+        digest = build_digest(statistics, correlations, token_budget)
         prompt = f"""
         基于以下数据分析结果，生成一个简洁的中文摘要和3-5个关键洞察。
         
         数据描述：{data_description}
         用户需求：{user_query}
         
-        统计信息：
-        {json.dumps(statistics, ensure_ascii=False, indent=2)}
+        文件：{column_info.get("filename", "")}
         
-        列信息：
-        {json.dumps(column_info, ensure_ascii=False, indent=2)}
-        
-        返回JSON格式：
-        {{
-            "summary": "一段简洁的摘要（2-3句话）",
-            "insights": ["洞察1", "洞察2", "洞察3"]
-        }}
+        统计摘要：
+        {digest["text"]}
         
-        只返回JSON，不要其他文字。洞察应该是具体的、有价值的发现。
+        {INSIGHTS_JSON_FORMAT if on_delta is None else INSIGHTS_LINE_FORMAT}
+        洞察应该是具体的、有价值的发现。
         """
+        system_prompt = "你是一个专业的数据分析师，善于从数据中发现洞察。"
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "你是一个专业的数据分析师，善于从数据中发现洞察。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.5
+            if on_delta is not None:
+                return await self._chat_text_stream(
+                    system_prompt,
+                    prompt,
+                    temperature=0.5,
+                    on_delta=on_delta,
+                    parse=parse_insights_text,
+                    purpose="insights"
+                )
+            result = await self._chat_json(
+                system_prompt,
+                prompt,
+                temperature=0.5,
+                purpose="insights"
             )
-            
-            content = response.choices[0].message.content
-            result = json.loads(content)
             return result["summary"], result["insights"]
         except Exception as e:
             # 如果AI调用失败，返回基础摘要
+            self.fallbacks.append("insights")
             summary = f"数据包含 {statistics['shape']['rows']} 行和 {statistics['shape']['columns']} 列。已完成基础统计分析。"
             insights = [
                 "数据质量良好，可进行进一步分析",
@@ -172,7 +595,7 @@ class AIService:
         
         请生成一个预测配置。返回JSON格式：
         {{
-            "model_type": "arima/holtwinters/exponential_smoothing",
+            "model_type": "arima/holtwinters/exponential_smoothing/random_forest",
             "forecast_periods": 预测周期数（整数）,
             "include_confidence_interval": 是否包含置信区间（布尔值）,
             "feature_columns": 可能有用的特征列（列表，如果是时间序列预测可以为空）
@@ -182,19 +605,15 @@ class AIService:
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "你是一个专业的数据科学家，擅长预测模型选择。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3
+            config = await self._chat_json(
+                "你是一个专业的数据科学家，擅长预测模型选择。",
+                prompt,
+                temperature=0.3,
+                purpose="prediction_config"
             )
-            
-            content = response.choices[0].message.content
-            config = json.loads(content)
             return config
         except Exception as e:
+            self.fallbacks.append("prediction_config")
             return {
                 "model_type": "arima",
                 "forecast_periods": 10,
@@ -3,12 +3,46 @@
 """
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from typing import List, Dict, Any, Optional
-import json
+from typing import List, Dict, Any, Optional, Tuple
 
 from models.schemas import ChartConfig
+from services.dataset_cache import dataset_cache
+from services.stats_kernel import numeric_statistics, categorical_statistics
+from services.downsampling import downsample_line, DEFAULT_MAX_POINTS
+from services.prompt_digest import strong_correlations
+from services import chart_spec
+
+# 直方图默认分箱数和上限
+DEFAULT_HISTOGRAM_BINS = 30
+MAX_HISTOGRAM_BINS = 200
+
+def compute_histogram(
+    values: np.ndarray,
+    bins: int = DEFAULT_HISTOGRAM_BINS,
+    bin_rule: str = "fixed"
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    使用NumPy计算直方图
+    
+    Returns:
+        (各箱计数, 箱边界)
+    """
+    values = values[np.isfinite(values)]
+    bins = max(1, min(int(bins), MAX_HISTOGRAM_BINS))
+    
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(1)
+    
+    if bin_rule == "fd":
+        # Freedman–Diaconis：箱宽 = 2 * IQR / n^(1/3)
+        q25, q75 = np.percentile(values, [25, 75])
+        width = 2 * (q75 - q25) / np.cbrt(len(values))
+        value_range = values.max() - values.min()
+        if width > 0 and value_range > 0:
+            bins = int(np.clip(np.ceil(value_range / width), 1, MAX_HISTOGRAM_BINS))
+    
+    counts, edges = np.histogram(values, bins=bins)
+    return counts, edges
 
 class DataAnalyzer:
     """数据分析器"""
@@ -20,16 +54,7 @@ class DataAnalyzer:
     
     def load_data(self) -> pd.DataFrame:
         """加载数据"""
-        if self.file_format == 'csv':
-            self.df = pd.read_csv(self.file_path)
-        elif self.file_format == 'json':
-            self.df = pd.read_json(self.file_path)
-        elif self.file_format == 'txt':
-            try:
-                self.df = pd.read_csv(self.file_path, sep='\t')
-            except:
-                self.df = pd.read_csv(self.file_path, sep=',')
-        
+        self.df = dataset_cache.load(self.file_path, self.file_format)
         return self.df
     
     def get_basic_statistics(self) -> Dict[str, Any]:
@@ -47,43 +72,51 @@ class DataAnalyzer:
             "data_types": {}
         }
         
-        # 数值列统计
+        # 数值列统计（批量向量化计算）
         numeric_cols = self.df.select_dtypes(include=[np.number]).columns.tolist()
+        numeric_stats, numeric_missing = numeric_statistics(self.df, numeric_cols)
         for col in numeric_cols:
-            stats["columns"][col] = {
-                "mean": float(self.df[col].mean()),
-                "median": float(self.df[col].median()),
-                "std": float(self.df[col].std()),
-                "min": float(self.df[col].min()),
-                "max": float(self.df[col].max()),
-                "q25": float(self.df[col].quantile(0.25)),
-                "q75": float(self.df[col].quantile(0.75))
-            }
-            stats["missing_values"][col] = int(self.df[col].isna().sum())
+            stats["columns"][col] = numeric_stats[col]
+            stats["missing_values"][col] = numeric_missing[col]
             stats["data_types"][col] = "numeric"
         
         # 分类列统计
         categorical_cols = self.df.select_dtypes(include=['object']).columns.tolist()
+        categorical_stats, categorical_missing = categorical_statistics(self.df, categorical_cols)
         for col in categorical_cols:
-            value_counts = self.df[col].value_counts()
-            stats["columns"][col] = {
-                "unique_values": int(self.df[col].nunique()),
-                "most_common": str(value_counts.index[0]) if len(value_counts) > 0 else None,
-                "most_common_count": int(value_counts.iloc[0]) if len(value_counts) > 0 else 0
-            }
-            stats["missing_values"][col] = int(self.df[col].isna().sum())
+            stats["columns"][col] = categorical_stats[col]
+            stats["missing_values"][col] = categorical_missing[col]
             stats["data_types"][col] = "categorical"
         
         return stats
     
+    def get_strong_correlations(self) -> List[Dict[str, Any]]:
+        """获取数值列之间的强相关列对（用于生成洞察的提示词）"""
+        if self.df is None:
+            self.load_data()
+        return strong_correlations(self.df)
+    
     def has_numeric_columns(self) -> bool:
         """检查是否有数值列"""
         if self.df is None:
             self.load_data()
         return len(self.df.select_dtypes(include=[np.number]).columns) > 0
     
-    def create_distribution_charts(self) -> List[ChartConfig]:
-        """创建分布图表"""
+    def create_distribution_charts(
+        self,
+        bins: int = DEFAULT_HISTOGRAM_BINS,
+        bin_rule: str = "fixed"
+    ) -> List[ChartConfig]:
+        """
+        创建分布图表
+        
+        直方图在服务端完成分箱，图表中只包含各箱的中心、宽度和计数，
+        数据量与箱数相关而与行数无关。
+        
+        Args:
+            bins: 分箱数（bin_rule为"fixed"时使用）
+            bin_rule: 分箱规则，"fixed"或"fd"（Freedman–Diaconis）
+        """
         if self.df is None:
             self.load_data()
         
@@ -92,21 +125,33 @@ class DataAnalyzer:
         
         # 限制最多显示5个数值列的分布
         for col in numeric_cols[:5]:
-            # 使用Plotly创建直方图
-            fig = px.histogram(
-                self.df,
-                x=col,
+            values = self.df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            counts, edges = compute_histogram(values, bins=bins, bin_rule=bin_rule)
+            
+            # 使用预先分好的箱创建条形图
+            chart_data = chart_spec.figure(
+                [chart_spec.bar_trace(
+                    x=(edges[:-1] + edges[1:]) / 2,
+                    y=counts,
+                    width=np.diff(edges),
+                    name=col
+                )],
                 title=f"Distribution of {col}",
-                nbins=30
+                xaxis_title=col,
+                yaxis_title="count",
+                bargap=0
             )
             
-            chart_data = json.loads(fig.to_json())
-            
             charts.append(ChartConfig(
                 type="histogram",
                 title=f"{col} Distribution",
                 data=chart_data,
-                config={"column": col}
+                config={
+                    "column": col,
+                    "bin_rule": bin_rule,
+                    "bin_count": int(len(counts)),
+                    "bin_edges": edges.tolist()
+                }
             ))
         
         return charts
@@ -124,23 +169,20 @@ class DataAnalyzer:
         # 计算相关系数
         corr_matrix = numeric_df.corr()
         
-        # 使用Plotly创建热力图
-        fig = go.Figure(data=go.Heatmap(
-            z=corr_matrix.values,
-            x=corr_matrix.columns.tolist(),
-            y=corr_matrix.columns.tolist(),
-            colorscale='RdBu',
-            zmid=0
-        ))
-        
-        fig.update_layout(
+        # 创建热力图
+        chart_data = chart_spec.figure(
+            [chart_spec.heatmap_trace(
+                z=corr_matrix.values,
+                x=corr_matrix.columns.tolist(),
+                y=corr_matrix.columns.tolist(),
+                colorscale='RdBu',
+                zmid=0
+            )],
             title="Correlation Heatmap",
             xaxis_title="Variables",
             yaxis_title="Variables"
         )
         
-        chart_data = json.loads(fig.to_json())
-        
         return ChartConfig(
             type="heatmap",
             title="Correlation Analysis",
@@ -148,8 +190,13 @@ class DataAnalyzer:
             config={"correlation_matrix": corr_matrix.to_dict()}
         )
     
-    def create_trend_charts(self) -> List[ChartConfig]:
-        """创建趋势图表"""
+    def create_trend_charts(self, max_points: int = DEFAULT_MAX_POINTS) -> List[ChartConfig]:
+        """
+        创建趋势图表
+        
+        Args:
+            max_points: 每条折线最多保留的点数，超出时使用LTTB降采样
+        """
         if self.df is None:
             self.load_data()
         
@@ -158,21 +205,29 @@ class DataAnalyzer:
         
         # 如果数据有索引列或时间列，创建趋势图
         if len(numeric_cols) > 0:
+            positions = np.arange(len(self.df))
+            
             # 限制最多3个趋势图
             for col in numeric_cols[:3]:
-                fig = px.line(
-                    self.df,
-                    y=col,
-                    title=f"Trend of {col}"
-                )
+                values = self.df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+                x, y = downsample_line(positions, values, max_points)
                 
-                chart_data = json.loads(fig.to_json())
+                chart_data = chart_spec.figure(
+                    [chart_spec.line_trace(x=x, y=y, name=col)],
+                    title=f"Trend of {col}",
+                    xaxis_title="index",
+                    yaxis_title=col
+                )
                 
                 charts.append(ChartConfig(
                     type="line",
                     title=f"{col} Trend",
                     data=chart_data,
-                    config={"column": col}
+                    config={
+                        "column": col,
+                        "original_points": int(len(values)),
+                        "displayed_points": int(len(x))
+                    }
                 ))
         
         return charts
@@ -189,16 +244,17 @@ class DataAnalyzer:
         for col in categorical_cols[:3]:
             value_counts = self.df[col].value_counts().head(10)
             
-            # 使用Plotly创建条形图
-            fig = px.bar(
-                x=value_counts.index.tolist(),
-                y=value_counts.values.tolist(),
+            # 创建条形图
+            chart_data = chart_spec.figure(
+                [chart_spec.bar_trace(
+                    x=value_counts.index.tolist(),
+                    y=value_counts.values
+                )],
                 title=f"Distribution of {col}",
-                labels={'x': col, 'y': 'Count'}
+                xaxis_title=col,
+                yaxis_title="Count"
             )
             
-            chart_data = json.loads(fig.to_json())
-            
             charts.append(ChartConfig(
                 type="bar",
                 title=f"{col} Distribution",
@@ -221,13 +277,14 @@ class DataAnalyzer:
         # 限制最多4个变量
         cols = numeric_df.columns[:4].tolist()
         
-        fig = px.scatter_matrix(
-            numeric_df[cols],
+        chart_data = chart_spec.figure(
+            [chart_spec.splom_trace({
+                col: numeric_df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+                for col in cols
+            })],
             title="Scatter Matrix"
         )
         
-        chart_data = json.loads(fig.to_json())
-        
         return ChartConfig(
             type="scatter_matrix",
             title="Variable Relationships",
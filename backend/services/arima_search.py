@@ -0,0 +1,223 @@
+"""
+ARIMA阶数搜索 - 在可终止进程中并行评估候选(p,d,q)
+"""
+import os
+import time
+import asyncio
+import warnings
+import itertools
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from statsmodels.tsa.arima.model import ARIMA
+from statsmodels.tsa.stattools import adfuller
+
+from services.executor import (
+    run_in_thread, run_killable, ExecutorBusyError, TaskTimeoutError, ProcessCrashedError,
+    PROCESS_WORKERS
+)
+
+# 搜索范围和预算
+MAX_P = int(os.getenv("ARIMA_MAX_P", 3))
+MAX_D = int(os.getenv("ARIMA_MAX_D", 2))
+MAX_Q = int(os.getenv("ARIMA_MAX_Q", 3))
+SEARCH_BUDGET = float(os.getenv("ARIMA_SEARCH_BUDGET", 20))
+FIT_MAXITER = int(os.getenv("ARIMA_FIT_MAXITER", 50))
+
+DEFAULT_ORDER = (1, 1, 1)
+
+
+def select_differencing(values: np.ndarray, max_d: int = MAX_D) -> int:
+    """用ADF检验确定差分阶数：差分到平稳为止（最多max_d阶）"""
+    current = values
+    for d in range(max_d + 1):
+        if len(current) < 10:
+            return d
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                if adfuller(current, autolag="AIC")[1] < 0.05:
+                    return d
+        except Exception:
+            return d
+        current = np.diff(current)
+    return max_d
+
+
+def _fit_candidate(
+    values: np.ndarray,
+    order: Tuple[int, int, int],
+    seasonal_order: Tuple[int, int, int, int],
+    maxiter: int
+) -> Dict[str, Any]:
+    """拟合单个候选模型（在工作进程中执行）"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        try:
+            fit = ARIMA(values, order=order, seasonal_order=seasonal_order).fit(
+                method_kwargs={"maxiter": maxiter}
+            )
+        except Exception as e:
+            return {"order": order, "seasonal_order": seasonal_order, "error": str(e)}
+
+    converged = bool(fit.mle_retvals.get("converged", True)) if fit.mle_retvals else True
+    return {
+        "order": order,
+        "seasonal_order": seasonal_order,
+        "aic": float(fit.aic),
+        "bic": float(fit.bic),
+        "converged": converged
+    }
+
+
+def candidate_orders(
+    d: int,
+    max_p: int = MAX_P,
+    max_q: int = MAX_Q,
+    seasonal_period: Optional[int] = None
+) -> List[Tuple[Tuple[int, int, int], Tuple[int, int, int, int]]]:
+    """生成候选(order, seasonal_order)，按模型复杂度从低到高排列"""
+    seasonal_orders = [(0, 0, 0, 0)]
+    if seasonal_period and seasonal_period >= 2:
+        seasonal_orders += [
+            (P, 0, Q, seasonal_period) for P, Q in [(1, 0), (0, 1), (1, 1)]
+        ]
+
+    candidates = [
+        ((p, d, q), seasonal)
+        for seasonal in seasonal_orders
+        for p, q in itertools.product(range(max_p + 1), range(max_q + 1))
+    ]
+    return sorted(candidates, key=lambda c: sum(c[0]) + sum(c[1][:3]))
+
+
+def _prepare_search(
+    series,
+    seasonal_period: Optional[int] = None
+) -> Tuple[np.ndarray, List[Tuple[Tuple[int, int, int], Tuple[int, int, int, int]]]]:
+    """确定差分阶数并生成候选，返回(观测值, 候选列表)"""
+    values = np.asarray(series.dropna() if hasattr(series, "dropna") else series, dtype=np.float64)
+
+    d = select_differencing(values)
+    candidates = candidate_orders(d, seasonal_period=seasonal_period)
+    # 季节项需要足够多的完整周期
+    if seasonal_period:
+        candidates = [c for c in candidates if c[1][3] == 0 or len(values) >= 3 * seasonal_period]
+    return values, candidates
+
+
+def _summarize_search(
+    results: List[Dict[str, Any]],
+    criterion: str,
+    timed_out: bool,
+    start: float
+) -> Dict[str, Any]:
+    """在收敛的候选中按准则选出最优阶数，没有可用候选时使用默认阶数"""
+    valid = [
+        r for r in results
+        if "error" not in r and r.get("converged") and np.isfinite(r.get(criterion, np.nan))
+    ]
+
+    if valid:
+        best = min(valid, key=lambda r: r[criterion])
+        order, seasonal_order, score = best["order"], best["seasonal_order"], best[criterion]
+    else:
+        order, seasonal_order, score = DEFAULT_ORDER, (0, 0, 0, 0), None
+
+    return {
+        "order": tuple(order),
+        "seasonal_order": tuple(seasonal_order),
+        "criterion": criterion,
+        "score": score,
+        "evaluated": len(results),
+        "pruned": len(results) - len(valid),
+        "timed_out": timed_out,
+        "elapsed": round(time.monotonic() - start, 3)
+    }
+
+
+def select_arima_order(
+    series,
+    seasonal_period: Optional[int] = None,
+    criterion: str = "aic",
+    time_budget: float = SEARCH_BUDGET
+) -> Dict[str, Any]:
+    """
+    串行搜索最优ARIMA阶数（在已经运行于工作进程中的代码里使用）
+
+    先用ADF检验确定差分阶数d，再在(p,q)网格（以及可选的季节项）上依次拟合，
+    按AIC/BIC排序。未收敛或拟合失败的候选被剔除；超出时间预算时停止评估
+    剩余候选，仅在已完成的候选中选择。
+
+    Returns:
+        {"order", "seasonal_order", "criterion", "score", "evaluated", "pruned", "timed_out", "elapsed"}
+    """
+    start = time.monotonic()
+    values, candidates = _prepare_search(series, seasonal_period)
+
+    results: List[Dict[str, Any]] = []
+    timed_out = False
+    for order, seasonal_order in candidates:
+        if time.monotonic() - start > time_budget:
+            timed_out = True
+            break
+        results.append(_fit_candidate(values, order, seasonal_order, FIT_MAXITER))
+
+    return _summarize_search(results, criterion, timed_out, start)
+
+
+async def select_arima_order_parallel(
+    series,
+    seasonal_period: Optional[int] = None,
+    criterion: str = "aic",
+    time_budget: float = SEARCH_BUDGET,
+    fit_timeout: Optional[float] = None,
+    max_parallel: int = PROCESS_WORKERS
+) -> Dict[str, Any]:
+    """
+    并行搜索最优ARIMA阶数
+
+    与 select_arima_order 相同的候选和选择规则，但每个候选在独立的可终止
+    进程中拟合（run_killable，受可终止进程的并发和排队上限约束），同时最多
+    max_parallel个。单个候选超出fit_timeout、或整个搜索超出time_budget时
+    终止对应进程；调用方被取消（如客户端断开）时终止所有进程。
+
+    Returns:
+        同 select_arima_order
+    """
+    start = time.monotonic()
+    deadline = start + time_budget
+    values, candidates = await run_in_thread(_prepare_search, series, seasonal_period)
+
+    semaphore = asyncio.Semaphore(max_parallel)
+    timed_out = False
+
+    async def fit_one(order, seasonal_order) -> Optional[Dict[str, Any]]:
+        nonlocal timed_out
+        async with semaphore:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                return None
+            timeout = min(remaining, fit_timeout) if fit_timeout else remaining
+            try:
+                return await run_killable(
+                    _fit_candidate, values, order, seasonal_order, FIT_MAXITER,
+                    timeout=timeout
+                )
+            except TaskTimeoutError:
+                timed_out = timed_out or timeout >= remaining
+                return {"order": order, "seasonal_order": seasonal_order, "error": "拟合超时"}
+            except (ExecutorBusyError, ProcessCrashedError) as e:
+                # 执行队列已满或拟合进程异常退出时跳过该候选，不中止整个搜索
+                return {"order": order, "seasonal_order": seasonal_order, "error": str(e)}
+
+    tasks = [asyncio.ensure_future(fit_one(order, seasonal)) for order, seasonal in candidates]
+    try:
+        outcomes = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    results = [r for r in outcomes if r is not None]
+    return _summarize_search(results, criterion, timed_out, start)
@@ -0,0 +1,241 @@
+"""
+回测服务 - 滚动起点交叉验证
+"""
+import os
+import time
+import asyncio
+import warnings
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.arima.model import ARIMA
+
+from services.arima_search import DEFAULT_ORDER, FIT_MAXITER
+from services.executor import run_killable, TaskTimeoutError, ProcessCrashedError, PROCESS_WORKERS
+
+# 默认参与比较的模型
+DEFAULT_BACKTEST_MODELS = ["arima", "holtwinters", "exponential_smoothing"]
+# 第一折训练集占序列长度的最小比例
+MIN_TRAIN_FRACTION = float(os.getenv("BACKTEST_MIN_TRAIN_FRACTION", 0.5))
+# 整个回测的墙钟时间预算（秒），超出时终止仍在运行的评估进程
+BACKTEST_BUDGET = float(os.getenv("BACKTEST_BUDGET", 30))
+
+# 折：(训练起点, 预测起点, 预测终点)
+Fold = Tuple[int, int, int]
+
+
+def rolling_origin_folds(
+    n: int,
+    n_folds: int,
+    horizon: int,
+    window: str = "expanding"
+) -> List[Fold]:
+    """
+    生成滚动起点的折
+
+    预测起点从序列末尾向前每次后退horizon个点；expanding窗口的训练集
+    始终从0开始，sliding窗口保持与第一折相同的训练长度。
+    训练集不足时减少折数。
+    """
+    min_train = max(10, int(n * MIN_TRAIN_FRACTION))
+    n_folds = max(0, min(n_folds, (n - min_train) // max(horizon, 1)))
+    if n_folds == 0:
+        return []
+
+    origins = [n - horizon * k for k in range(n_folds, 0, -1)]
+    first_train = origins[0]
+
+    folds = []
+    for origin in origins:
+        start = 0 if window == "expanding" else origin - first_train
+        folds.append((start, origin, min(origin + horizon, n)))
+    return folds
+
+
+def _fold_metrics(actual: np.ndarray, forecast: np.ndarray) -> Dict[str, float]:
+    errors = actual - forecast[:len(actual)]
+    mse = float(np.mean(errors ** 2))
+    return {"mse": mse, "mae": float(np.mean(np.abs(errors))), "rmse": float(np.sqrt(mse))}
+
+
+def _evaluate_chunk(
+    values: np.ndarray,
+    model_type: str,
+    folds: List[Fold],
+    arima_order: Tuple[int, int, int] = DEFAULT_ORDER
+) -> List[Dict[str, Any]]:
+    """
+    评估一组相邻的折（在工作进程中执行）
+
+    ARIMA只在该组第一折上估计参数，之后的折保持参数不变，
+    通过状态空间滤波追加新观测（expanding）或在新窗口上重新滤波（sliding），
+    无需重新优化。指数平滑类模型每折重新拟合；Holt-Winters直接拟合，
+    失败时记为该折的错误，不退回简单指数平滑。只计算点预测，不计算预测区间。
+    """
+    # 延迟导入，避免与predictor模块循环依赖
+    from services.predictor import TimeSeriesPredictor, FAST_MODELS, fast_forecast
+
+    predictor = TimeSeriesPredictor(file_path=None, file_format=None)
+    results = []
+    arima_fit = None
+    previous: Optional[Fold] = None
+
+    for fold in folds:
+        start, origin, end = fold
+        train = values[start:origin]
+        actual = values[origin:end]
+        horizon = end - origin
+
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                if model_type == "arima":
+                    if arima_fit is None:
+                        arima_fit = ARIMA(train, order=arima_order).fit(
+                            method_kwargs={"maxiter": FIT_MAXITER}
+                        )
+                    elif start == previous[0]:
+                        arima_fit = arima_fit.append(values[previous[1]:origin], refit=False)
+                    else:
+                        arima_fit = arima_fit.apply(train, refit=False)
+                    forecast = np.asarray(arima_fit.forecast(steps=horizon))
+                elif model_type in FAST_MODELS:
+                    forecast, _ = fast_forecast(train, model_type, horizon)
+                elif model_type == "holtwinters":
+                    forecast = predictor._fit_holtwinters(pd.Series(train)).forecast(horizon)
+                else:
+                    forecast = predictor._fit_exponential_smoothing(pd.Series(train)).forecast(horizon)
+
+            metrics = _fold_metrics(actual, np.asarray(forecast, dtype=np.float64))
+            results.append({"origin": origin, "train_size": origin - start, **metrics})
+        except Exception as e:
+            results.append({"origin": origin, "train_size": origin - start, "error": str(e)})
+
+        previous = fold
+
+    return results
+
+
+def _aggregate(fold_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """汇总各折指标（均值和标准差），没有成功的折时指标为None"""
+    valid = [r for r in fold_results if "error" not in r]
+    aggregate: Dict[str, Any] = {
+        "folds": len(fold_results),
+        "failed_folds": len(fold_results) - len(valid)
+    }
+    for metric in ["mse", "mae", "rmse"]:
+        values = np.array([r[metric] for r in valid], dtype=np.float64)
+        aggregate[metric] = float(values.mean()) if len(values) else None
+        aggregate[f"{metric}_std"] = float(values.std()) if len(values) else None
+    return aggregate
+
+
+async def backtest_models(
+    series,
+    model_types: Optional[List[str]] = None,
+    n_folds: int = 5,
+    horizon: int = 10,
+    window: str = "expanding",
+    arima_order: Tuple[int, int, int] = DEFAULT_ORDER,
+    time_budget: float = BACKTEST_BUDGET,
+    fit_budget: Optional[Callable[[str], float]] = None,
+    max_parallel: int = PROCESS_WORKERS
+) -> Dict[str, Any]:
+    """
+    对多个候选模型执行滚动起点回测
+
+    每个模型的折按max_parallel切分为连续的组，各组在独立的可终止进程中
+    并行评估（run_killable，受可终止进程的并发和排队上限约束）；组内相邻折复用
+    已拟合的状态（见 _evaluate_chunk）。每组的时间上限为 fit_budget(模型)
+    乘以组内折数，且不超过整个回测剩余的time_budget；超时的组被终止，其折
+    记为失败。调用方被取消时终止所有进程。
+
+    只有所有折都评估成功的模型参与选择：失败或超时的折往往是最难的折，
+    只在剩余的折上计分会让该模型占便宜。ARIMA使用固定阶数arima_order
+    （不做阶数搜索），实际预测时搜索到的阶数可能不同，报告中记录所用阶数。
+
+    Returns:
+        {"folds": [...], "horizon", "window", "arima_order",
+         "models": {模型: {"folds": [...], "aggregate": {...}}},
+         "best_model": 所有折都成功的模型中平均RMSE最低者,
+         "excluded_models": 有失败折而不参与选择的模型, "timed_out": 是否有组因超时被终止}
+    """
+    values = np.asarray(series.dropna() if hasattr(series, "dropna") else series, dtype=np.float64)
+    model_types = model_types or DEFAULT_BACKTEST_MODELS
+    folds = rolling_origin_folds(len(values), n_folds, horizon, window)
+
+    report: Dict[str, Any] = {
+        "folds": [list(f) for f in folds],
+        "horizon": horizon,
+        "window": window,
+        "arima_order": list(arima_order),
+        "models": {},
+        "best_model": None,
+        "excluded_models": [],
+        "timed_out": False
+    }
+    if not folds:
+        return report
+
+    chunks = [
+        [folds[i] for i in c]
+        for c in np.array_split(np.arange(len(folds)), min(max_parallel, len(folds)))
+        if len(c)
+    ]
+    deadline = time.monotonic() + time_budget
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def evaluate(model_type: str, chunk: List[Fold]) -> List[Dict[str, Any]]:
+        async with semaphore:
+            remaining = deadline - time.monotonic()
+            timeout = remaining
+            if fit_budget is not None:
+                timeout = min(remaining, fit_budget(model_type) * len(chunk))
+            try:
+                if remaining <= 0:
+                    raise TaskTimeoutError("回测超出时间预算")
+                return await run_killable(
+                    _evaluate_chunk, values, model_type, chunk, arima_order,
+                    timeout=timeout
+                )
+            except TaskTimeoutError:
+                report["timed_out"] = True
+                return [
+                    {"origin": origin, "train_size": origin - start, "error": "评估超时"}
+                    for start, origin, _ in chunk
+                ]
+            except ProcessCrashedError as e:
+                return [
+                    {"origin": origin, "train_size": origin - start, "error": str(e)}
+                    for start, origin, _ in chunk
+                ]
+
+    jobs = {
+        (model_type, index): asyncio.ensure_future(evaluate(model_type, chunk))
+        for model_type in model_types
+        for index, chunk in enumerate(chunks)
+    }
+    try:
+        await asyncio.gather(*jobs.values())
+    finally:
+        for job in jobs.values():
+            job.cancel()
+
+    for model_type in model_types:
+        fold_results = []
+        for index in range(len(chunks)):
+            fold_results.extend(jobs[(model_type, index)].result())
+        report["models"][model_type] = {"folds": fold_results, "aggregate": _aggregate(fold_results)}
+
+    scored = []
+    for model_type, entry in report["models"].items():
+        rmse = entry["aggregate"]["rmse"]
+        if entry["aggregate"]["failed_folds"] or rmse is None or not np.isfinite(rmse):
+            report["excluded_models"].append(model_type)
+        else:
+            scored.append((rmse, model_type))
+    if scored:
+        report["best_model"] = min(scored)[1]
+
+    return report
@@ -0,0 +1,116 @@
+"""
+图表规格构建 - 直接生成Plotly格式的trace/layout字典
+
+与前端 react-plotly.js 使用的 {data, layout} 结构一致，但不构建Plotly
+Figure对象，也不经过 fig.to_json() -> json.loads() 的往返序列化，
+且不附带默认模板。
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+def to_json_list(values: Any) -> List[Any]:
+    """
+    将数组转换为可JSON序列化的列表
+
+    NaN/Inf转换为None（与Plotly序列化行为一致，且兼容严格JSON）。
+    """
+    array = np.asarray(values)
+    if array.dtype.kind == 'f' and not np.isfinite(array).all():
+        return np.where(np.isfinite(array), array, None).tolist()
+    return array.tolist()
+
+
+def bar_trace(
+    x: Sequence,
+    y: Sequence,
+    name: Optional[str] = None,
+    width: Optional[Sequence] = None,
+    **style: Any
+) -> Dict[str, Any]:
+    """条形图trace"""
+    trace = {"type": "bar", "x": to_json_list(x), "y": to_json_list(y)}
+    if name is not None:
+        trace["name"] = name
+    if width is not None:
+        trace["width"] = to_json_list(width)
+    trace.update(style)
+    return trace
+
+
+def line_trace(
+    x: Sequence,
+    y: Sequence,
+    name: Optional[str] = None,
+    **style: Any
+) -> Dict[str, Any]:
+    """折线图trace"""
+    trace = {"type": "scatter", "mode": "lines", "x": to_json_list(x), "y": to_json_list(y)}
+    if name is not None:
+        trace["name"] = name
+    trace.update(style)
+    return trace
+
+
+def band_trace(
+    x: Sequence,
+    lower: Sequence,
+    upper: Sequence,
+    name: str,
+    fillcolor: str
+) -> Dict[str, Any]:
+    """区间带trace（上界正序 + 下界逆序围成的填充区域）"""
+    x = list(x)
+    return {
+        "type": "scatter",
+        "x": x + x[::-1],
+        "y": to_json_list(upper) + to_json_list(lower)[::-1],
+        "fill": "toself",
+        "fillcolor": fillcolor,
+        "line": {"color": "rgba(255,255,255,0)"},
+        "name": name,
+        "showlegend": True
+    }
+
+
+def heatmap_trace(
+    z: np.ndarray,
+    x: Sequence,
+    y: Sequence,
+    **style: Any
+) -> Dict[str, Any]:
+    """热力图trace"""
+    trace = {"type": "heatmap", "z": to_json_list(z), "x": list(x), "y": list(y)}
+    trace.update(style)
+    return trace
+
+
+def splom_trace(dimensions: Dict[str, Sequence]) -> Dict[str, Any]:
+    """散点图矩阵trace"""
+    return {
+        "type": "splom",
+        "dimensions": [
+            {"label": label, "values": to_json_list(values)}
+            for label, values in dimensions.items()
+        ]
+    }
+
+
+def figure(
+    traces: List[Dict[str, Any]],
+    title: Optional[str] = None,
+    xaxis_title: Optional[str] = None,
+    yaxis_title: Optional[str] = None,
+    **layout: Any
+) -> Dict[str, Any]:
+    """组装图表字典 {data, layout}"""
+    spec_layout: Dict[str, Any] = {}
+    if title is not None:
+        spec_layout["title"] = {"text": title}
+    if xaxis_title is not None:
+        spec_layout["xaxis"] = {"title": {"text": xaxis_title}}
+    if yaxis_title is not None:
+        spec_layout["yaxis"] = {"title": {"text": yaxis_title}}
+    spec_layout.update(layout)
+    return {"data": traces, "layout": spec_layout}
@@ -0,0 +1,90 @@
+"""
+内容索引服务 - 数据集去重与结果记忆化
+"""
+import os
+import re
+import json
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+# 是否复用相同内容和参数的已有结果
+RESULT_MEMO_ENABLED = os.getenv("RESULT_MEMO_ENABLED", "True").lower() == "true"
+
+
+class JsonIndex:
+    """保存在单个JSON文件中的键值索引（进程内加锁，原子写入）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Any]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            return self._load().get(key)
+
+    def _write(self, entries: Dict[str, Any]):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            entries = self._load()
+            entries[key] = value
+            self._write(entries)
+
+    def discard_value(self, value: Any):
+        """删除所有指向value的键"""
+        with self._lock:
+            entries = self._load()
+            kept = {key: v for key, v in entries.items() if v != value}
+            if len(kept) != len(entries):
+                self._write(kept)
+
+
+def _normalize(value: Any) -> Any:
+    """规范化参数：字符串去除首尾空白并合并连续空白，字符串列表排序"""
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value.strip())
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [_normalize(v) for v in value]
+        if all(isinstance(v, str) for v in items):
+            items = sorted(items)
+        return items
+    return value
+
+
+def memo_key(kind: str, content_hash: str, params: Dict[str, Any]) -> str:
+    """根据结果类型、数据内容哈希和规范化参数生成记忆化键"""
+    payload = json.dumps(
+        {"kind": kind, "content_hash": content_hash, "params": _normalize(params)},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# 内容哈希 -> 数据集ID
+dataset_index = JsonIndex("uploads/datasets/content_index.json")
+# 记忆化键 -> 结果ID
+result_memo = JsonIndex("uploads/results/memo_index.json")
+
+
+def dataset_content_key(content_hash: str, file_format: str) -> str:
+    """数据集索引键（相同字节按不同格式解析结果不同，因此包含格式）"""
+    return f"{file_format}:{content_hash}"
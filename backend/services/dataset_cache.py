@@ -0,0 +1,120 @@
+"""
+数据集缓存 - 进程内按内存预算进行LRU淘汰的DataFrame缓存
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+import pandas as pd
+
+from services.dataset_loader import load_dataset
+
+# 缓存DataFrame的总内存预算（字节）
+DEFAULT_MAX_BYTES = int(os.getenv("DATASET_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+
+def _copy_on_write() -> bool:
+    """写时复制（Copy-on-Write）是否生效：pandas 3起始终开启，2.x取决于全局选项"""
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return True
+    return bool(pd.get_option("mode.copy_on_write"))
+
+
+def _private_copy(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    返回调用方可以随意修改的副本
+
+    写时复制生效时浅拷贝即可，修改时才复制被改动的列；否则调用方的原地修改
+    （如 df.loc[...] = ...）会写穿到缓存中的数据，只能深拷贝。
+    """
+    return df.copy(deep=not _copy_on_write())
+
+
+class DatasetCache:
+    """
+    DataFrame缓存
+
+    以(文件路径, 修改时间, 文件大小)为键，文件被替换后旧条目自然失效。
+    返回的是调用方私有的副本（见 _private_copy），替换列或原地修改都只
+    影响自己的副本，不会污染缓存中的数据。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _make_key(file_path: str) -> Tuple:
+        stat = os.stat(file_path)
+        return (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+
+    def get(self, file_path: str) -> Optional[pd.DataFrame]:
+        """读取缓存，未命中返回None"""
+        key = self._make_key(file_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return _private_copy(entry[0])
+
+    def put(self, file_path: str, df: pd.DataFrame):
+        """写入缓存，超出预算时淘汰最久未使用的条目"""
+        key = self._make_key(file_path)
+        size = int(df.memory_usage(index=True, deep=True).sum())
+
+        # 单个数据集超过总预算时不缓存
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+            self._entries[key] = (df, size)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def load(self, file_path: str, file_format: str) -> pd.DataFrame:
+        """从缓存加载数据集，未命中时读取文件并写入缓存"""
+        df = self.get(file_path)
+        if df is not None:
+            return df
+
+        df = load_dataset(file_path, file_format)
+        self.put(file_path, df)
+        return _private_copy(df)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+# 进程内共享的缓存实例
+dataset_cache = DatasetCache()
@@ -0,0 +1,163 @@
+"""
+数据集加载服务 - 原始文件解析与列式缓存
+"""
+import os
+from typing import Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# 转换列式缓存时每批读取的行数
+CONVERT_CHUNK_ROWS = int(os.getenv("COLUMNAR_CHUNK_ROWS", 200000))
+
+
+def columnar_path(file_path: str) -> str:
+    """原始文件对应的列式缓存路径（与原文件同目录同名）"""
+    return os.path.splitext(file_path)[0] + ".parquet"
+
+
+def read_raw(
+    file_path: str,
+    file_format: str,
+    separator: Optional[str] = None,
+    nrows: Optional[int] = None,
+    chunksize: Optional[int] = None
+):
+    """
+    解析原始文本文件
+
+    传入chunksize时返回分块迭代器（仅CSV/TXT）。
+    """
+    if file_format == 'json':
+        df = pd.read_json(file_path)
+        return df.head(nrows) if nrows is not None else df
+
+    if file_format == 'csv':
+        return pd.read_csv(file_path, sep=separator or ',', nrows=nrows, chunksize=chunksize)
+
+    if separator:
+        return pd.read_csv(file_path, sep=separator, nrows=nrows, chunksize=chunksize)
+
+    # TXT：尝试多种分隔符
+    try:
+        return pd.read_csv(file_path, sep='\t', nrows=nrows, chunksize=chunksize)
+    except Exception:
+        return pd.read_csv(file_path, sep=',', nrows=nrows, chunksize=chunksize)
+
+
+def build_columnar_cache(
+    file_path: str,
+    file_format: str,
+    separator: Optional[str] = None
+) -> Optional[str]:
+    """
+    将原始文件转换为Parquet列式缓存
+
+    CSV/TXT按块转换，内存占用与文件大小无关；后续块推断出的类型与
+    首块不一致时（例如整数列后面出现缺失值），退回整表转换。
+
+    Returns:
+        缓存文件路径；pyarrow不可用或转换失败时返回None
+    """
+    if not PARQUET_AVAILABLE:
+        return None
+
+    target_path = columnar_path(file_path)
+    tmp_path = target_path + ".tmp"
+
+    try:
+        if file_format == 'json':
+            _write_table(read_raw(file_path, file_format), tmp_path)
+        else:
+            try:
+                _write_chunked(
+                    read_raw(file_path, file_format, separator, chunksize=CONVERT_CHUNK_ROWS),
+                    tmp_path
+                )
+            except (pa.ArrowInvalid, pa.ArrowTypeError, ValueError):
+                _write_table(read_raw(file_path, file_format, separator), tmp_path)
+
+        os.replace(tmp_path, target_path)
+        return target_path
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+
+
+def count_rows(
+    file_path: str,
+    file_format: str,
+    separator: Optional[str] = None,
+    cache_path: Optional[str] = None
+) -> int:
+    """
+    数据集的行数
+
+    有列式缓存时直接读取Parquet元数据中的行数；否则用CSV解析器分块计数
+    （与加载时的解析规则一致，正确处理引号内的换行和空行）。
+    """
+    if cache_path and PARQUET_AVAILABLE and os.path.exists(cache_path):
+        return int(pq.ParquetFile(cache_path).metadata.num_rows)
+    if file_format == 'json':
+        return int(len(read_raw(file_path, file_format)))
+    return sum(len(chunk) for chunk in read_raw(file_path, file_format, separator, chunksize=CONVERT_CHUNK_ROWS))
+
+
+def _write_table(df: pd.DataFrame, path: str):
+    """整表写入Parquet"""
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path)
+
+
+def _write_chunked(chunks, path: str):
+    """分块写入Parquet，所有块使用首块的schema"""
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(path, table.schema)
+            else:
+                table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+
+        if writer is None:
+            raise ValueError("数据文件为空")
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def load_dataset(
+    file_path: str,
+    file_format: str,
+    separator: Optional[str] = None,
+    nrows: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    加载数据集
+
+    优先读取上传时生成的列式缓存（保留已解析的类型），
+    缓存不存在或读取失败时解析原始文件。
+    """
+    cache_path = columnar_path(file_path)
+
+    if PARQUET_AVAILABLE and os.path.exists(cache_path):
+        try:
+            if nrows is not None:
+                batches = pq.ParquetFile(cache_path).iter_batches(batch_size=max(nrows, 1))
+                first = next(batches, None)
+                if first is None:
+                    return pq.read_schema(cache_path).empty_table().to_pandas()
+                return first.to_pandas().head(nrows)
+            return pq.read_table(cache_path).to_pandas()
+        except Exception:
+            pass
+
+    return read_raw(file_path, file_format, separator, nrows=nrows)
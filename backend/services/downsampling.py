@@ -0,0 +1,72 @@
+"""
+折线降采样 - Largest-Triangle-Three-Buckets (LTTB)
+"""
+from typing import Tuple
+
+import numpy as np
+
+# 折线图默认最多显示的点数
+DEFAULT_MAX_POINTS = 2000
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    LTTB降采样，返回保留点的下标
+
+    首尾点固定保留，中间的点均分到 threshold-2 个桶中，每个桶选出与
+    上一个选中点、下一个桶均值构成三角形面积最大的点，保留峰谷等视觉特征。
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # 桶边界：第一个和最后一个点单独成桶
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    # 每个桶的下一个桶的均值，用于计算三角形第三个顶点
+    next_starts = edges[1:]
+    next_sizes = np.diff(np.append(next_starts, n))
+    next_mean_x = np.add.reduceat(x, next_starts) / next_sizes
+    next_mean_y = np.add.reduceat(y, next_starts) / next_sizes
+
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    prev = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        bucket_x = x[start:end]
+        bucket_y = y[start:end]
+        # 三角形面积（省略常数1/2）
+        area = np.abs(
+            (x[prev] - next_mean_x[i]) * (bucket_y - y[prev])
+            - (x[prev] - bucket_x) * (next_mean_y[i] - y[prev])
+        )
+        prev = start + int(area.argmax())
+        selected[i + 1] = prev
+
+    return selected
+
+
+def downsample_line(
+    x: np.ndarray,
+    y: np.ndarray,
+    max_points: int = DEFAULT_MAX_POINTS
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    对折线数据降采样
+
+    缺失值会先被去除；点数不超过max_points时原样返回。
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    finite = np.isfinite(x) & np.isfinite(y)
+    if not finite.all():
+        x, y = x[finite], y[finite]
+
+    if not max_points or len(y) <= max_points:
+        return x, y
+
+    indices = lttb_indices(x, y, max_points)
+    return x[indices], y[indices]
@@ -0,0 +1,257 @@
+"""
+执行器服务 - 将CPU密集型计算移出事件循环
+"""
+import os
+import time
+import asyncio
+import functools
+import multiprocessing
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+# 线程池：pandas/NumPy计算（大部分会释放GIL）和绘图
+THREAD_WORKERS = int(os.getenv("EXECUTOR_THREAD_WORKERS", 4))
+# 同时运行的可终止进程数：statsmodels模型拟合
+PROCESS_WORKERS = int(os.getenv("EXECUTOR_PROCESS_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+# 线程池和可终止进程在执行中任务之外各自允许排队的任务数
+MAX_QUEUED = int(os.getenv("EXECUTOR_MAX_QUEUED", 16))
+
+
+# 可终止进程轮询结果的间隔（秒）
+KILLABLE_POLL_INTERVAL = 0.05
+# 终止进程后等待其退出的时间（秒），超出后强制结束
+KILLABLE_TERMINATE_GRACE = 1.0
+# 子进程的启动方式。服务进程是多线程的，直接fork可能复制到被其他线程持有的锁
+# 而死锁；forkserver从单线程的服务进程派生子进程，不支持时使用spawn
+PROCESS_START_METHOD = os.getenv("EXECUTOR_START_METHOD") or (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+# forkserver预先导入的模块，派生的子进程无需重新导入FastAPI应用和
+# pandas/statsmodels/sklearn
+FORKSERVER_PRELOAD = ["main", "services.predictor"]
+# 后端代码根目录
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+_mp_context = None
+# 正在运行的可终止进程（关闭服务时终止）
+_live_processes = set()
+
+
+def _get_mp_context():
+    """子进程使用的multiprocessing上下文"""
+    global _mp_context
+    if _mp_context is None:
+        _mp_context = multiprocessing.get_context(PROCESS_START_METHOD)
+        if PROCESS_START_METHOD == "forkserver":
+            # forkserver进程以 python -c 启动，Python 3.11不会把本进程的sys.path
+            # 传给它；通过PYTHONPATH保证它能导入并预加载后端模块
+            paths = [p for p in os.environ.get("PYTHONPATH", "").split(os.pathsep) if p]
+            if _BACKEND_DIR not in paths:
+                os.environ["PYTHONPATH"] = os.pathsep.join([_BACKEND_DIR] + paths)
+            _mp_context.set_forkserver_preload(FORKSERVER_PRELOAD)
+    return _mp_context
+
+
+def warm_up_processes():
+    """预先启动forkserver（导入预加载模块需要数秒），避免首个模型拟合承担启动耗时"""
+    if _get_mp_context().get_start_method() == "forkserver":
+        from multiprocessing import forkserver
+        forkserver.ensure_running()
+
+
+class ExecutorBusyError(RuntimeError):
+    """执行队列已满"""
+
+
+class TaskTimeoutError(TimeoutError):
+    """任务超出时间预算，执行进程已被终止"""
+
+
+class ProcessCrashedError(RuntimeError):
+    """执行进程未返回结果就退出（如被系统因内存不足终止）"""
+
+
+class _Admission:
+    """
+    并发上限和排队上限
+
+    同时运行的任务不超过workers个，另外最多max_queued个任务排队等待，
+    超出时立即拒绝（ExecutorBusyError）。
+    """
+
+    def __init__(self, name: str, workers: int, max_queued: int):
+        self.name = name
+        self.workers = workers
+        self.capacity = workers + max_queued
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._workers: Optional[asyncio.Semaphore] = None
+        self.active = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        """占用一个执行名额（先进入排队，再等待空闲的工作者）"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.capacity)
+            self._workers = asyncio.Semaphore(self.workers)
+
+        # 排队已满时直接拒绝，而不是无限堆积请求
+        if self._semaphore.locked():
+            raise ExecutorBusyError(f"{self.name}执行队列已满，请稍后重试")
+
+        async with self._semaphore, self._workers:
+            self.active += 1
+            try:
+                yield
+            finally:
+                self.active -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "active": self.active
+        }
+
+
+class _BoundedPool(_Admission):
+    """带并发上限和排队上限的执行池，执行器在首次使用时创建"""
+
+    def __init__(self, name: str, factory: Callable[[], Any], workers: int, max_queued: int):
+        super().__init__(name, workers, max_queued)
+        self._factory = factory
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = self._factory()
+        return self._executor
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        async with self.slot():
+            loop = asyncio.get_running_loop()
+            call = functools.partial(func, *args, **kwargs)
+            return await loop.run_in_executor(self.executor, call)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_thread_pool = _BoundedPool(
+    "线程池",
+    lambda: ThreadPoolExecutor(max_workers=THREAD_WORKERS, thread_name_prefix="compute"),
+    THREAD_WORKERS,
+    MAX_QUEUED
+)
+# 可终止进程（run_killable）的并发和排队名额
+_process_slots = _Admission("进程", PROCESS_WORKERS, MAX_QUEUED)
+
+
+async def run_in_thread(func: Callable, *args, **kwargs) -> Any:
+    """在线程池中执行同步函数"""
+    return await _thread_pool.run(func, *args, **kwargs)
+
+
+def _killable_target(conn, func: Callable, args: tuple, kwargs: dict):
+    """可终止进程的入口：执行函数并通过管道返回结果或异常"""
+    try:
+        conn.send(("ok", func(*args, **kwargs)))
+    except BaseException as e:
+        try:
+            conn.send(("error", e))
+        except Exception:
+            conn.send(("error", RuntimeError(repr(e))))
+    finally:
+        conn.close()
+
+
+async def _reap(process):
+    """终止并回收进程，轮询等待退出而不阻塞事件循环"""
+    if process.is_alive():
+        process.terminate()
+    deadline = time.monotonic() + KILLABLE_TERMINATE_GRACE
+    while process.is_alive():
+        if time.monotonic() >= deadline:
+            process.kill()
+            deadline = float("inf")
+        await asyncio.sleep(KILLABLE_POLL_INTERVAL)
+
+
+async def run_killable(func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+    """
+    在独立进程中执行同步函数，超时或被取消时终止该进程
+
+    每个任务使用一个新进程，因此可以随时终止，适合需要严格时间预算的任务
+    （如可能长时间不收敛的模型拟合）。受 PROCESS_WORKERS 和 MAX_QUEUED 的
+    并发和排队上限约束。func和参数需要可以被pickle（模块级函数）。子进程由
+    forkserver派生且不是守护进程，因此可以再创建自己的子进程（如sklearn的
+    n_jobs并行）。
+
+    Raises:
+        TaskTimeoutError: 超出timeout秒
+        ProcessCrashedError: 进程未返回结果就退出
+        asyncio.CancelledError: 调用方被取消（如客户端断开连接），进程已终止
+    """
+    async with _process_slots.slot():
+        context = _get_mp_context()
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(
+            target=_killable_target,
+            args=(sender, func, args, kwargs)
+        )
+        # 先登记再启动：启动期间被取消或关闭服务时同样能终止子进程
+        _live_processes.add(process)
+        starting = asyncio.get_running_loop().run_in_executor(None, process.start)
+
+        try:
+            try:
+                await asyncio.shield(starting)
+            finally:
+                sender.close()
+            deadline = time.monotonic() + timeout if timeout else None
+            while not receiver.poll():
+                if not process.is_alive() and not receiver.poll():
+                    raise ProcessCrashedError(f"执行进程异常退出（退出码 {process.exitcode}）")
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TaskTimeoutError(f"任务超出时间预算（{timeout}秒）")
+                await asyncio.sleep(KILLABLE_POLL_INTERVAL)
+
+            try:
+                status, payload = receiver.recv()
+            except EOFError:
+                # 子进程退出时关闭了管道，poll返回可读但没有结果
+                await _reap(process)
+                raise ProcessCrashedError(f"执行进程异常退出（退出码 {process.exitcode}）")
+        finally:
+            receiver.close()
+            try:
+                # 被取消时启动可能仍在线程中进行，等其完成后再终止子进程
+                await asyncio.wait([starting])
+                await _reap(process)
+            finally:
+                _live_processes.discard(process)
+
+        if status == "error":
+            raise payload
+        return payload
+
+
+def shutdown_executors():
+    """关闭线程池，终止仍在运行的可终止进程"""
+    _thread_pool.shutdown()
+    for process in list(_live_processes):
+        if process.is_alive():
+            process.kill()
+    _live_processes.clear()
+
+
+def executor_stats() -> Dict[str, Any]:
+    """执行池统计信息"""
+    return {
+        "thread_pool": _thread_pool.stats(),
+        "processes": _process_slots.stats()
+    }
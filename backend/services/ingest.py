@@ -0,0 +1,108 @@
+"""
+数据摄取服务 - 流式保存上传文件并增量统计
+"""
+import os
+import io
+import hashlib
+from typing import Dict, Any, List, Tuple
+
+import aiofiles
+import pandas as pd
+from fastapi import UploadFile
+
+from services.dataset_loader import read_raw
+
+# 每次从上传流读取的字节数
+CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+# 用于推断列名和类型的样本字节上限
+SAMPLE_BYTES = int(os.getenv("UPLOAD_SAMPLE_BYTES", 1024 * 1024))
+
+
+async def stream_upload_to_disk(file: UploadFile, file_path: str) -> Dict[str, Any]:
+    """
+    将上传文件分块写入磁盘
+
+    写入过程中增量计算SHA-256，并保留文件开头的一段样本，
+    因此单次上传的内存占用与文件大小无关。
+
+    Returns:
+        {"content_hash", "size_bytes", "sample", "sample_complete"}
+    """
+    hasher = hashlib.sha256()
+    size_bytes = 0
+    sample = bytearray()
+
+    async with aiofiles.open(file_path, "wb") as out:
+        while True:
+            chunk = await file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+
+            hasher.update(chunk)
+            size_bytes += len(chunk)
+
+            if len(sample) < SAMPLE_BYTES:
+                sample.extend(chunk[:SAMPLE_BYTES - len(sample)])
+
+            await out.write(chunk)
+
+    return {
+        "content_hash": hasher.hexdigest(),
+        "size_bytes": size_bytes,
+        "sample": bytes(sample),
+        "sample_complete": len(sample) >= size_bytes
+    }
+
+
+def _read_text_sample(sample: bytes, file_format: str) -> Tuple[pd.DataFrame, str]:
+    """从样本字节解析DataFrame，返回(DataFrame, 分隔符)"""
+    if file_format == 'csv':
+        return pd.read_csv(io.BytesIO(sample)), ','
+
+    # TXT：尝试多种分隔符
+    for sep in ['\t', ',', ' ']:
+        try:
+            return pd.read_csv(io.BytesIO(sample), sep=sep), sep
+        except Exception:
+            continue
+    raise ValueError("无法识别文本文件的分隔符")
+
+
+def inspect_dataset(file_path: str, file_format: str, ingest_stats: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    根据流式统计结果和样本推断数据集结构
+
+    CSV/TXT只解析有界样本来获取列名和类型，行数留空（None），由
+    count_rows 在列式缓存建立后确定（引号内的换行、空行使换行数不等于
+    行数）；JSON无法按行切分，仍然完整解析。
+
+    Returns:
+        {"rows", "columns", "column_names", "data_types", "separator"}
+    """
+    if file_format == 'json':
+        df = read_raw(file_path, file_format)
+        return {
+            "rows": int(df.shape[0]),
+            "columns": int(df.shape[1]),
+            "column_names": df.columns.tolist(),
+            "data_types": {col: str(dtype) for col, dtype in df.dtypes.items()},
+            "separator": None
+        }
+
+    sample = ingest_stats["sample"]
+    if not ingest_stats["sample_complete"]:
+        # 截断到最后一个完整行，避免半行数据影响类型推断
+        last_newline = sample.rfind(b"\n")
+        if last_newline > 0:
+            sample = sample[:last_newline + 1]
+
+    sample_df, separator = _read_text_sample(sample, file_format)
+    column_names: List[str] = sample_df.columns.tolist()
+
+    return {
+        "rows": None,
+        "columns": len(column_names),
+        "column_names": column_names,
+        "data_types": {col: str(dtype) for col, dtype in sample_df.dtypes.items()},
+        "separator": separator
+    }
@@ -0,0 +1,114 @@
+"""
+预测区间 - 残差自助法模拟
+"""
+import os
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# 模拟路径数
+INTERVAL_PATHS = int(os.getenv("INTERVAL_PATHS", 1000))
+# 预测区间的置信水平（下/上分位数为 (1-level)/2 和 (1+level)/2）
+INTERVAL_LEVEL = float(os.getenv("INTERVAL_LEVEL", 0.95))
+# 模拟矩阵（路径数 x FFT长度）的最大元素数，预测步数很长时相应减少路径数
+INTERVAL_MAX_CELLS = int(os.getenv("INTERVAL_MAX_CELLS", 2_000_000))
+# 路径数下限（低于该值时分位数不稳定）
+MIN_PATHS = 100
+
+
+def _fft_size(steps: int) -> int:
+    """长度为steps的线性卷积所用的FFT长度（不小于2*steps-1的2的幂）"""
+    return 1 << int(2 * steps - 1).bit_length()
+
+
+# 模拟的最大步数：MIN_PATHS条路径的模拟矩阵也不超过 INTERVAL_MAX_CELLS
+MAX_SIMULATED_STEPS = max(1, (1 << (max(INTERVAL_MAX_CELLS // MIN_PATHS, 2).bit_length() - 1)) // 2)
+
+
+def smoothing_impulse_response(fit: Any, steps: int) -> np.ndarray:
+    """
+    指数平滑类模型的冲击响应系数 c_0..c_{steps-1}
+
+    加法误差修正形式下，未来第h步的值为点预测加上
+    e_{n+h} + sum_{j=1}^{h-1} c_j * e_{n+h-j}，其中 c_0 = 1，
+    c_j = alpha + beta*j + gamma*[j能被m整除]，beta = alpha * 趋势平滑系数。
+    """
+    params = fit.params
+    alpha = float(params.get("smoothing_level") or 0.0)
+    beta = alpha * float(params.get("smoothing_trend") or 0.0) if fit.model.trend else 0.0
+    gamma = float(params.get("smoothing_seasonal") or 0.0) if fit.model.seasonal else 0.0
+    m = fit.model.seasonal_periods or 0
+
+    j = np.arange(steps, dtype=np.float64)
+    response = alpha + beta * j
+    if m and gamma:
+        response += gamma * (j % m == 0)
+    response[0] = 1.0
+    return response
+
+
+def bootstrap_intervals(
+    point_forecast: np.ndarray,
+    residuals: np.ndarray,
+    impulse_response: np.ndarray,
+    n_paths: int = INTERVAL_PATHS,
+    level: float = INTERVAL_LEVEL,
+    seed: Optional[int] = 0
+) -> List[Dict[str, float]]:
+    """
+    残差自助法预测区间
+
+    从中心化的样本内残差中有放回抽样得到未来误差矩阵E（路径数 x 步数），
+    所有路径一次性计算为 点预测 + E与冲击响应的卷积（FFT实现，
+    O(路径数 * 步数 * log 步数)），再取各步的分位数。路径数按
+    INTERVAL_MAX_CELLS 减少，但不少于 MIN_PATHS；超出 MAX_SIMULATED_STEPS
+    的步数不再模拟，改用残差方差的正态近似，保证内存占用始终有界。
+
+    Returns:
+        [{"lower", "upper"}]，与预测值逐步对应
+    """
+    point_forecast = np.asarray(point_forecast, dtype=np.float64)
+    steps = len(point_forecast)
+    residuals = np.asarray(residuals, dtype=np.float64)
+    residuals = residuals[np.isfinite(residuals)]
+    if steps == 0 or len(residuals) < 2:
+        return []
+    residuals = residuals - residuals.mean()
+
+    simulated = min(steps, MAX_SIMULATED_STEPS)
+    size = _fft_size(simulated)
+    n_paths = max(min(n_paths, INTERVAL_MAX_CELLS // size), MIN_PATHS)
+    rng = np.random.default_rng(seed)
+    errors = rng.choice(residuals, size=(n_paths, simulated))
+
+    spectrum = np.fft.rfft(errors, size, axis=1) * np.fft.rfft(impulse_response[:simulated], size)
+    paths = np.fft.irfft(spectrum, size, axis=1)[:, :simulated]
+    paths += point_forecast[:simulated]
+
+    lower_q, upper_q = (1 - level) / 2, (1 + level) / 2
+    lower, upper = np.quantile(paths, [lower_q, upper_q], axis=0)
+
+    if steps > simulated:
+        # 远期误差是大量残差的加权和，近似服从正态分布
+        response = np.asarray(impulse_response[:steps], dtype=np.float64)
+        variance = residuals.var() * np.cumsum(response * response)
+        half_width = NormalDist().inv_cdf(upper_q) * np.sqrt(variance[simulated:])
+        lower = np.concatenate([lower, point_forecast[simulated:] - half_width])
+        upper = np.concatenate([upper, point_forecast[simulated:] + half_width])
+
+    return [
+        {"lower": float(lo), "upper": float(hi)}
+        for lo, hi in zip(lower, upper)
+    ]
+
+
+def smoothing_intervals(fit: Any, point_forecast: np.ndarray, **kwargs: Any) -> List[Dict[str, float]]:
+    """statsmodels指数平滑结果的自助法预测区间"""
+    steps = len(point_forecast)
+    return bootstrap_intervals(
+        point_forecast,
+        np.asarray(fit.resid),
+        smoothing_impulse_response(fit, steps),
+        **kwargs
+    )
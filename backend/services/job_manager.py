@@ -0,0 +1,250 @@
+"""
+任务管理服务 - 长时间运行的分析/预测任务
+"""
+import os
+import json
+import uuid
+import asyncio
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+JOBS_DIR = "uploads/jobs"
+# 同时执行的任务数（重计算部分仍受执行池限制）
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+
+# 阶段回调：(阶段名, 状态)，状态为 running / completed / failed
+StageReporter = Callable[[str, str], None]
+# 任务执行函数：(请求数据, 阶段回调) -> 结果ID
+JobRunner = Callable[[Dict[str, Any], StageReporter], Awaitable[str]]
+
+
+def _try_lock(fd: int) -> bool:
+    """对文件加非阻塞排他锁；锁随文件关闭或进程退出自动释放"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _same_file(fd: int, path: str) -> bool:
+    """已打开的文件是否仍是path指向的文件（未被删除或替换）"""
+    try:
+        return os.path.samestat(os.fstat(fd), os.stat(path))
+    except OSError:
+        return False
+
+
+class JobManager:
+    """
+    任务管理器
+
+    任务状态保存在 uploads/jobs/{job_id}.json，每次阶段变化都会落盘。
+    服务重启后，未完成的任务会根据保存的请求重新执行。
+
+    执行中的任务由租约文件 {job_id}.lease 标记归属：执行任务的进程持有该
+    文件上的排他锁（文件内记录进程号），进程退出时锁由操作系统释放，租约
+    随之失效。多个工作进程同时启动时，只有取得锁的进程会恢复该任务。
+    """
+
+    def __init__(self, jobs_dir: str = JOBS_DIR, workers: int = JOB_WORKERS):
+        self.jobs_dir = jobs_dir
+        self.workers = workers
+        self._runners: Dict[str, Dict[str, Any]] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._leases: Dict[str, int] = {}
+
+    def register_runner(self, job_type: str, runner: JobRunner, stages: List[str]):
+        """注册任务类型及其执行阶段"""
+        self._runners[job_type] = {"runner": runner, "stages": stages}
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _lease_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.lease")
+
+    def _claim(self, job_id: str) -> bool:
+        """取得任务的租约，其他进程持有未失效的租约时返回False"""
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        path = self._lease_path(job_id)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        # 加锁后确认打开的仍是该路径上的文件：打开后、加锁前持有者可能已释放
+        # 并删除了租约文件，锁住这个已删除的文件并不排斥其他进程
+        if not _try_lock(fd) or not _same_file(fd, path):
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, json.dumps({"owner": os.getpid(), "claimed_at": datetime.now().isoformat()}).encode("utf-8"))
+        self._leases[job_id] = fd
+        return True
+
+    def _release(self, job_id: str):
+        """释放租约（任务的最终状态已落盘后调用）"""
+        fd = self._leases.pop(job_id, None)
+        if fd is None:
+            return
+        path = self._lease_path(job_id)
+        # 仍持有锁时删除租约文件再关闭，否则关闭到删除之间其他进程可能取得
+        # 租约，随后文件被删除，第三个进程又能在新文件上取得同一租约
+        try:
+            os.remove(path)
+            removed = True
+        except OSError:
+            # Windows不能删除打开的文件，只能关闭后再删除
+            removed = False
+        os.close(fd)
+        if not removed:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _save(self, job: Dict[str, Any]):
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        job["updated_at"] = datetime.now().isoformat()
+        path = self._job_path(job["job_id"])
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(tmp_path, path)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """读取任务状态"""
+        path = self._job_path(job_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def submit(self, job_type: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        """提交任务，立即返回任务状态"""
+        if job_type not in self._runners:
+            raise ValueError(f"未知的任务类型: {job_type}")
+
+        now = datetime.now().isoformat()
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "job_type": job_type,
+            "state": "pending",
+            "progress": 0.0,
+            "stages": [
+                {"name": name, "status": "pending", "started_at": None, "finished_at": None}
+                for name in self._runners[job_type]["stages"]
+            ],
+            "request": request,
+            "result_id": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        self._save(job)
+        self._claim(job["job_id"])
+        self._schedule(job)
+        return job
+
+    def recover(self):
+        """
+        重新调度服务重启前未完成的任务
+
+        只恢复租约已失效（没有进程持有锁）的任务；取得租约后重新读取任务
+        状态，避免恢复刚被其他进程执行完的任务。
+        """
+        if not os.path.exists(self.jobs_dir):
+            return
+
+        for filename in os.listdir(self.jobs_dir):
+            if not filename.endswith(".json"):
+                continue
+            job_id = filename[:-len(".json")]
+            job = self.get(job_id)
+            if not job or job["state"] not in ("pending", "running") or job["job_type"] not in self._runners:
+                continue
+            if job_id in self._tasks or not self._claim(job_id):
+                continue
+
+            job = self.get(job_id)
+            if job and job["state"] in ("pending", "running"):
+                job["state"] = "pending"
+                for stage in job["stages"]:
+                    if stage["status"] != "completed":
+                        stage.update({"status": "pending", "started_at": None, "finished_at": None})
+                self._save(job)
+                self._schedule(job)
+            else:
+                self._release(job_id)
+
+    def _schedule(self, job: Dict[str, Any]):
+        task = asyncio.get_running_loop().create_task(self._run(job))
+        self._tasks[job["job_id"]] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job["job_id"], None))
+
+    def _update_stage(self, job: Dict[str, Any], stage_name: str, status: str = "running"):
+        """
+        更新单个阶段的状态并重新计算进度
+
+        各阶段的状态相互独立：并发执行的阶段可以同时处于running，
+        一个阶段开始不会结束其他阶段。
+        """
+        now = datetime.now().isoformat()
+        for stage in job["stages"]:
+            if stage["name"] != stage_name:
+                continue
+            if status == "running":
+                stage.update({"status": "running", "started_at": now, "finished_at": None})
+            else:
+                stage.update({"status": status, "finished_at": now})
+
+        completed = sum(1 for stage in job["stages"] if stage["status"] == "completed")
+        job["progress"] = round(completed / len(job["stages"]), 3)
+        self._save(job)
+
+    async def _run(self, job: Dict[str, Any]):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+
+        async with self._semaphore:
+            job["state"] = "running"
+            self._save(job)
+
+            runner = self._runners[job["job_type"]]["runner"]
+            try:
+                result_id = await runner(
+                    job["request"],
+                    lambda name, status="running": self._update_stage(job, name, status)
+                )
+                now = datetime.now().isoformat()
+                for stage in job["stages"]:
+                    if stage["status"] != "completed":
+                        stage.update({"status": "completed", "finished_at": now})
+                job.update({"state": "succeeded", "progress": 1.0, "result_id": result_id})
+            except HTTPException as e:
+                self._fail(job, str(e.detail))
+            except Exception as e:
+                self._fail(job, str(e))
+            finally:
+                self._save(job)
+                self._release(job["job_id"])
+
+    def _fail(self, job: Dict[str, Any], error: str):
+        now = datetime.now().isoformat()
+        for stage in job["stages"]:
+            if stage["status"] == "running":
+                stage.update({"status": "failed", "finished_at": now})
+        job.update({"state": "failed", "error": error})
+
+
+# 进程内共享的任务管理器
+job_manager = JobManager()
@@ -0,0 +1,274 @@
+"""
+模型注册表 - 持久化已拟合的模型并增量更新
+"""
+import os
+import json
+import pickle
+import threading
+import warnings
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+from services.content_index import JsonIndex
+from services.intervals import smoothing_intervals
+
+MODELS_DIR = "uploads/models"
+# 进程内保留的已加载模型数量
+MODEL_CACHE_SIZE = int(os.getenv("MODEL_CACHE_SIZE", 32))
+
+REGISTRY_MODELS = ("arima", "holtwinters", "exponential_smoothing")
+
+
+def fit_model(
+    values: np.ndarray,
+    model_type: str,
+    order: Optional[Tuple[int, int, int]] = None,
+    seasonal_order: Optional[Tuple[int, int, int, int]] = None,
+    seasonal_period: Optional[int] = None
+) -> Tuple[Any, str]:
+    """
+    在全部观测上拟合模型
+
+    Holt-Winters拟合失败时退回指数平滑（与预测服务一致）。
+
+    Returns:
+        (statsmodels结果对象, 实际使用的模型类型)
+    """
+    # 延迟导入，避免与predictor模块循环依赖
+    from services.predictor import TimeSeriesPredictor
+
+    predictor = TimeSeriesPredictor(file_path=None, file_format=None)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        if model_type == "arima":
+            return predictor._fit_arima(values, order, seasonal_order), "arima"
+        if model_type == "holtwinters":
+            try:
+                return predictor._fit_holtwinters(values, seasonal_period), "holtwinters"
+            except Exception:
+                pass
+        return predictor._fit_exponential_smoothing(values), "exponential_smoothing"
+
+
+def fit_and_store(
+    models_dir: str,
+    model_id: str,
+    values: np.ndarray,
+    model_type: str,
+    order: Optional[Tuple[int, int, int]] = None,
+    seasonal_order: Optional[Tuple[int, int, int, int]] = None,
+    seasonal_period: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    拟合模型并写入模型文件（在工作进程中执行，只把摘要传回主进程）
+    """
+    fit, kind = fit_model(values, model_type, order, seasonal_order, seasonal_period)
+    _write_fit(os.path.join(models_dir, f"{model_id}.pkl"), fit)
+    return _describe(fit, kind)
+
+
+def _write_fit(path: str, fit: Any):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(fit, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def _describe(fit: Any, kind: str) -> Dict[str, Any]:
+    """模型摘要：实际模型类型、观测数、阶数和信息准则"""
+    info: Dict[str, Any] = {"model_type": kind, "nobs": int(fit.model.nobs)}
+    if kind == "arima":
+        info["order"] = list(fit.model.order)
+        info["seasonal_order"] = list(fit.model.seasonal_order)
+    else:
+        info["seasonal_periods"] = fit.model.seasonal_periods or None
+    for criterion in ("aic", "bic"):
+        value = getattr(fit, criterion, None)
+        info[criterion] = float(value) if value is not None and np.isfinite(value) else None
+    return info
+
+
+def _refilter_smoothing(fit: Any, values: np.ndarray) -> Any:
+    """
+    指数平滑类模型的增量更新
+
+    固定已估计的平滑参数和初始状态，在追加后的完整序列上重新执行平滑递推，
+    不重新优化参数。
+    """
+    model = fit.model
+    params = fit.params
+    initial: Dict[str, Any] = {"initial_level": params["initial_level"]}
+    if model.trend:
+        initial["initial_trend"] = params["initial_trend"]
+    if model.seasonal:
+        initial["initial_seasonal"] = params["initial_seasons"]
+
+    smoothing = {
+        name: params[name]
+        for name in ("smoothing_level", "smoothing_trend", "smoothing_seasonal", "damping_trend")
+        if params.get(name) is not None and np.isfinite(params[name])
+    }
+
+    refiltered = ExponentialSmoothing(
+        values,
+        trend=model.trend,
+        damped_trend=model.damped_trend,
+        seasonal=model.seasonal,
+        seasonal_periods=model.seasonal_periods,
+        initialization_method="known",
+        **initial
+    )
+    return refiltered.fit(optimized=False, **smoothing)
+
+
+def update_fit(fit: Any, kind: str, new_values: np.ndarray) -> Any:
+    """
+    追加新观测并更新模型状态（不重新估计参数）
+
+    ARIMA通过状态空间模型的 append(refit=False) 用已估计参数对新观测滤波；
+    指数平滑类模型固定参数重新递推。
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        if kind == "arima":
+            return fit.append(new_values, refit=False)
+        values = np.concatenate([np.asarray(fit.model.endog, dtype=np.float64).ravel(), new_values])
+        return _refilter_smoothing(fit, values)
+
+
+def forecast_fit(fit: Any, kind: str, steps: int) -> Tuple[List[float], Optional[List[Dict[str, float]]]]:
+    """从已拟合模型的末尾状态预测steps步"""
+    if kind == "arima":
+        forecast_result = fit.get_forecast(steps=steps)
+        conf_int = np.asarray(forecast_result.conf_int())
+        confidence_intervals = [
+            {"lower": float(lower), "upper": float(upper)}
+            for lower, upper in conf_int
+        ]
+        return np.asarray(forecast_result.predicted_mean, dtype=np.float64).tolist(), confidence_intervals
+
+    predictions = np.asarray(fit.forecast(steps), dtype=np.float64)
+    return predictions.tolist(), smoothing_intervals(fit, predictions)
+
+
+class ModelRegistry:
+    """
+    已拟合模型的注册表
+
+    模型文件保存在 uploads/models/{model_id}.pkl，元数据保存在
+    {model_id}.json；索引按（数据内容哈希、列、模型配置）映射到模型ID，
+    相同配置重复拟合时直接复用。追加过观测的模型不再对应原始数据，
+    第一次追加时从索引中移除。最近使用的模型保留在进程内存中。
+    """
+
+    def __init__(self, models_dir: str = MODELS_DIR, cache_size: int = MODEL_CACHE_SIZE):
+        self.models_dir = models_dir
+        self.cache_size = cache_size
+        self.index = JsonIndex(os.path.join(models_dir, "model_index.json"))
+        self._loaded: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._model_locks: Dict[str, threading.Lock] = {}
+
+    def model_path(self, model_id: str) -> str:
+        return os.path.join(self.models_dir, f"{model_id}.pkl")
+
+    def _info_path(self, model_id: str) -> str:
+        return os.path.join(self.models_dir, f"{model_id}.json")
+
+    def _model_lock(self, model_id: str) -> threading.Lock:
+        with self._lock:
+            return self._model_locks.setdefault(model_id, threading.Lock())
+
+    def get_info(self, model_id: str) -> Optional[Dict[str, Any]]:
+        """读取模型元数据"""
+        path = self._info_path(model_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_info(self, info: Dict[str, Any]):
+        """写入模型元数据（原子替换）"""
+        os.makedirs(self.models_dir, exist_ok=True)
+        info["updated_at"] = datetime.now().isoformat()
+        path = self._info_path(info["model_id"])
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(info, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(tmp_path, path)
+
+    def find(self, key: str) -> Optional[Dict[str, Any]]:
+        """按配置键查找已注册的模型（模型文件已删除时返回None）"""
+        model_id = self.index.get(key)
+        if model_id is None or not os.path.exists(self.model_path(model_id)):
+            return None
+        return self.get_info(model_id)
+
+    def register(self, key: str, info: Dict[str, Any]):
+        """登记新拟合的模型（模型文件已由 fit_and_store 写入）"""
+        self.save_info(info)
+        self.index.set(key, info["model_id"])
+        with self._lock:
+            self._loaded.pop(info["model_id"], None)
+
+    def load(self, model_id: str) -> Any:
+        """加载模型结果对象（优先使用内存中的副本）"""
+        with self._lock:
+            if model_id in self._loaded:
+                self._loaded.move_to_end(model_id)
+                return self._loaded[model_id]
+
+        with open(self.model_path(model_id), "rb") as f:
+            fit = pickle.load(f)
+        self._remember(model_id, fit)
+        return fit
+
+    def _remember(self, model_id: str, fit: Any):
+        with self._lock:
+            self._loaded[model_id] = fit
+            self._loaded.move_to_end(model_id)
+            while len(self._loaded) > self.cache_size:
+                self._loaded.popitem(last=False)
+
+    def forecast(self, model_id: str, steps: int) -> Dict[str, Any]:
+        """用已保存的模型预测新的步数，不重新拟合"""
+        info = self.get_info(model_id)
+        fit = self.load(model_id)
+        predictions, confidence_intervals = forecast_fit(fit, info["model_type"], steps)
+        return {
+            "predictions": predictions,
+            "confidence_intervals": confidence_intervals,
+            "nobs": info["nobs"]
+        }
+
+    def append(self, model_id: str, values: List[float]) -> Dict[str, Any]:
+        """
+        追加新观测并更新模型状态
+
+        同一模型的追加操作串行执行，避免并发更新丢失观测。模型ID不变，
+        但模型已不再是原始数据上的拟合结果，因此从索引中移除，之后相同
+        配置的拟合请求会重新拟合。
+        """
+        new_values = np.asarray(values, dtype=np.float64)
+        if not np.isfinite(new_values).all():
+            raise ValueError("追加的观测中包含缺失值或无穷值")
+
+        with self._model_lock(model_id):
+            info = self.get_info(model_id)
+            fit = update_fit(self.load(model_id), info["model_type"], new_values)
+            self.index.discard_value(model_id)
+            _write_fit(self.model_path(model_id), fit)
+            self._remember(model_id, fit)
+
+            info["nobs"] = int(fit.model.nobs)
+            info["appended"] = info.get("appended", 0) + len(new_values)
+            self.save_info(info)
+        return info
+
+
+# 全局模型注册表
+model_registry = ModelRegistry()
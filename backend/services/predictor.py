@@ -1,20 +1,398 @@
 """
 预测服务 - 时间序列和机器学习预测
 """
+import os
 import pandas as pd
 import numpy as np
 from typing import Dict, Any, List, Tuple, Optional
-import json
-import plotly.graph_objects as go
-from statsmodels.tsa.stattools import adfuller, acf, pacf
+from statsmodels.tsa.stattools import adfuller, pacf
 from statsmodels.tsa.seasonal import seasonal_decompose
 from statsmodels.tsa.arima.model import ARIMA
 from statsmodels.tsa.holtwinters import ExponentialSmoothing
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 
 from models.schemas import ChartConfig
+from services.dataset_cache import dataset_cache
+from services.downsampling import downsample_line, DEFAULT_MAX_POINTS
+from services import chart_spec
+from services.arima_search import select_arima_order, DEFAULT_ORDER, FIT_MAXITER
+from services.seasonality import detect_seasonality, dominant_period
+from services.intervals import smoothing_intervals
+from services.validation_cache import validation_cache, IDENTITY
+
+def run_forecast(
+    series: pd.Series,
+    model_type: str,
+    forecast_periods: int,
+    arima_order: Optional[Tuple[int, int, int]] = None,
+    seasonal_order: Optional[Tuple[int, int, int, int]] = None,
+    seasonal_period: Optional[int] = None,
+    exog: Optional[pd.DataFrame] = None,
+    strategy: str = "recursive"
+) -> Tuple[np.ndarray, Optional[List[Dict]], Dict[str, float]]:
+    """
+    拟合模型并预测
+
+    模块级函数，可以在独立进程中执行（run_killable），避免模型拟合阻塞API进程。
+    """
+    predictor = TimeSeriesPredictor(file_path=None, file_format=None)
+    return predictor.predict(
+        series,
+        model_type=model_type,
+        forecast_periods=forecast_periods,
+        arima_order=arima_order,
+        seasonal_order=seasonal_order,
+        seasonal_period=seasonal_period,
+        exog=exog,
+        strategy=strategy
+    )
+
+def run_series_forecast(
+    series: pd.Series,
+    model_type: Optional[str],
+    forecast_periods: int,
+    auto_arima: bool = False
+) -> Dict[str, Any]:
+    """
+    单个序列的完整预测流程：验证假设 -> 选择模型 -> 预测
+
+    模块级函数，供批量预测在独立进程中逐序列执行。未开启auto_arima时
+    ARIMA使用默认阶数，避免每个序列都做阶数搜索。
+    """
+    predictor = TimeSeriesPredictor(file_path=None, file_format=None)
+    series, validation_result = predictor.validate_and_transform(series)
+    
+    if not model_type:
+        model_type = predictor.select_best_model(series, validation_result)
+    
+    predictions, confidence_intervals, metrics = predictor.predict(
+        series,
+        model_type=model_type,
+        forecast_periods=forecast_periods,
+        arima_order=None if auto_arima else DEFAULT_ORDER
+    )
+    
+    return {
+        "model_name": model_type,
+        "predictions": np.asarray(predictions, dtype=np.float64).tolist(),
+        "confidence_intervals": confidence_intervals,
+        "metrics": metrics,
+        "validation_passed": validation_result["is_valid"],
+        "observations": int(series.notna().sum())
+    }
+
+# 单个模型拟合的时间预算（秒），可按模型类型覆盖，如 FIT_BUDGET_ARIMA
+FIT_TIME_BUDGET = float(os.getenv("FIT_TIME_BUDGET", 60))
+# Holt-Winters/指数平滑参数优化的最大迭代次数
+SMOOTHING_FIT_MAXITER = int(os.getenv("SMOOTHING_FIT_MAXITER", 200))
+# 拟合失败或超时时使用的后备模型
+FALLBACK_MODEL = "moving_average"
+
+def fit_time_budget(model_type: str) -> float:
+    """模型拟合的时间预算（秒）"""
+    return float(os.getenv(f"FIT_BUDGET_{model_type.upper()}", FIT_TIME_BUDGET))
+
+# 训练集占去除缺失值后序列的比例，其余作为测试集评估预测
+TRAIN_RATIO = 0.8
+
+def train_test_split(series: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """去除缺失值后按时间顺序划分训练集和测试集"""
+    series_clean = series.dropna()
+    train_size = int(len(series_clean) * TRAIN_RATIO)
+    return series_clean[:train_size], series_clean[train_size:]
+
+# NumPy快速预测模型（不经过statsmodels，适合中小规模序列）
+FAST_MODELS = ("fast_ses", "fast_holt", "fast_holtwinters", "fast_ar")
+# 无季节ETS估计递推起点所用的观测数
+ETS_INIT_POINTS = 10
+# ETS累计误差内积的块长（限制误差缓存的内存）
+ETS_BLOCK_SIZE = 256
+# AR模型的最大阶数
+FAST_AR_MAX_P = int(os.getenv("FAST_AR_MAX_P", 12))
+
+def _ets_sse(
+    y: np.ndarray,
+    alpha: np.ndarray,
+    beta: np.ndarray,
+    gamma: np.ndarray,
+    m: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    加法误差修正形式的ETS递推，对一组参数同时计算
+    
+    时间维度逐点递推，参数维度向量化。beta=0为无趋势，gamma=0且m=1为无季节。
+    初始水平、趋势和季节因子对每组参数取最小二乘最优值：固定平滑参数时一步
+    预测误差是初始状态的仿射函数，递推中同时累计误差对初始状态的导数，
+    结束后解一个小的正规方程即可，不必把初始状态加入网格。
+    
+    Returns:
+        (一步预测误差平方和, 末尾水平, 末尾趋势, 末尾季节因子[参数数, m])
+    """
+    n = len(y)
+    grid = len(alpha)
+    has_trend = bool(np.any(beta))
+    
+    if m > 1:
+        # 递推的起点：以第一个周期的均值和前两个周期的均值差估计水平和趋势
+        first = y[:m].mean()
+        b0 = (y[m:2 * m].mean() - first) / m if has_trend else 0.0
+        season0 = y[:m] - (first + b0 * (np.arange(m) - (m - 1) / 2))
+        l0 = first - b0 * (m + 1) / 2
+    else:
+        # 递推的起点：前若干个观测的最小二乘直线（无趋势时为均值）
+        k = min(n, ETS_INIT_POINTS)
+        b0, intercept = np.polyfit(np.arange(k), y[:k], 1) if has_trend else (0.0, y[:k].mean())
+        season0 = np.zeros(1)
+        l0 = intercept - b0
+    
+    # 把误差和误差对各初始状态的导数叠成一个状态数组同时递推（第0行为
+    # 误差本身，其余行为导数，服从同一线性递推）。水平整体加c、季节因子
+    # 整体减c时预测不变，因此季节方向取和为0的 e_j - e_{m-1}，共m-1个
+    n_season = m - 1 if m > 1 else 0
+    n_init = 1 + has_trend + n_season
+    level = np.zeros((n_init + 1, grid))
+    trend = np.zeros((n_init + 1, grid))
+    season = np.zeros((m, n_init + 1, grid))
+    level[0], trend[0], season[:, 0] = l0, b0, season0[:, None]
+    level[1] = 1.0
+    if has_trend:
+        trend[2] = 1.0
+    for j in range(n_season):
+        row = 2 + has_trend + j
+        season[j, row] = 1.0
+        season[m - 1, row] = -1.0
+    # 各行误差两两内积：products[i, j] = sum_t e_i(t) * e_j(t)，按块累计，
+    # 行数越多块长越短，误差缓存不超过无季节带趋势模型（3行）时的大小
+    products = np.zeros((n_init + 1, n_init + 1, grid))
+    block_size = max(1, min(n, ETS_BLOCK_SIZE * 3 // (n_init + 1)))
+    errors = np.empty((block_size, n_init + 1, grid))
+    
+    # 原地更新状态，避免每步分配临时数组
+    scratch = np.empty_like(level)
+    for t in range(n):
+        error = errors[t % block_size]
+        np.add(level, trend, out=error)
+        if m > 1:
+            error += season[t % m]
+        np.negative(error, out=error)
+        error[0] += y[t]
+        level += trend
+        level += np.multiply(alpha, error, out=scratch)
+        if has_trend:
+            trend += np.multiply(beta, error, out=scratch)
+        if m > 1:
+            season[t % m] += np.multiply(gamma, error, out=scratch)
+        if t % block_size == block_size - 1 or t == n - 1:
+            block = errors[:t % block_size + 1].transpose(2, 1, 0)
+            products += np.matmul(block, block.transpose(0, 2, 1)).transpose(1, 2, 0)
+    # 最优修正量 delta 使 sum((e_0 + sum_i delta_i * e_i)^2) 最小
+    gram = np.moveaxis(products[1:, 1:], -1, 0)
+    cross = products[0, 1:].T
+    ridge = 1e-10 * (np.trace(gram, axis1=1, axis2=2)[:, None, None] + 1.0) * np.eye(n_init)
+    delta = np.linalg.solve(gram + ridge, -cross[:, :, None])[:, :, 0]
+    sse = np.maximum(products[0, 0] + np.sum(cross * delta, axis=1), 0.0)
+    final_level = level[0] + np.sum(level[1:].T * delta, axis=1)
+    final_trend = trend[0] + np.sum(trend[1:].T * delta, axis=1)
+    final_season = (season[:, 0] + np.einsum("mig,gi->mg", season[:, 1:], delta)).T
+    return sse, final_level, final_trend, final_season
+
+def _fit_ets(y: np.ndarray, trend: bool, m: int) -> Dict[str, Any]:
+    """
+    两阶段网格搜索平滑参数：先在粗网格上并行评估，再在最优点附近细化
+    
+    趋势参数按 beta = alpha * beta*（beta*∈[0,1]），季节参数按
+    gamma = (1 - alpha) * gamma*，保证落在可行域内。
+    """
+    seasonal = m > 1
+    # Holt-Winters有三个参数，且每组参数要同时递推m+1个初始状态的导数，
+    # 粗网格更稀疏以控制计算量
+    coarse = np.linspace(0.05, 1.0, 20 if not seasonal else 7)
+    
+    def evaluate(alphas, beta_stars, gamma_stars):
+        a, bs, gs = (g.ravel() for g in np.meshgrid(alphas, beta_stars, gamma_stars, indexing="ij"))
+        beta = a * bs if trend else np.zeros_like(a)
+        gamma = (1 - a) * gs if seasonal else np.zeros_like(a)
+        sse, level, trend_state, season = _ets_sse(y, a, beta, gamma, m)
+        sse = np.where(np.isfinite(sse), sse, np.inf)
+        best = int(np.argmin(sse))
+        return {
+            "alpha": a[best], "beta_star": bs[best], "gamma_star": gs[best],
+            "beta": beta[best], "gamma": gamma[best], "sse": sse[best],
+            "level": level[best], "trend": trend_state[best], "season": season[best]
+        }
+    
+    # 趋势和季节参数允许为0（退化为固定趋势/固定季节）
+    coarse_star = np.linspace(0.0, 1.0, len(coarse) + 1)
+    zero = np.zeros(1)
+    best = evaluate(coarse, coarse_star if trend else zero, coarse_star if seasonal else zero)
+    
+    # 在粗网格最优点附近细化
+    step = coarse[1] - coarse[0]
+    def around(center, lower):
+        return np.unique(np.clip(np.linspace(center - step, center + step, 5), lower, 1.0))
+    refined = evaluate(
+        around(best["alpha"], 0.01),
+        around(best["beta_star"], 0.0) if trend else zero,
+        around(best["gamma_star"], 0.0) if seasonal else zero
+    )
+    return refined if refined["sse"] <= best["sse"] else best
+
+def _ets_forecast(
+    fit: Dict[str, Any],
+    n: int,
+    m: int,
+    forecast_periods: int
+) -> Tuple[np.ndarray, List[Dict]]:
+    """ETS点预测和95%预测区间（加法模型的解析方差）"""
+    h = np.arange(1, forecast_periods + 1)
+    season = fit["season"][(n + h - 1) % m]
+    predictions = fit["level"] + h * fit["trend"] + season
+    
+    # 方差：sigma^2 * (1 + sum_{j=1}^{h-1} c_j^2)，c_j = alpha + beta*j + gamma*[j能被m整除]
+    n_params = 1 + (fit["beta"] > 0) + (m > 1)
+    sigma2 = fit["sse"] / max(n - n_params, 1)
+    j = np.arange(1, forecast_periods)
+    c = fit["alpha"] + fit["beta"] * j + (fit["gamma"] * (j % m == 0) if m > 1 else 0.0)
+    variance = sigma2 * (1 + np.concatenate([[0.0], np.cumsum(c * c)]))
+    return predictions, _interval_list(predictions, variance)
+
+def _fit_ar(y: np.ndarray, max_p: int = FAST_AR_MAX_P) -> Dict[str, Any]:
+    """
+    带截距的AR(p)，最小二乘闭式求解，按AIC选择阶数
+    
+    各阶数在相同的有效样本（去掉前max_p个点）上比较AIC。
+    """
+    n = len(y)
+    max_p = max(1, min(max_p, n // 4))
+    # lags[i] = [y[i+max_p-1], ..., y[i]]（最近的滞后在前）
+    lags = np.lib.stride_tricks.sliding_window_view(y[:-1], max_p)[:, ::-1]
+    target = y[max_p:]
+    n_eff = len(target)
+    
+    best = None
+    for p in range(1, max_p + 1):
+        design = np.column_stack([np.ones(n_eff), lags[:, :p]])
+        coef, _, _, _ = np.linalg.lstsq(design, target, rcond=None)
+        sse = float(np.sum((target - design @ coef) ** 2))
+        aic = n_eff * np.log(max(sse, 1e-300) / n_eff) + 2 * (p + 1)
+        if best is None or aic < best["aic"]:
+            best = {"p": p, "coef": coef, "sse": sse, "aic": aic}
+    
+    best["sigma2"] = best["sse"] / max(n_eff - best["p"] - 1, 1)
+    return best
+
+def _ar_forecast(fit: Dict[str, Any], y: np.ndarray, forecast_periods: int) -> Tuple[np.ndarray, List[Dict]]:
+    """AR递推预测，预测方差由psi权重计算"""
+    p = fit["p"]
+    intercept, phi = fit["coef"][0], fit["coef"][1:]
+    history = list(y[-p:][::-1])
+    predictions = np.empty(forecast_periods)
+    for h in range(forecast_periods):
+        predictions[h] = intercept + phi @ np.asarray(history[:p])
+        history.insert(0, predictions[h])
+    
+    psi = np.zeros(forecast_periods)
+    psi[0] = 1.0
+    for j in range(1, forecast_periods):
+        k = min(j, p)
+        psi[j] = phi[:k] @ psi[j - 1::-1][:k]
+    variance = fit["sigma2"] * np.cumsum(psi * psi)
+    return predictions, _interval_list(predictions, variance)
+
+def _interval_list(predictions: np.ndarray, variance: np.ndarray) -> List[Dict]:
+    half_width = 1.96 * np.sqrt(variance)
+    return [
+        {"lower": float(p - w), "upper": float(p + w)}
+        for p, w in zip(predictions, half_width)
+    ]
+
+def fast_forecast(
+    series,
+    model_type: str,
+    forecast_periods: int,
+    seasonal_periods: Optional[int] = None
+) -> Tuple[np.ndarray, List[Dict]]:
+    """
+    NumPy快速预测
+    
+    fast_ses / fast_holt / fast_holtwinters 为加法ETS模型，平滑参数用向量化网格
+    搜索，初始状态取最小二乘最优值；fast_ar 为AR(p)最小二乘。序列过短无法
+    估计季节时，Holt-Winters退化为Holt。
+    
+    Returns:
+        (预测值, 95%预测区间)
+    """
+    y = np.asarray(series.dropna() if hasattr(series, "dropna") else series, dtype=np.float64)
+    if len(y) < 4:
+        raise ValueError("数据量太少，无法拟合快速预测模型")
+    
+    if model_type == "fast_ar":
+        return _ar_forecast(_fit_ar(y), y, forecast_periods)
+    
+    m = 1
+    if model_type == "fast_holtwinters":
+        m = max(seasonal_periods or dominant_period(y) or min(12, len(y) // 2), 2)
+        if len(y) < 2 * m:
+            m = 1
+    trend = model_type != "fast_ses"
+    
+    fit = _fit_ets(y, trend, m)
+    return _ets_forecast(fit, len(y), m, forecast_periods)
+
+# 随机森林滞后特征模型
+RF_MAX_LAGS = int(os.getenv("RF_MAX_LAGS", 24))
+RF_N_ESTIMATORS = int(os.getenv("RF_N_ESTIMATORS", 100))
+RF_N_JOBS = int(os.getenv("RF_N_JOBS", -1))
+FORECAST_STRATEGIES = ("recursive", "direct")
+
+def lag_feature_matrix(
+    y: np.ndarray,
+    positions: np.ndarray,
+    n_lags: int,
+    windows: List[int],
+    period: Optional[int] = None,
+    calendar: Optional[pd.DatetimeIndex] = None,
+    exog: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    构建预测y[t]所用的特征矩阵（每个t一行，只使用t之前的信息）
+    
+    特征依次为：滞后值 y[t-1..t-n_lags]、滑动窗口均值和标准差（累积和计算）、
+    季节相位 t % period、日历特征（星期、月份、月内日期）、外生变量的1阶滞后。
+    滞后矩阵由 sliding_window_view 生成，不逐行循环。
+    
+    Args:
+        y: 观测序列
+        positions: 目标时刻t（n_lags <= t <= len(y)，t=len(y)即下一时刻）
+        n_lags: 滞后阶数
+        windows: 滑动窗口长度（均不超过n_lags）
+        period: 季节周期
+        calendar: 各目标时刻的时间戳（与positions等长）
+        exog: 外生变量矩阵（行数与y相同）
+    """
+    positions = np.asarray(positions, dtype=np.intp)
+    lag_view = np.lib.stride_tricks.sliding_window_view(y, n_lags)
+    columns = [lag_view[positions - n_lags][:, ::-1]]
+    
+    cumsum = np.concatenate([[0.0], np.cumsum(y)])
+    cumsum_sq = np.concatenate([[0.0], np.cumsum(y * y)])
+    for window in windows:
+        mean = (cumsum[positions] - cumsum[positions - window]) / window
+        mean_sq = (cumsum_sq[positions] - cumsum_sq[positions - window]) / window
+        columns.append(mean[:, None])
+        columns.append(np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))[:, None])
+    
+    if period:
+        columns.append((positions % period)[:, None].astype(np.float64))
+    
+    if calendar is not None:
+        columns.append(np.column_stack([calendar.dayofweek, calendar.month, calendar.day]).astype(np.float64))
+    
+    if exog is not None:
+        columns.append(exog[positions - 1])
+    
+    return np.hstack(columns)
 
 class TimeSeriesPredictor:
     """时间序列预测器"""
@@ -26,16 +404,7 @@ class TimeSeriesPredictor:
     
     def load_data(self) -> pd.DataFrame:
         """加载数据"""
-        if self.file_format == 'csv':
-            self.df = pd.read_csv(self.file_path)
-        elif self.file_format == 'json':
-            self.df = pd.read_json(self.file_path)
-        elif self.file_format == 'txt':
-            try:
-                self.df = pd.read_csv(self.file_path, sep='\t')
-            except:
-                self.df = pd.read_csv(self.file_path, sep=',')
-        
+        self.df = dataset_cache.load(self.file_path, self.file_format)
         return self.df
     
     def validate_assumptions(
@@ -78,7 +447,7 @@ class TimeSeriesPredictor:
                 result["tests"]["adf_test"] = {
                     "statistic": float(adf_result[0]),
                     "pvalue": float(adf_result[1]),
-                    "is_stationary": adf_result[1] < 0.05
+                    "is_stationary": bool(adf_result[1] < 0.05)
                 }
                 
                 if not result["tests"]["adf_test"]["is_stationary"]:
@@ -95,7 +464,7 @@ class TimeSeriesPredictor:
                 
                 result["tests"]["trend"] = {
                     "slope": float(coeffs[0]),
-                    "has_trend": abs(coeffs[0]) > 0.01
+                    "has_trend": bool(abs(coeffs[0]) > 0.01)
                 }
                 
                 if result["tests"]["trend"]["has_trend"]:
@@ -103,32 +472,98 @@ class TimeSeriesPredictor:
             except Exception as e:
                 result["tests"]["trend"] = {"error": str(e)}
         
-        # 3. 季节性检测
+        # 3. 季节性检测（FFT自相关 + 周期图，可检测到n/2的周期）
         if check_seasonality and len(series_clean) >= 20:
             try:
-                # 使用自相关函数检测季节性
-                acf_values = acf(series_clean, nlags=min(20, len(series_clean) // 2))
-                
-                # 检查是否有显著的周期性峰值
-                peaks = []
-                for i in range(2, len(acf_values)):
-                    if abs(acf_values[i]) > 0.3:  # 阈值
-                        peaks.append(i)
+                candidates = detect_seasonality(series_clean)
+                periods = [c["period"] for c in candidates]
                 
                 result["tests"]["seasonality"] = {
-                    "has_seasonality": len(peaks) > 0,
-                    "possible_periods": peaks[:3]  # 最多显示3个可能的周期
+                    "has_seasonality": len(candidates) > 0,
+                    "possible_periods": periods,
+                    "candidates": candidates,
+                    "period": periods[0] if periods else None
                 }
                 
                 if result["tests"]["seasonality"]["has_seasonality"]:
                     result["recommendations"].append(
-                        f"数据可能存在周期性，周期为: {peaks[:3]}"
+                        f"数据可能存在周期性，周期为: {periods}"
                     )
             except Exception as e:
                 result["tests"]["seasonality"] = {"error": str(e)}
         
         return result
     
+    def validate_cached(
+        self,
+        series: pd.Series,
+        cache_key: Optional[Tuple[str, str]] = None
+    ) -> Dict[str, Any]:
+        """
+        验证原始序列的假设，结果按(内容哈希, 列名)缓存
+        
+        Args:
+            series: 时间序列数据
+            cache_key: (数据内容哈希, 列名)，为None时不使用缓存
+        """
+        key = (*cache_key, IDENTITY) if cache_key else None
+        if key is not None:
+            cached = validation_cache.get(key)
+            if cached is not None:
+                return cached[0]
+        
+        validation_result = self.validate_assumptions(
+            series,
+            check_stationarity=True,
+            check_seasonality=True,
+            check_trend=True
+        )
+        if key is not None:
+            validation_cache.put(key, validation_result)
+        return validation_result
+    
+    def validate_and_transform(
+        self,
+        series: pd.Series,
+        cache_key: Optional[Tuple[str, str]] = None
+    ) -> Tuple[pd.Series, Dict[str, Any]]:
+        """
+        验证数据假设，不满足时转换数据并重新验证
+        
+        提供cache_key时，原始序列的验证结果、变换后的序列及其验证结果都从缓存读取。
+        
+        Returns:
+            (可能经过转换的序列, 验证结果)
+        """
+        validation_result = self.validate_cached(series, cache_key)
+        
+        if not validation_result["is_valid"]:
+            key = (*cache_key, f"transform:{self._transform_name(validation_result)}") if cache_key else None
+            cached = validation_cache.get(key) if key is not None else None
+            if cached is not None:
+                return cached[1], cached[0]
+            
+            # 如果不满足假设，尝试转换数据
+            series = self.transform_data(series, validation_result)
+            
+            # 重新验证
+            validation_result = self.validate_assumptions(
+                series,
+                check_stationarity=True,
+                check_seasonality=True,
+                check_trend=True
+            )
+            if key is not None:
+                validation_cache.put(key, validation_result, series)
+        
+        return series, validation_result
+    
+    def _transform_name(self, validation_result: Dict[str, Any]) -> str:
+        """transform_data将执行的变换（用作缓存键）"""
+        if not validation_result.get("tests", {}).get("adf_test", {}).get("is_stationary", True):
+            return "diff"
+        return IDENTITY
+    
     def transform_data(
         self,
         series: pd.Series,
@@ -168,7 +603,12 @@ class TimeSeriesPredictor:
         self,
         series: pd.Series,
         model_type: str = "arima",
-        forecast_periods: int = 10
+        forecast_periods: int = 10,
+        arima_order: Optional[Tuple[int, int, int]] = None,
+        seasonal_order: Optional[Tuple[int, int, int, int]] = None,
+        seasonal_period: Optional[int] = None,
+        exog: Optional[pd.DataFrame] = None,
+        strategy: str = "recursive"
     ) -> Tuple[np.ndarray, Optional[List[Dict]], Dict[str, float]]:
         """
         执行预测
@@ -177,67 +617,108 @@ class TimeSeriesPredictor:
             series: 时间序列数据
             model_type: 模型类型
             forecast_periods: 预测周期数
+            arima_order: ARIMA阶数，为None时在训练集上自动搜索
+            seasonal_order: ARIMA季节阶数
+            seasonal_period: Holt-Winters季节周期，为None时在训练集上检测
+            exog: 随机森林使用的外生特征列（索引与series对齐）
+            strategy: 随机森林多步预测策略，recursive / direct
         
         Returns:
             (预测值, 置信区间, 评估指标)
         """
-        series_clean = series.dropna()
-        
         # 分割训练集和测试集
-        train_size = int(len(series_clean) * 0.8)
-        train = series_clean[:train_size]
-        test = series_clean[train_size:]
+        train, test = train_test_split(series)
         
         predictions = None
         confidence_intervals = None
+        fallback = False
         
         try:
             if model_type == "arima":
                 predictions, confidence_intervals = self._predict_arima(
-                    train, test, forecast_periods
+                    train, test, forecast_periods, arima_order, seasonal_order
                 )
             elif model_type == "holtwinters":
                 predictions, confidence_intervals = self._predict_holtwinters(
-                    train, test, forecast_periods
+                    train, test, forecast_periods, seasonal_period
                 )
             elif model_type == "exponential_smoothing":
                 predictions, confidence_intervals = self._predict_exponential_smoothing(
                     train, test, forecast_periods
                 )
+            elif model_type == "random_forest":
+                predictions, confidence_intervals = self._predict_random_forest(
+                    train, test, forecast_periods, exog, strategy, seasonal_period
+                )
+            elif model_type in FAST_MODELS:
+                predictions, confidence_intervals = fast_forecast(
+                    train, model_type, forecast_periods, seasonal_period
+                )
             else:
                 # 默认使用ARIMA
                 predictions, confidence_intervals = self._predict_arima(
-                    train, test, forecast_periods
+                    train, test, forecast_periods, arima_order, seasonal_order
                 )
         except Exception as e:
             # 如果模型失败，使用简单的移动平均作为后备
-            window = min(5, len(train) // 2)
-            last_values = train.tail(window).mean()
-            predictions = np.array([last_values] * forecast_periods)
+            predictions = self._moving_average_forecast(train, forecast_periods)
             confidence_intervals = None
+            fallback = True
         
-        # 计算评估指标
+        metrics = self._evaluate(test, predictions)
+        if fallback:
+            metrics["fallback"] = 1.0
+        
+        return predictions, confidence_intervals, metrics
+    
+    def fallback_predict(
+        self,
+        series: pd.Series,
+        forecast_periods: int = 10
+    ) -> Tuple[np.ndarray, None, Dict[str, float]]:
+        """
+        后备预测（移动平均）
+        
+        与predict使用相同的训练/测试划分，用于模型拟合超时等情况。
+        """
+        train, test = train_test_split(series)
+        
+        predictions = self._moving_average_forecast(train, forecast_periods)
+        metrics = self._evaluate(test, predictions)
+        metrics["fallback"] = 1.0
+        return predictions, None, metrics
+    
+    def _moving_average_forecast(self, train: pd.Series, forecast_periods: int) -> np.ndarray:
+        """最近若干点的均值作为所有未来步的预测"""
+        window = max(min(5, len(train) // 2), 1)
+        last_values = train.tail(window).mean()
+        return np.array([last_values] * forecast_periods)
+    
+    def _evaluate(self, test: pd.Series, predictions: Optional[np.ndarray]) -> Dict[str, float]:
+        """计算测试集上的评估指标"""
         metrics = {}
         if len(test) > 0 and predictions is not None:
-            test_predictions = predictions[:len(test)]
+            # 预测步数可能少于测试集长度，只比较重叠部分
+            overlap = min(len(test), len(predictions))
+            test_actual = test[:overlap]
+            test_predictions = predictions[:overlap]
             metrics = {
-                "mse": float(mean_squared_error(test, test_predictions)),
-                "mae": float(mean_absolute_error(test, test_predictions)),
-                "rmse": float(np.sqrt(mean_squared_error(test, test_predictions)))
+                "mse": float(mean_squared_error(test_actual, test_predictions)),
+                "mae": float(mean_absolute_error(test_actual, test_predictions)),
+                "rmse": float(np.sqrt(mean_squared_error(test_actual, test_predictions)))
             }
-        
-        return predictions, confidence_intervals, metrics
+        return metrics
     
     def _predict_arima(
         self,
         train: pd.Series,
         test: pd.Series,
-        forecast_periods: int
+        forecast_periods: int,
+        order: Optional[Tuple[int, int, int]] = None,
+        seasonal_order: Optional[Tuple[int, int, int, int]] = None
     ) -> Tuple[np.ndarray, List[Dict]]:
         """ARIMA预测"""
-        # 使用自动选择的参数
-        model = ARIMA(train, order=(1, 1, 1))
-        model_fit = model.fit()
+        model_fit = self._fit_arima(train, order, seasonal_order)
         
         # 预测
         forecast = model_fit.forecast(steps=forecast_periods)
@@ -260,25 +741,15 @@ class TimeSeriesPredictor:
         self,
         train: pd.Series,
         test: pd.Series,
-        forecast_periods: int
-    ) -> Tuple[np.ndarray, None]:
-        """Holt-Winters指数平滑预测"""
+        forecast_periods: int,
+        seasonal_periods: Optional[int] = None
+    ) -> Tuple[np.ndarray, List[Dict]]:
+        """Holt-Winters指数平滑预测（残差自助法预测区间）"""
         try:
-            # 尝试使用季节性模型
-            seasonal_periods = min(12, len(train) // 2)
-            if seasonal_periods < 2:
-                seasonal_periods = 2
-            
-            model = ExponentialSmoothing(
-                train,
-                seasonal_periods=seasonal_periods,
-                trend='add',
-                seasonal='add'
-            )
-            model_fit = model.fit()
+            model_fit = self._fit_holtwinters(train, seasonal_periods)
             forecast = model_fit.forecast(steps=forecast_periods)
             
-            return forecast.values, None
+            return forecast.values, smoothing_intervals(model_fit, forecast.values)
         except:
             # 如果失败，使用简单指数平滑
             return self._predict_exponential_smoothing(train, test, forecast_periods)
@@ -288,71 +759,204 @@ class TimeSeriesPredictor:
         train: pd.Series,
         test: pd.Series,
         forecast_periods: int
-    ) -> Tuple[np.ndarray, None]:
-        """简单指数平滑预测"""
-        model = ExponentialSmoothing(train, trend='add')
-        model_fit = model.fit()
+    ) -> Tuple[np.ndarray, List[Dict]]:
+        """简单指数平滑预测（残差自助法预测区间）"""
+        model_fit = self._fit_exponential_smoothing(train)
         forecast = model_fit.forecast(steps=forecast_periods)
         
-        return forecast.values, None
+        return forecast.values, smoothing_intervals(model_fit, forecast.values)
+    
+    def _predict_random_forest(
+        self,
+        train: pd.Series,
+        test: pd.Series,
+        forecast_periods: int,
+        exog: Optional[pd.DataFrame] = None,
+        strategy: str = "recursive",
+        seasonal_period: Optional[int] = None
+    ) -> Tuple[np.ndarray, None]:
+        """
+        随机森林滞后特征预测
+        
+        recursive：训练一步预测模型，逐步把预测值追加到历史中继续预测；
+        外生变量在未来时刻沿用最后的观测值。
+        direct：以预测起点的特征同时预测未来forecast_periods步（多输出森林），
+        不需要未来的外生变量。
+        """
+        if strategy not in FORECAST_STRATEGIES:
+            raise ValueError(f"不支持的预测策略: {strategy}")
+        
+        y = train.to_numpy(dtype=np.float64)
+        n = len(y)
+        period = seasonal_period or dominant_period(y)
+        n_lags = min(max(RF_MAX_LAGS, (period or 0) + 1), n // 3)
+        if n_lags < 1:
+            raise ValueError("数据量太少，无法构建滞后特征")
+        windows = sorted({w for w in (3, 7, period) if w and 2 <= w <= n_lags})
+        
+        exog_values = None
+        if exog is not None and len(exog.columns) > 0:
+            exog_values = (
+                exog.reindex(train.index).ffill().bfill().fillna(0.0).to_numpy(dtype=np.float64)
+            )
+        
+        future_calendar = None
+        calendar = None
+        if isinstance(train.index, pd.DatetimeIndex):
+            freq = train.index.freq or pd.infer_freq(train.index) or (train.index[-1] - train.index[-2])
+            future_calendar = pd.date_range(train.index[-1], periods=forecast_periods + 1, freq=freq)[1:]
+            calendar = train.index
+        
+        def features(history, positions, exog_history, timestamps):
+            return lag_feature_matrix(
+                history, positions, n_lags, windows, period,
+                calendar=timestamps, exog=exog_history
+            )
+        
+        model = RandomForestRegressor(
+            n_estimators=RF_N_ESTIMATORS,
+            n_jobs=RF_N_JOBS,
+            random_state=42
+        )
+        
+        if strategy == "direct":
+            horizon = min(forecast_periods, n - n_lags - 1)
+            if horizon < 1:
+                raise ValueError("数据量太少，无法进行直接多步预测")
+            origins = np.arange(n_lags, n - horizon + 1)
+            targets = np.lib.stride_tricks.sliding_window_view(y, horizon)[origins]
+            X = features(y, origins, exog_values, calendar[origins] if calendar is not None else None)
+            model.fit(X, targets)
+            
+            last = features(
+                y, np.array([n]), exog_values,
+                future_calendar[:1] if future_calendar is not None else None
+            )
+            predictions = np.asarray(model.predict(last)).reshape(-1)
+            # 超出可训练步数的部分沿用最后一步的预测
+            if len(predictions) < forecast_periods:
+                predictions = np.concatenate([
+                    predictions, np.repeat(predictions[-1], forecast_periods - len(predictions))
+                ])
+            return predictions, None
+        
+        positions = np.arange(n_lags, n)
+        X = features(y, positions, exog_values, calendar[positions] if calendar is not None else None)
+        model.fit(X, y[positions])
+        
+        history = np.concatenate([y, np.empty(forecast_periods)])
+        exog_history = None
+        if exog_values is not None:
+            exog_history = np.vstack([exog_values, np.repeat(exog_values[-1:], forecast_periods, axis=0)])
+        for step in range(forecast_periods):
+            t = n + step
+            row = features(
+                history[:t], np.array([t]),
+                exog_history[:t + 1] if exog_history is not None else None,
+                future_calendar[step:step + 1] if future_calendar is not None else None
+            )
+            history[t] = model.predict(row)[0]
+        
+        return history[n:], None
+    
+    def _fit_arima(
+        self,
+        train,
+        order: Optional[Tuple[int, int, int]] = None,
+        seasonal_order: Optional[Tuple[int, int, int, int]] = None
+    ):
+        """拟合ARIMA模型，返回statsmodels结果对象"""
+        # 未指定阶数时自动搜索（串行，API层会预先在独立进程中并行搜索）
+        if order is None:
+            selection = select_arima_order(train)
+            order, seasonal_order = selection["order"], selection["seasonal_order"]
+        
+        model = ARIMA(train, order=order, seasonal_order=seasonal_order or (0, 0, 0, 0))
+        return model.fit(method_kwargs={"maxiter": FIT_MAXITER})
+    
+    def _fit_holtwinters(self, train, seasonal_periods: Optional[int] = None):
+        """
+        拟合加法趋势+加法季节的Holt-Winters模型
+        
+        未指定季节周期时使用检测到的主周期，检测不到时退回 min(12, n/2)。
+        """
+        if seasonal_periods is None:
+            seasonal_periods = dominant_period(train) or min(12, len(train) // 2)
+        seasonal_periods = max(seasonal_periods, 2)
+        
+        model = ExponentialSmoothing(
+            train,
+            seasonal_periods=seasonal_periods,
+            trend='add',
+            seasonal='add'
+        )
+        return model.fit(minimize_kwargs={"options": {"maxiter": SMOOTHING_FIT_MAXITER}})
+    
+    def _fit_exponential_smoothing(self, train):
+        """拟合加法趋势的指数平滑模型"""
+        model = ExponentialSmoothing(train, trend='add')
+        return model.fit(minimize_kwargs={"options": {"maxiter": SMOOTHING_FIT_MAXITER}})
     
     def create_prediction_chart(
         self,
         actual_data: pd.Series,
         predictions: np.ndarray,
         confidence_intervals: Optional[List[Dict]],
-        title: str = "Prediction Results"
+        title: str = "Prediction Results",
+        max_points: int = DEFAULT_MAX_POINTS
     ) -> ChartConfig:
-        """创建预测结果图表"""
-        fig = go.Figure()
+        """
+        创建预测结果图表
         
+        实际数据超过max_points个点时使用LTTB降采样，预测部分保持原样。
+        """
         # 实际数据
-        fig.add_trace(go.Scatter(
-            x=list(range(len(actual_data))),
-            y=actual_data.values,
-            mode='lines',
+        actual_x, actual_y = downsample_line(
+            np.arange(len(actual_data)),
+            actual_data.to_numpy(dtype=np.float64, na_value=np.nan),
+            max_points
+        )
+        traces = [chart_spec.line_trace(
+            x=actual_x,
+            y=actual_y,
             name='Actual Data',
-            line=dict(color='blue')
-        ))
+            line={"color": "blue"}
+        )]
         
         # 预测数据
         prediction_x = list(range(len(actual_data), len(actual_data) + len(predictions)))
-        fig.add_trace(go.Scatter(
+        traces.append(chart_spec.line_trace(
             x=prediction_x,
             y=predictions,
-            mode='lines',
             name='Predictions',
-            line=dict(color='red', dash='dash')
+            line={"color": "red", "dash": "dash"}
         ))
         
         # 置信区间
         if confidence_intervals:
-            upper = [ci["upper"] for ci in confidence_intervals]
-            lower = [ci["lower"] for ci in confidence_intervals]
-            
-            fig.add_trace(go.Scatter(
-                x=prediction_x + prediction_x[::-1],
-                y=upper + lower[::-1],
-                fill='toself',
-                fillcolor='rgba(255,0,0,0.2)',
-                line=dict(color='rgba(255,255,255,0)'),
+            traces.append(chart_spec.band_trace(
+                x=prediction_x,
+                lower=[ci["lower"] for ci in confidence_intervals],
+                upper=[ci["upper"] for ci in confidence_intervals],
                 name='Confidence Interval',
-                showlegend=True
+                fillcolor='rgba(255,0,0,0.2)'
             ))
         
-        fig.update_layout(
+        chart_data = chart_spec.figure(
+            traces,
             title=title,
             xaxis_title='Time',
             yaxis_title='Value',
             hovermode='x'
         )
         
-        chart_data = json.loads(fig.to_json())
-        
         return ChartConfig(
             type="prediction",
             title=title,
             data=chart_data,
-            config={}
+            config={
+                "original_points": int(len(actual_data)),
+                "displayed_points": int(len(actual_x))
+            }
         )
 
@@ -0,0 +1,182 @@
+"""
+提示词摘要 - 在token预算内把统计结果压缩为紧凑的表格
+"""
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# 洞察提示词中统计摘要的token预算
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", 1500))
+# 视为强相关的相关系数绝对值
+STRONG_CORRELATION = float(os.getenv("PROMPT_STRONG_CORRELATION", 0.7))
+# 摘要中最多列出的强相关列对数
+MAX_CORRELATION_PAIRS = 10
+
+_CJK = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的token数
+
+    中文字符和全角标点大约各占1个token，其余字符约4个占1个token。
+    只用于预算控制，不追求与分词器完全一致。
+    """
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def strong_correlations(
+    df: pd.DataFrame,
+    threshold: float = STRONG_CORRELATION,
+    limit: int = MAX_CORRELATION_PAIRS
+) -> List[Dict[str, Any]]:
+    """
+    数值列之间的强相关列对，按相关系数绝对值降序
+
+    Returns:
+        [{"a", "b", "r"}]
+    """
+    numeric_df = df.select_dtypes(include=[np.number])
+    if numeric_df.shape[1] < 2:
+        return []
+
+    corr = numeric_df.corr().to_numpy()
+    rows, cols = np.triu_indices_from(corr, k=1)
+    values = corr[rows, cols]
+    keep = np.isfinite(values) & (np.abs(values) >= threshold)
+    rows, cols, values = rows[keep], cols[keep], values[keep]
+    order = np.argsort(-np.abs(values))[:limit]
+
+    names = numeric_df.columns
+    return [
+        {"a": str(names[rows[i]]), "b": str(names[cols[i]]), "r": round(float(values[i]), 3)}
+        for i in order
+    ]
+
+
+def _fmt(value: Any) -> str:
+    """紧凑的数值格式（4位有效数字，缺失值为-）"""
+    if value is None:
+        return "-"
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    if not np.isfinite(value):
+        return "-"
+    return f"{value:.4g}"
+
+
+def column_interest(
+    statistics: Dict[str, Any],
+    correlations: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, float]:
+    """
+    列的关注度评分，越高越值得写进提示词
+
+    由三部分相加（各自在[0, 1]内）：离散程度（数值列为变异系数，分类列为
+    唯一值占比，均截断到1）、缺失比例、参与的最强相关的系数绝对值。
+    """
+    rows = max(statistics.get("shape", {}).get("rows", 0), 1)
+    max_corr: Dict[str, float] = {}
+    for pair in correlations or []:
+        for name in (pair["a"], pair["b"]):
+            max_corr[name] = max(max_corr.get(name, 0.0), abs(pair["r"]))
+
+    scores = {}
+    for col, col_stats in statistics.get("columns", {}).items():
+        if statistics.get("data_types", {}).get(col) == "numeric":
+            mean, std = col_stats.get("mean"), col_stats.get("std")
+            if std is None or not np.isfinite(std) or std == 0:
+                spread = 0.0
+            elif mean is None or not np.isfinite(mean) or mean == 0:
+                spread = 1.0
+            else:
+                spread = min(abs(std / mean), 1.0)
+        else:
+            spread = min(col_stats.get("unique_values", 0) / rows, 1.0)
+        missing = statistics.get("missing_values", {}).get(col, 0) / rows
+        scores[col] = spread + missing + max_corr.get(col, 0.0)
+    return scores
+
+
+def build_digest(
+    statistics: Dict[str, Any],
+    correlations: Optional[List[Dict[str, Any]]] = None,
+    token_budget: int = PROMPT_TOKEN_BUDGET
+) -> Dict[str, Any]:
+    """
+    生成统计摘要文本
+
+    按关注度从高到低逐列加入数值表和分类表，加入下一列会超出token预算时
+    停止，未列出的列数写在末尾。强相关列对在列表之前输出。
+
+    Returns:
+        {"text", "estimated_tokens", "columns_included", "columns_total"}
+    """
+    shape = statistics.get("shape", {})
+    rows = max(shape.get("rows", 0), 1)
+    data_types = statistics.get("data_types", {})
+    missing = statistics.get("missing_values", {})
+    columns = statistics.get("columns", {})
+
+    lines = [f"行数 {shape.get('rows', 0)}，列数 {shape.get('columns', len(columns))}"]
+    if correlations:
+        lines.append("强相关：" + "；".join(f"{p['a']}~{p['b']} {p['r']}" for p in correlations))
+
+    numeric_header = "数值列|均值|标准差|最小|中位数|最大|缺失%"
+    categorical_header = "分类列|唯一值|众数|众数占比%|缺失%"
+    numeric_rows: List[str] = []
+    categorical_rows: List[str] = []
+
+    def render() -> str:
+        parts = list(lines)
+        if numeric_rows:
+            parts += [numeric_header] + numeric_rows
+        if categorical_rows:
+            parts += [categorical_header] + categorical_rows
+        return "\n".join(parts)
+
+    scores = column_interest(statistics, correlations)
+    ranked = sorted(columns, key=lambda col: -scores.get(col, 0.0))
+    tokens = estimate_tokens(render())
+    included = 0
+    for col in ranked:
+        col_stats = columns[col]
+        missing_pct = _fmt(100 * missing.get(col, 0) / rows)
+        if data_types.get(col) == "numeric":
+            row = "|".join([
+                str(col), _fmt(col_stats.get("mean")), _fmt(col_stats.get("std")),
+                _fmt(col_stats.get("min")), _fmt(col_stats.get("median")),
+                _fmt(col_stats.get("max")), missing_pct
+            ])
+            target, header = numeric_rows, numeric_header
+        else:
+            row = "|".join([
+                str(col), str(col_stats.get("unique_values", "-")),
+                str(col_stats.get("most_common", "-"))[:30],
+                _fmt(100 * (col_stats.get("most_common_count") or 0) / rows), missing_pct
+            ])
+            target, header = categorical_rows, categorical_header
+
+        cost = estimate_tokens(row) + 1 + (estimate_tokens(header) + 1 if not target else 0)
+        if tokens + cost > token_budget:
+            break
+        target.append(row)
+        tokens += cost
+        included += 1
+
+    text = render()
+    if included < len(columns):
+        text += f"\n（另有 {len(columns) - included} 列未列出）"
+
+    return {
+        "text": text,
+        "estimated_tokens": estimate_tokens(text),
+        "columns_included": included,
+        "columns_total": len(columns)
+    }
@@ -0,0 +1,215 @@
+"""
+季节性检测 - 基于FFT的自相关函数和周期图
+"""
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 自相关强度达到该阈值才视为季节周期
+SEASONALITY_MIN_STRENGTH = float(os.getenv("SEASONALITY_MIN_STRENGTH", 0.3))
+# 从周期图中取出的候选频率数
+PERIODOGRAM_PEAKS = int(os.getenv("SEASONALITY_PERIODOGRAM_PEAKS", 10))
+# 已检测周期的整数倍需要在周期图中占有的最小功率比例
+MIN_POWER_SHARE = 0.05
+# 周期相对差在此范围内的频率视为同一个峰（频谱泄漏），也是自相关细化的搜索半径
+PERIOD_TOLERANCE = float(os.getenv("SEASONALITY_PERIOD_TOLERANCE", 0.05))
+# 纯噪声序列中任一频率功率超过显著性阈值的概率
+NOISE_FALSE_ALARM = 0.01
+
+
+def _detrend(values: np.ndarray) -> np.ndarray:
+    """去除线性趋势（趋势会使自相关在所有滞后上都偏高）"""
+    x = np.arange(len(values), dtype=np.float64)
+    slope, intercept = np.polyfit(x, values, 1)
+    return values - (slope * x + intercept)
+
+
+def fft_autocorrelation(values: np.ndarray, max_lag: Optional[int] = None) -> np.ndarray:
+    """
+    用FFT计算样本自相关函数（滞后0..max_lag），O(n log n)
+
+    补零到不小于2n的长度以避免循环相关，结果与 statsmodels acf(fft=True) 一致。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    max_lag = n // 2 if max_lag is None else min(max_lag, n - 1)
+
+    centered = values - values.mean()
+    size = 1 << int(2 * n - 1).bit_length()
+    spectrum = np.fft.rfft(centered, size)
+    autocov = np.fft.irfft(spectrum * np.conj(spectrum), size)[:max_lag + 1]
+    if autocov[0] <= 0:
+        return np.zeros(max_lag + 1)
+    return autocov / autocov[0]
+
+
+def periodogram(values: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    周期图：各傅里叶频率（k/n，k=1..n/2）上的功率
+
+    Returns:
+        {"frequencies", "periods", "power"}
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    power = np.abs(np.fft.rfft(values - values.mean())) ** 2 / n
+    k = np.arange(1, len(power))
+    return {"frequencies": k / n, "periods": n / k, "power": power[1:]}
+
+
+def _is_harmonic(period: int, base: int) -> bool:
+    """period是否为base的谐波（base/2、base/3...，允许±1的取整误差）"""
+    k = int(round(base / period))
+    return k >= 2 and abs(base - k * period) <= k
+
+
+def _group_peaks(k_values: np.ndarray, shares: np.ndarray, n: int) -> List[Dict[str, float]]:
+    """
+    把频谱泄漏产生的相邻频率合并为一个峰
+
+    按频率排序后，相邻的傅里叶频率（k相差1）或周期相对差不超过
+    PERIOD_TOLERANCE 的归为一组。每组的周期估计为按功率加权的平均频率
+    对应的周期，功率比例为组内之和。
+    """
+    order = np.argsort(k_values)
+    groups: List[List[int]] = []
+    for i in order:
+        if groups:
+            last = groups[-1][-1]
+            close = abs(n / k_values[i] - n / k_values[last]) <= PERIOD_TOLERANCE * n / k_values[i]
+            if k_values[i] - k_values[last] <= 1 or close:
+                groups[-1].append(i)
+                continue
+        groups.append([i])
+
+    peaks = []
+    for group in groups:
+        weights = shares[group]
+        frequency = float(np.sum(k_values[group] * weights) / weights.sum())
+        peaks.append({"period": n / frequency, "power_share": float(weights.sum())})
+    return peaks
+
+
+def _refine_on_acf(acf_values: np.ndarray, estimate: float) -> Optional[Tuple[int, float]]:
+    """
+    在周期估计附近的自相关函数上细化周期
+
+    在 estimate*(1±PERIOD_TOLERANCE)（至少±1）的滞后范围内取自相关最大值，
+    最大值落在范围边缘说明附近没有自相关峰（如长周期序列的小滞后），返回
+    None。范围较宽时用二次函数拟合峰形取顶点，避免宽而平的峰被噪声带偏。
+
+    Returns:
+        (周期, 峰高即范围内的自相关最大值)
+    """
+    max_lag = len(acf_values) - 1
+    center = int(round(estimate))
+    half_width = max(1, int(round(PERIOD_TOLERANCE * estimate)))
+    low, high = max(center - half_width, 1), min(center + half_width, max_lag)
+    if high - low < 2:
+        return None
+
+    lags = np.arange(low, high + 1)
+    best = int(lags[np.argmax(acf_values[lags])])
+    if best in (low, high):
+        return None
+    height = float(acf_values[best])
+
+    if half_width > 2:
+        a, b, _ = np.polyfit(lags - center, acf_values[lags], 2)
+        if a < 0:
+            vertex = center + int(round(-b / (2 * a)))
+            if low < vertex < high:
+                best = vertex
+    return (best, height) if best >= 2 else None
+
+
+def _is_echo(period: int, base: int, power_share: float) -> bool:
+    """
+    period是否只是base在自相关函数中的回声
+
+    自相关在base的整数倍处也有峰值；倍数周期本身在周期图中没有明显功率时
+    （如噪声频率恰好落在倍数附近）视为回声。真实的长周期（如日数据中的364
+    恰为7的倍数）有独立的功率，不会被剔除。
+    """
+    k = int(round(period / base))
+    return k >= 2 and abs(period - k * base) <= 1 and power_share < MIN_POWER_SHARE
+
+
+def detect_seasonality(
+    series,
+    max_candidates: int = 3,
+    min_strength: float = SEASONALITY_MIN_STRENGTH
+) -> List[Dict[str, Any]]:
+    """
+    检测季节周期
+
+    先在周期图中取功率最高的若干频率k/n，把频谱泄漏产生的相邻频率合并为
+    一个峰（见 _group_peaks），再在每个峰的周期估计附近的自相关函数上细化
+    周期（见 _refine_on_acf），峰高作为强度。功率不显著高于噪声水平的频率
+    不作为候选（噪声功率近似服从指数分布，以中位数估计其均值）。强度不足的
+    候选、与更强候选相差不超过 PERIOD_TOLERANCE 的候选、更强周期的谐波
+    （base/2、base/3...）和回声（见 _is_echo）被剔除。可检测的周期最长为 n/2。
+
+    Returns:
+        按强度降序排列的候选：[{"period", "strength", "power_share"}]
+    """
+    values = np.asarray(series.dropna() if hasattr(series, "dropna") else series, dtype=np.float64)
+    n = len(values)
+    if n < 8 or np.ptp(values) == 0:
+        return []
+
+    detrended = _detrend(values)
+    acf_values = fft_autocorrelation(detrended)
+    max_lag = len(acf_values) - 1
+
+    spectrum = periodogram(detrended)
+    total_power = spectrum["power"].sum()
+    if total_power <= 0:
+        return []
+
+    # 周期图峰值（周期至少为2，至少完整出现两次，功率显著），合并泄漏的相邻频率
+    power = spectrum["power"]
+    k_values = np.arange(1, len(power) + 1)
+    noise_level = np.median(power) / np.log(2)
+    threshold = noise_level * np.log(len(power) / NOISE_FALSE_ALARM)
+    valid = (spectrum["periods"] >= 2) & (spectrum["periods"] <= max_lag) & (power > threshold)
+    top = np.argsort(power[valid])[::-1][:PERIODOGRAM_PEAKS]
+    peaks = _group_peaks(k_values[valid][top], power[valid][top] / total_power, n)
+
+    scored: Dict[int, Dict[str, float]] = {}
+    for peak in peaks:
+        refined = _refine_on_acf(acf_values, peak["period"])
+        if refined is None:
+            continue
+        lag, strength = refined
+        if strength >= min_strength and strength > scored.get(lag, {}).get("strength", -np.inf):
+            scored[lag] = {"strength": strength, "power_share": peak["power_share"]}
+
+    accepted: List[Dict[str, Any]] = []
+    for lag, score in sorted(scored.items(), key=lambda item: -item[1]["strength"]):
+        if any(
+            abs(lag - a["period"]) <= PERIOD_TOLERANCE * a["period"]
+            or _is_harmonic(lag, a["period"])
+            or _is_echo(lag, a["period"], score["power_share"])
+            for a in accepted
+        ):
+            continue
+        accepted.append({
+            "period": lag,
+            "strength": round(score["strength"], 4),
+            "power_share": round(score["power_share"], 4)
+        })
+        if len(accepted) >= max_candidates:
+            break
+
+    return accepted
+
+
+def dominant_period(series, min_cycles: int = 2) -> Optional[int]:
+    """最强的季节周期（要求序列至少包含min_cycles个完整周期），未检测到时返回None"""
+    n = len(series.dropna()) if hasattr(series, "dropna") else len(series)
+    for candidate in detect_seasonality(series):
+        if candidate["period"] * min_cycles <= n:
+            return candidate["period"]
+    return None
@@ -0,0 +1,164 @@
+"""
+统计计算内核 - 批量向量化的列统计
+"""
+import os
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 与 get_basic_statistics 输出一致的分位数
+_QUANTILES = np.array([0.25, 0.5, 0.75])
+# 数值统计每块转换的数据量上限（字节），限制大表的峰值内存
+STATS_CHUNK_BYTES = int(os.getenv("STATS_CHUNK_BYTES", 64 * 1024 * 1024))
+
+
+def numeric_statistics(
+    df: pd.DataFrame,
+    columns: List[str]
+) -> Tuple[Dict[str, Dict[str, float]], Dict[str, int]]:
+    """
+    批量计算数值列统计量
+
+    列按内存预算分块转换为二维float数组，均值、标准差、最值、分位数和缺失数
+    都在块上按列向量化计算，而不是逐列多次扫描。
+
+    Returns:
+        (每列统计量, 每列缺失值数量)
+    """
+    if not columns:
+        return {}, {}
+
+    # 每块的数据数组和一个同样大小的工作数组都不超过预算
+    chunk = max(1, STATS_CHUNK_BYTES // max(len(df) * 8, 1))
+    column_stats, missing = {}, {}
+    for start in range(0, len(columns), chunk):
+        chunk_stats, chunk_missing = _numeric_block_statistics(df, columns[start:start + chunk])
+        column_stats.update(chunk_stats)
+        missing.update(chunk_missing)
+
+    return column_stats, missing
+
+
+def _numeric_block_statistics(
+    df: pd.DataFrame,
+    columns: List[str]
+) -> Tuple[Dict[str, Dict[str, float]], Dict[str, int]]:
+    """计算一块数值列的统计量，除数据数组外只使用一个工作数组"""
+    block = df[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+    missing_mask = np.isnan(block)
+    missing = missing_mask.sum(axis=0)
+    count = block.shape[0] - missing
+    work = np.empty_like(block)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        np.copyto(work, block)
+        work[missing_mask] = 0.0
+        mean = work.sum(axis=0) / count
+
+        np.subtract(block, mean, out=work)
+        work[missing_mask] = 0.0
+        np.square(work, out=work)
+        std = np.sqrt(work.sum(axis=0) / (count - 1))
+        std[count < 2] = np.nan
+
+        minimum, maximum, (q25, median, q75) = _order_statistics(
+            block, work, count, bool(missing.any())
+        )
+
+    column_stats = {}
+    for i, col in enumerate(columns):
+        column_stats[col] = {
+            "mean": float(mean[i]),
+            "median": float(median[i]),
+            "std": float(std[i]),
+            "min": float(minimum[i]),
+            "max": float(maximum[i]),
+            "q25": float(q25[i]),
+            "q75": float(q75[i])
+        }
+
+    return column_stats, {col: int(missing[i]) for i, col in enumerate(columns)}
+
+
+def _order_statistics(
+    block: np.ndarray,
+    work: np.ndarray,
+    count: np.ndarray,
+    has_missing: bool
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    按列计算最小值、最大值和分位数（线性插值，与pandas一致）
+
+    排序和选择都在工作数组work（与block同形状）中原地进行。
+    """
+    n_cols = block.shape[1]
+
+    if block.shape[0] == 0:
+        empty = np.full(n_cols, np.nan)
+        return empty, empty, np.full((len(_QUANTILES), n_cols), np.nan)
+
+    np.copyto(work, block)
+    if not has_missing:
+        quantiles = np.quantile(work, _QUANTILES, axis=0, overwrite_input=True)
+        return block.min(axis=0), block.max(axis=0), quantiles
+
+    # 有缺失值时整体排序（NaN排在末尾），再按每列的有效长度取位置
+    work.sort(axis=0)
+    sorted_block = work
+    valid = count > 0
+    last = np.maximum(count - 1, 0)
+    cols = np.arange(n_cols)
+
+    minimum = np.where(valid, sorted_block[0], np.nan)
+    maximum = np.where(valid, sorted_block[last, cols], np.nan)
+
+    positions = _QUANTILES[:, None] * last[None, :]
+    lower = np.floor(positions).astype(np.intp)
+    upper = np.ceil(positions).astype(np.intp)
+    weight = positions - lower
+    lower_values = np.take_along_axis(sorted_block, lower, axis=0)
+    upper_values = np.take_along_axis(sorted_block, upper, axis=0)
+    quantiles = lower_values + (upper_values - lower_values) * weight
+    quantiles[:, ~valid] = np.nan
+
+    return minimum, maximum, quantiles
+
+
+def categorical_statistics(
+    df: pd.DataFrame,
+    columns: List[str]
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, int]]:
+    """
+    计算分类列统计量
+
+    每列只做一次哈希编码（factorize），唯一值数、众数及其频次和缺失数
+    都由编码结果的计数得到。
+
+    Returns:
+        (每列统计量, 每列缺失值数量)
+    """
+    column_stats = {}
+    missing = {}
+
+    for col in columns:
+        codes, uniques = pd.factorize(df[col], use_na_sentinel=True)
+        valid_codes = codes[codes >= 0]
+        counts = np.bincount(valid_codes, minlength=len(uniques))
+
+        if len(uniques) > 0:
+            top = int(counts.argmax())
+            most_common = str(uniques[top])
+            most_common_count = int(counts[top])
+        else:
+            most_common = None
+            most_common_count = 0
+
+        column_stats[col] = {
+            "unique_values": int(len(uniques)),
+            "most_common": most_common,
+            "most_common_count": most_common_count
+        }
+        missing[col] = int(len(codes) - len(valid_codes))
+
+    return column_stats, missing
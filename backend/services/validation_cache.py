@@ -0,0 +1,83 @@
+"""
+验证结果缓存 - 按(数据内容哈希, 列, 变换)缓存时间序列假设检验结果
+"""
+import os
+import copy
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+
+# 缓存的最大条目数
+DEFAULT_MAX_ENTRIES = int(os.getenv("VALIDATION_CACHE_SIZE", 256))
+
+# 未经变换的原始序列
+IDENTITY = "identity"
+
+
+class ValidationCache:
+    """
+    验证结果缓存
+
+    键为(数据内容哈希, 列名, 变换名)。内容哈希相同即数据相同，因此无需
+    失效处理。变换后的序列与其验证结果一起缓存，transform_data之后的第二次
+    验证也可以直接命中。读取时返回副本，调用方修改结果（如追加回测信息）
+    不会影响缓存。
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[Tuple[Dict[str, Any], Optional[pd.Series]]]:
+        """读取缓存，返回(验证结果, 变换后的序列)，未命中返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        series = entry["series"]
+        return copy.deepcopy(entry["validation"]), (series.copy() if series is not None else None)
+
+    def put(
+        self,
+        key: Tuple[str, str, str],
+        validation: Dict[str, Any],
+        series: Optional[pd.Series] = None
+    ):
+        """写入缓存，超出条目数时淘汰最久未使用的条目"""
+        entry = {
+            "validation": copy.deepcopy(validation),
+            "series": series.copy() if series is not None else None
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+# 进程内共享的缓存实例
+validation_cache = ValidationCache()
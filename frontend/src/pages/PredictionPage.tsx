@@ -223,6 +223,11 @@ const PredictionPage: React.FC = () => {
                     <Option value="exponential_smoothing">
                       指数平滑
                     </Option>
+                    <Option value="fast_ses">快速简单指数平滑</Option>
+                    <Option value="fast_holt">快速Holt线性趋势</Option>
+                    <Option value="fast_holtwinters">快速Holt-Winters</Option>
+                    <Option value="fast_ar">快速AR(p)</Option>
+                    <Option value="random_forest">随机森林（滞后特征）</Option>
                   </Select>
                 </div>
 
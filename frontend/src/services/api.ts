@@ -71,6 +71,8 @@ export interface AnalysisResult {
   charts: ChartConfig[];
   statistics: any;
   created_at: string;
+  stage_timings?: Record<string, number>;
+  prompt_tokens?: Record<string, number>;
 }
 
 export interface PredictionResult {
@@ -139,6 +141,67 @@ export const analyzeData = async (
   return response.data;
 };
 
+export type AnalysisStreamEvent =
+  | { event: 'stage'; data: { stage: string; status: 'running' | 'completed' | 'failed' } }
+  | { event: 'statistics'; data: any }
+  | { event: 'chart'; data: ChartConfig }
+  | { event: 'insights_delta'; data: { text: string } }
+  | { event: 'result'; data: AnalysisResult }
+  | { event: 'error'; data: { status_code: number; detail: string } };
+
+// 流式分析：中间结果（统计、图表、洞察文本片段）到达时逐个回调，返回最终结果
+export const analyzeDataStream = async (
+  datasetId: string,
+  userQuery: string,
+  onEvent: (event: AnalysisStreamEvent) => void,
+  dataDescription?: string,
+  signal?: AbortSignal
+): Promise<AnalysisResult> => {
+  const response = await fetch(`${API_BASE_URL}/api/analysis/analyze/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({
+      dataset_id: datasetId,
+      user_query: userQuery,
+      data_description: dataDescription,
+    }),
+    signal,
+  });
+  if (!response.ok || !response.body) {
+    const error = await response.json().catch(() => ({}));
+    throw new Error(error.detail || `请求失败: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let result: AnalysisResult | null = null;
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // 事件之间以空行分隔
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      const eventLine = block.split('\n').find((line) => line.startsWith('event: '));
+      const dataLine = block.split('\n').find((line) => line.startsWith('data: '));
+      if (!eventLine || !dataLine) continue;
+
+      const event = { event: eventLine.slice(7), data: JSON.parse(dataLine.slice(6)) } as AnalysisStreamEvent;
+      onEvent(event);
+      if (event.event === 'error') throw new Error(event.data.detail);
+      if (event.event === 'result') result = event.data;
+    }
+  }
+
+  if (!result) throw new Error('分析流意外结束');
+  return result;
+};
+
 export const getAnalysisResult = async (analysisId: string): Promise<AnalysisResult> => {
   const response = await api.get(`/api/analysis/result/${analysisId}`);
   return response.data;